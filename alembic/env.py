@@ -1,4 +1,5 @@
 import os
+import re
 from logging.config import fileConfig
 from sqlalchemy import engine_from_config, pool
 from alembic import context
@@ -16,6 +17,17 @@ if config.config_file_name is not None:
 # --- Получаем metadata для автогенерации миграций ---
 target_metadata = SQLModel.metadata
 
+# Секции score в Postgres (score_y2026, score_default — миграция eb53ce55cc1d) — часть таблицы score,
+# а не отдельные модели: autogenerate не должен предлагать их удалить
+SCORE_PARTITION = re.compile(r"score_(y\d{4}|default)")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    table = object if type_ == "table" else getattr(object, "table", None)
+    return not (reflected and compare_to is None and table is not None
+                and SCORE_PARTITION.fullmatch(table.name))
+
+
 # --- Определяем URL базы данных ---
 # Используем DATABASE_URL из переменных окружения
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -30,6 +42,7 @@ def run_migrations_offline():
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -50,7 +63,8 @@ def run_migrations_online():
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
-            target_metadata=target_metadata
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,31 @@
+"""sequence for score event numbers
+
+Revision ID: 16f92639c86d
+Revises: 32ba8fa7656d
+Create Date: 2026-10-18 22:14:37.160583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '16f92639c86d'
+down_revision: Union[str, Sequence[str], None] = '32ba8fa7656d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # раньше последовательность создавал каждый процесс API при старте: в уже работающих базах она есть
+        op.execute(sa.schema.CreateSequence(sa.Sequence('score_events_seq'), if_not_exists=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(sa.schema.DropSequence(sa.Sequence('score_events_seq'), if_exists=True))
@@ -0,0 +1,97 @@
+"""subject reference table
+
+Revision ID: 31677a63bc57
+Revises: a15c2510551d
+Create Date: 2026-10-18 17:12:08.604213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '31677a63bc57'
+down_revision: Union[str, Sequence[str], None] = 'a15c2510551d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# список предметов бота на момент миграции; порядок задаёт id
+SUBJECTS = ["Математика", "Русский язык", "Физика", "Информатика", "Химия", "Литература", "Биология"]
+
+SubjectId = sa.SmallInteger().with_variant(sa.Integer(), 'sqlite')
+
+
+def create_histograms(column: sa.Column) -> None:
+    op.create_table('subject_score_count',
+    column,
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    *([sa.ForeignKeyConstraint(['subject_id'], ['subject.id'], )] if column.name == 'subject_id' else []),
+    sa.PrimaryKeyConstraint(column.name, 'score')
+    )
+    # гистограммы — производные данные, проще пересчитать из score, чем переписывать
+    op.execute(
+        f"INSERT INTO subject_score_count ({column.name}, score, count) "
+        f"SELECT {column.name}, score, COUNT(*) FROM score GROUP BY {column.name}, score"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('subject',
+    sa.Column('id', SubjectId, nullable=False),
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    subject = sa.table('subject', sa.column('id', sa.Integer()), sa.column('name', sa.String()))
+    op.bulk_insert(subject, [{'id': i, 'name': name} for i, name in enumerate(SUBJECTS, 1)])
+    # предметы, записанные в обход списка бота (через API или импорт), тоже попадают в справочник
+    op.execute(
+        f"INSERT INTO subject (id, name) SELECT {len(SUBJECTS)} + ROW_NUMBER() OVER (ORDER BY subject), subject "
+        "FROM (SELECT DISTINCT subject FROM score WHERE subject NOT IN (SELECT name FROM subject)) AS extra"
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        # id вставлены явно: последовательность SMALLSERIAL нужно догнать
+        op.execute("SELECT setval(pg_get_serial_sequence('subject', 'id'), (SELECT MAX(id) FROM subject))")
+
+    op.drop_index('ix_score_subject_score', table_name='score')
+    op.drop_index('ix_score_subject_id', table_name='score')
+    with op.batch_alter_table('score') as batch_op:
+        batch_op.add_column(sa.Column('subject_id', sa.SmallInteger(), nullable=True))
+    op.execute("UPDATE score SET subject_id = (SELECT id FROM subject WHERE subject.name = score.subject)")
+    with op.batch_alter_table('score') as batch_op:
+        batch_op.drop_constraint('uq_score_student_subject', type_='unique')
+        batch_op.drop_column('subject')
+        batch_op.alter_column('subject_id', existing_type=sa.SmallInteger(), nullable=False)
+        batch_op.create_foreign_key('fk_score_subject_id_subject', 'subject', ['subject_id'], ['id'])
+        batch_op.create_unique_constraint('uq_score_student_subject', ['student_id', 'subject_id'])
+    op.create_index('ix_score_subject_id', 'score', ['subject_id', 'id'], unique=False)
+    op.create_index('ix_score_subject_score', 'score', ['subject_id', 'score'], unique=False)
+
+    op.drop_table('subject_score_count')
+    create_histograms(sa.Column('subject_id', sa.SmallInteger(), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_score_subject_score', table_name='score')
+    op.drop_index('ix_score_subject_id', table_name='score')
+    with op.batch_alter_table('score') as batch_op:
+        batch_op.add_column(sa.Column('subject', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.execute("UPDATE score SET subject = (SELECT name FROM subject WHERE subject.id = score.subject_id)")
+    with op.batch_alter_table('score') as batch_op:
+        batch_op.drop_constraint('uq_score_student_subject', type_='unique')
+        batch_op.drop_constraint('fk_score_subject_id_subject', type_='foreignkey')
+        batch_op.drop_column('subject_id')
+        batch_op.alter_column('subject', existing_type=sqlmodel.sql.sqltypes.AutoString(), nullable=False)
+        batch_op.create_unique_constraint('uq_score_student_subject', ['student_id', 'subject'])
+    op.create_index('ix_score_subject_id', 'score', ['subject', 'id'], unique=False)
+    op.create_index('ix_score_subject_score', 'score', ['subject', 'score'], unique=False)
+
+    op.drop_table('subject_score_count')
+    create_histograms(sa.Column('subject', sqlmodel.sql.sqltypes.AutoString(), nullable=False))
+    op.drop_table('subject')
@@ -0,0 +1,38 @@
+"""indexes for keyset listings sorted by last name and score
+
+Revision ID: 32ba8fa7656d
+Revises: 428a664bae36
+Create Date: 2026-10-18 21:05:44.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '32ba8fa7656d'
+down_revision: Union[str, Sequence[str], None] = '428a664bae36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_student_last_name', table_name='student')
+    if op.get_bind().dialect.name == 'postgresql':
+        # побайтовый порядок: фамилии с одним префиксом — непрерывный диапазон индекса (в SQLite так и есть)
+        op.alter_column('student', 'last_name', type_=sa.String(collation='C'), existing_nullable=False)
+    op.create_index('ix_student_last_name_id', 'student', ['last_name', 'id'], unique=False)
+    op.create_index('ix_score_subject_score_id', 'score', ['subject_id', 'score', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_score_subject_score_id', table_name='score')
+    op.drop_index('ix_student_last_name_id', table_name='student')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('student', 'last_name', type_=sa.String(), existing_nullable=False)
+    op.create_index('ix_student_last_name', 'student', ['last_name'], unique=False,
+                    postgresql_ops={'last_name': 'varchar_pattern_ops'})
@@ -0,0 +1,44 @@
+"""subject score histograms
+
+Revision ID: 407c99396ce3
+Revises: fc4444fc1bd4
+Create Date: 2026-10-18 12:31:55.170342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '407c99396ce3'
+down_revision: Union[str, Sequence[str], None] = 'fc4444fc1bd4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('score', sa.Column('previous_score', sa.Integer(), nullable=True))
+    op.create_index('ix_score_subject_score', 'score', ['subject', 'score'], unique=False)
+    op.create_table('subject_score_count',
+    sa.Column('subject', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('subject', 'score')
+    )
+    # Начальное заполнение гистограмм из уже сохранённых баллов
+    op.execute(
+        "INSERT INTO subject_score_count (subject, score, count) "
+        "SELECT subject, score, COUNT(*) FROM score GROUP BY subject, score"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('subject_score_count')
+    op.drop_index('ix_score_subject_score', table_name='score')
+    with op.batch_alter_table('score') as batch_op:
+        batch_op.drop_column('previous_score')
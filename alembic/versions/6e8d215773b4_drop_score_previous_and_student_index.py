@@ -0,0 +1,34 @@
+"""drop score.previous_score and the redundant student_id index
+
+Revision ID: 6e8d215773b4
+Revises: 16f92639c86d
+Create Date: 2026-10-18 23:02:11.508317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e8d215773b4'
+down_revision: Union[str, Sequence[str], None] = '16f92639c86d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # поиск по student_id обслуживает uq_score_student_subject_year: student_id в нём первая колонка
+    op.drop_index('ix_score_student_id', table_name='score')
+    # старый балл upsert читает запросом перед записью (api.crud.current_scores), хранить его не нужно
+    with op.batch_alter_table('score') as batch_op:
+        batch_op.drop_column('previous_score')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('score') as batch_op:
+        batch_op.add_column(sa.Column('previous_score', sa.Integer(), nullable=True))
+    op.create_index('ix_score_student_id', 'score', ['student_id'], unique=False)
@@ -0,0 +1,44 @@
+"""idempotency keys and telegram id
+
+Revision ID: a15c2510551d
+Revises: 407c99396ce3
+Create Date: 2026-10-18 15:02:41.381920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a15c2510551d'
+down_revision: Union[str, Sequence[str], None] = '407c99396ce3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('student', sa.Column('telegram_id', sa.BigInteger(), nullable=True))
+    op.create_index('ix_student_telegram_id', 'student', ['telegram_id'], unique=True)
+    op.create_table('idempotency_key',
+    sa.Column('key', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+    sa.Column('fingerprint', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('content_type', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('body', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('expires_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_idempotency_key_expires_at'), 'idempotency_key', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_idempotency_key_expires_at'), table_name='idempotency_key')
+    op.drop_table('idempotency_key')
+    op.drop_index('ix_student_telegram_id', table_name='student')
+    with op.batch_alter_table('student') as batch_op:
+        batch_op.drop_column('telegram_id')
@@ -0,0 +1,134 @@
+"""score exam year and region, partitioning by year
+
+Revision ID: eb53ce55cc1d
+Revises: 31677a63bc57
+Create Date: 2026-10-18 19:04:37.215842
+
+"""
+import os
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'eb53ce55cc1d'
+down_revision: Union[str, Sequence[str], None] = '31677a63bc57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# баллы, сохранённые до миграции, относятся к текущему сезону — по тому же правилу, что год по умолчанию
+# в API (api.schemas.current_exam_year): EXAM_YEAR или текущий год на момент миграции
+EXISTING_YEAR = int(os.getenv("EXAM_YEAR") or date.today().year)
+# секции по годам; остальные годы попадают в score_default, новый год добавляется миграцией
+PARTITION_YEARS = range(2024, 2031)
+
+
+def score_columns(partitioned: bool) -> list:
+    return [
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('score_id_seq')"), nullable=False),
+        sa.Column('subject_id', sa.SmallInteger(), nullable=False),
+        sa.Column('score', sa.Integer(), nullable=False),
+        *([sa.Column('exam_year', sa.SmallInteger(), nullable=False),
+           sa.Column('region', sa.SmallInteger(), nullable=True)] if partitioned else []),
+        sa.Column('previous_score', sa.Integer(), nullable=True),
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        # имя явно: пока жива score_prev со своим ключом, Postgres назвал бы новый score_student_id_fkey1
+        sa.ForeignKeyConstraint(['student_id'], ['student.id'], name='score_student_id_fkey'),
+        sa.ForeignKeyConstraint(['subject_id'], ['subject.id'], name='fk_score_subject_id_subject'),
+    ]
+
+
+def replace_postgres_table(partitioned: bool, copy_columns: str, select_columns: str) -> None:
+    """Секционированную таблицу нельзя получить ALTER TABLE: создаём новую score и переносим строки.
+
+    id продолжают ту же последовательность score_id_seq.
+    """
+    op.execute("ALTER TABLE score RENAME TO score_prev")
+    # имена индексов общие на схему: освобождаем их для новой таблицы
+    op.execute("ALTER TABLE score_prev RENAME CONSTRAINT score_pkey TO score_prev_pkey")
+    for index in ('ix_score_student_id', 'ix_score_subject_id', 'ix_score_subject_score'):
+        op.drop_index(index, table_name='score_prev')
+    if partitioned:
+        op.create_table('score', *score_columns(True),
+                        # ключ секционирования обязан входить в первичный ключ и уникальные ограничения
+                        sa.PrimaryKeyConstraint('id', 'exam_year'),
+                        sa.UniqueConstraint('student_id', 'subject_id', 'exam_year',
+                                            name='uq_score_student_subject_year'),
+                        postgresql_partition_by='RANGE (exam_year)')
+        for year in PARTITION_YEARS:
+            op.execute(f"CREATE TABLE score_y{year} PARTITION OF score FOR VALUES FROM ({year}) TO ({year + 1})")
+        op.execute("CREATE TABLE score_default PARTITION OF score DEFAULT")
+    else:
+        op.create_table('score', *score_columns(False),
+                        sa.PrimaryKeyConstraint('id'),
+                        sa.UniqueConstraint('student_id', 'subject_id', name='uq_score_student_subject'))
+    op.execute(f"INSERT INTO score ({copy_columns}) SELECT {select_columns} FROM score_prev")
+    op.execute("ALTER SEQUENCE score_id_seq OWNED BY score.id")
+    op.drop_table('score_prev')
+    # индексы на секционированной таблице создаются и во всех секциях
+    op.create_index('ix_score_student_id', 'score', ['student_id'], unique=False)
+    op.create_index('ix_score_subject_id', 'score', ['subject_id', 'id'], unique=False)
+
+
+def create_histograms(columns: list[str]) -> None:
+    op.drop_table('subject_score_count')
+    op.create_table('subject_score_count',
+    *([sa.Column('exam_year', sa.SmallInteger(), nullable=False)] if 'exam_year' in columns else []),
+    sa.Column('subject_id', sa.SmallInteger(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['subject_id'], ['subject.id'], ),
+    sa.PrimaryKeyConstraint(*columns)
+    )
+    # гистограммы — производные данные, проще пересчитать из score, чем переписывать
+    keys = ", ".join(columns)
+    op.execute(f"INSERT INTO subject_score_count ({keys}, count) SELECT {keys}, COUNT(*) FROM score GROUP BY {keys}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        replace_postgres_table(
+            True,
+            "id, subject_id, score, exam_year, previous_score, student_id",
+            f"id, subject_id, score, {EXISTING_YEAR}, previous_score, student_id",
+        )
+    else:
+        op.drop_index('ix_score_subject_score', table_name='score')
+        with op.batch_alter_table('score') as batch_op:
+            batch_op.add_column(sa.Column('exam_year', sa.SmallInteger(), nullable=True))
+            batch_op.add_column(sa.Column('region', sa.SmallInteger(), nullable=True))
+        op.execute(f"UPDATE score SET exam_year = {EXISTING_YEAR}")
+        with op.batch_alter_table('score') as batch_op:
+            batch_op.alter_column('exam_year', existing_type=sa.SmallInteger(), nullable=False)
+            batch_op.drop_constraint('uq_score_student_subject', type_='unique')
+            batch_op.create_unique_constraint('uq_score_student_subject_year',
+                                              ['student_id', 'subject_id', 'exam_year'])
+    op.create_index('ix_score_subject_score', 'score', ['exam_year', 'subject_id', 'score'], unique=False)
+
+    create_histograms(['exam_year', 'subject_id', 'score'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # до этой ревизии у студента один балл на предмет: остаётся последний по году
+    op.execute(
+        "DELETE FROM score WHERE EXISTS (SELECT 1 FROM score AS newer WHERE newer.student_id = score.student_id "
+        "AND newer.subject_id = score.subject_id AND newer.exam_year > score.exam_year)"
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        columns = "id, subject_id, score, previous_score, student_id"
+        replace_postgres_table(False, columns, columns)
+    else:
+        op.drop_index('ix_score_subject_score', table_name='score')
+        with op.batch_alter_table('score') as batch_op:
+            batch_op.drop_constraint('uq_score_student_subject_year', type_='unique')
+            batch_op.drop_column('region')
+            batch_op.drop_column('exam_year')
+            batch_op.create_unique_constraint('uq_score_student_subject', ['student_id', 'subject_id'])
+    op.create_index('ix_score_subject_score', 'score', ['subject_id', 'score'], unique=False)
+
+    create_histograms(['subject_id', 'score'])
@@ -0,0 +1,37 @@
+"""score unique (student_id, subject)
+
+Revision ID: f337db2fbf9a
+Revises: 810a04ed0186
+Create Date: 2026-10-18 10:12:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f337db2fbf9a'
+down_revision: Union[str, Sequence[str], None] = '810a04ed0186'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Убираем дубли, которые могли появиться из-за гонки в старом upsert (оставляем последний)
+    op.execute(
+        "DELETE FROM score WHERE id NOT IN "
+        "(SELECT MAX(id) FROM score GROUP BY student_id, subject)"
+    )
+    with op.batch_alter_table('score') as batch_op:
+        batch_op.create_unique_constraint('uq_score_student_subject', ['student_id', 'subject'])
+        batch_op.create_index(batch_op.f('ix_score_student_id'), ['student_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('score') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_score_student_id'))
+        batch_op.drop_constraint('uq_score_student_subject', type_='unique')
@@ -0,0 +1,31 @@
+"""indexes for keyset listings
+
+Revision ID: fc4444fc1bd4
+Revises: f337db2fbf9a
+Create Date: 2026-10-18 11:40:02.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fc4444fc1bd4'
+down_revision: Union[str, Sequence[str], None] = 'f337db2fbf9a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_score_subject_id', 'score', ['subject', 'id'], unique=False)
+    op.create_index('ix_student_last_name', 'student', ['last_name'], unique=False,
+                    postgresql_ops={'last_name': 'varchar_pattern_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_student_last_name', table_name='student')
+    op.drop_index('ix_score_subject_id', table_name='score')
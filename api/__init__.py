@@ -0,0 +1,4 @@
+import time
+
+# точка отсчёта для времени импорта приложения (см. api.lifespan)
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,149 @@
+import math
+from collections import Counter
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, insert, text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .db import dialect_insert
+from .models import Score, SubjectScoreCount
+
+# ScoreCreate ограничивает баллы 0..100, поэтому гистограмма предмета — 101 счётчик
+MAX_SCORE = 100
+
+
+def score_deltas(changes: Iterable[tuple[tuple[int, int], Optional[int], int]]) -> Counter:
+    """((exam_year, subject_id), old, new) -> изменения счётчиков {(exam_year, subject_id, score): delta}.
+
+    old=None — новая запись.
+    """
+    deltas = Counter()
+    for key, old, new in changes:
+        if old == new:
+            continue
+        deltas[(*key, new)] += 1
+        if old is not None:
+            deltas[(*key, old)] -= 1
+    return deltas
+
+
+async def apply_score_changes(session: AsyncSession, changes) -> None:
+    """Обновляет гистограммы в той же транзакции, что и upsert баллов. Commit делает вызывающий."""
+    # порядок строк фиксирован, чтобы параллельные транзакции брали блокировки в одном порядке
+    params = [
+        {"exam_year": exam_year, "subject_id": subject, "score": score, "count": delta}
+        for (exam_year, subject, score), delta in sorted(score_deltas(changes).items())
+        if delta
+    ]
+    if not params:
+        return
+    stmt = dialect_insert(session, SubjectScoreCount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SubjectScoreCount.exam_year, SubjectScoreCount.subject_id, SubjectScoreCount.score],
+        set_={"count": SubjectScoreCount.count + stmt.excluded.count},
+    )
+    await session.exec(stmt, params=params)
+
+
+async def load_histograms(session: AsyncSession, exam_year: int,
+                          subject_ids: Optional[Iterable[int]] = None) -> dict[int, list[int]]:
+    """{subject_id: [count для балла 0, ..., count для балла 100]} за год — не больше 101 строки на предмет."""
+    statement = select(SubjectScoreCount).where(SubjectScoreCount.exam_year == exam_year,
+                                                SubjectScoreCount.count > 0)
+    if subject_ids is not None:
+        statement = statement.where(SubjectScoreCount.subject_id.in_(list(subject_ids)))
+    histograms: dict[int, list[int]] = {}
+    for row in (await session.exec(statement)).all():
+        histograms.setdefault(row.subject_id, [0] * (MAX_SCORE + 1))[row.score] = row.count
+    return histograms
+
+
+def rank_in(histogram: list[int], score: int) -> dict:
+    """Место (одинаковые баллы делят место) и процентили балла внутри гистограммы."""
+    total = sum(histogram)
+    better = sum(histogram[score + 1:])
+    worse = sum(histogram[:score])
+    rank = better + 1
+    return {
+        "rank": rank,
+        "total": total,
+        # доля результатов строго ниже
+        "percentile": round(100 * worse / total, 1) if total else 0.0,
+        # "ты в топ N%"
+        "top_percent": round(100 * rank / total, 1) if total else 0.0,
+    }
+
+
+def histogram_stats(histogram: list[int]) -> dict:
+    """count/mean/median/stddev за O(101) вместо GROUP BY по всей таблице."""
+    count = sum(histogram)
+    if not count:
+        return {"count": 0, "mean": None, "median": None, "stddev": None, "distribution": {}}
+    total = sum(score * n for score, n in enumerate(histogram))
+    mean = total / count
+    variance = sum(n * (score - mean) ** 2 for score, n in enumerate(histogram)) / count
+    return {
+        "count": count,
+        "mean": round(mean, 2),
+        "median": (nth_score(histogram, (count - 1) // 2) + nth_score(histogram, count // 2)) / 2,
+        "stddev": round(math.sqrt(variance), 2),
+        "distribution": {score: n for score, n in enumerate(histogram) if n},
+    }
+
+
+def nth_score(histogram: list[int], index: int) -> int:
+    """Балл, стоящий на позиции index (с нуля) в отсортированном по возрастанию списке результатов."""
+    seen = 0
+    for score, n in enumerate(histogram):
+        seen += n
+        if seen > index:
+            return score
+    raise IndexError(index)
+
+
+async def check_histograms(session: AsyncSession) -> list[dict]:
+    """Пересчитывает гистограммы из score и сравнивает с сохранёнными. Пустой список — всё сходится."""
+    columns = (Score.exam_year, Score.subject_id, Score.score)
+    grouped = select(*columns, func.count()).group_by(*columns)
+    expected = {tuple(key): n for *key, n in (await session.exec(grouped)).all()}
+    stored = {(row.exam_year, row.subject_id, row.score): row.count
+              for row in (await session.exec(select(SubjectScoreCount))).all()}
+    return [
+        {**dict(zip(("exam_year", "subject_id", "score"), key)),
+         "expected": expected.get(key, 0), "actual": stored.get(key, 0)}
+        for key in sorted(expected.keys() | stored.keys())
+        if expected.get(key, 0) != stored.get(key, 0)
+    ]
+
+
+async def consistency_report(session: AsyncSession, catalog) -> dict:
+    """check_histograms в виде ConsistencyReport: id предметов заменены названиями из SubjectCatalog"""
+    mismatches = await check_histograms(session)
+    names = await catalog.names(session, [mismatch["subject_id"] for mismatch in mismatches])
+    return {"consistent": not mismatches, "mismatches": [
+        {"subject": names[mismatch.pop("subject_id")], **mismatch} for mismatch in mismatches
+    ]}
+
+
+async def rebuild_histograms(session: AsyncSession, on_progress=None) -> int:
+    """Пересчитывает гистограммы из таблицы score с нуля. Возвращает число предметов.
+
+    Пересчёт идёт по годам (в Postgres — по секциям); после каждого года вызывается
+    await on_progress(готово лет, всего лет).
+    """
+    if session.bind.dialect.name == "postgresql":
+        # пока идёт пересчёт, upsert'ы ждут: иначе их дельты применятся к ещё не пересчитанным счётчикам
+        await session.exec(text("LOCK TABLE score IN SHARE MODE"))
+    await session.exec(delete(SubjectScoreCount))
+    years = (await session.exec(select(Score.exam_year).distinct().order_by(Score.exam_year))).all()
+    columns = (Score.exam_year, Score.subject_id, Score.score)
+    for done, year in enumerate(years, 1):
+        grouped = select(*columns, func.count()).where(Score.exam_year == year).group_by(*columns)
+        await session.exec(insert(SubjectScoreCount).from_select(["exam_year", "subject_id", "score", "count"],
+                                                                 grouped))
+        if on_progress is not None:
+            await on_progress(done, len(years))
+    subjects = (await session.exec(select(func.count(func.distinct(SubjectScoreCount.subject_id))))).one()
+    await session.commit()
+    return subjects
@@ -0,0 +1,212 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from fastapi import Depends
+
+from .db import READ_DATABASE_URL, request_region, shard_router
+
+# Сколько секунд после записи промахи по её ключам читаются из primary, а не с реплики: дольше, чем реплика
+# отстаёт. Без реплики окно не нужно
+REPLICA_LAG_WINDOW = float(os.getenv("REPLICA_LAG_WINDOW", "5" if READ_DATABASE_URL else "0"))
+
+
+class Cache:
+    """Кэш ответов чтения. Значения — JSON-сериализуемые объекты (dict/list).
+
+    Сам базовый класс ничего не хранит (CACHE_BACKEND=none), но считает промахи. Без хранилища нет и меток
+    записи (mark_written), поэтому кэшируемые чтения сразу после записи могут прийти с отстающей реплики.
+    """
+
+    backend = "none"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def _get(self, key: str) -> Optional[Any]:
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        pass
+
+    async def delete(self, *keys: str) -> None:
+        pass
+
+    async def clear(self) -> None:
+        pass
+
+    async def mark_written(self, *keys: str) -> None:
+        """После записи в базу: сбрасывает keys и на REPLICA_LAG_WINDOW секунд помечает их как записанные.
+
+        Метка ставится до сброса: чтение, не заставшее запись в кэше, уже видит метку и идёт в primary.
+        """
+        if REPLICA_LAG_WINDOW > 0:
+            for key in keys:
+                await self.set(written_key(key), 1, ttl=REPLICA_LAG_WINDOW)
+        await self.delete(*keys)
+
+    async def written(self, *keys: str) -> bool:
+        """Была ли недавно запись по одному из keys: тогда промах читается из primary. В hits/misses не входит"""
+        for key in keys:
+            if await self._get(written_key(key)) is not None:
+                return True
+        return False
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "hits": self.hits, "misses": self.misses}
+
+
+class MemoryCache(Cache):
+    """LRU + TTL в памяти процесса. При нескольких воркерах инвалидация локальна, устаревание ограничено ttl."""
+
+    backend = "memory"
+
+    def __init__(self, ttl: float = 60, max_size: int = 10_000, clock=time.monotonic):
+        super().__init__()
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._items: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+    async def _get(self, key: str) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= self.clock():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._items[key] = (value, self.clock() + (ttl or self.ttl))
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._items.pop(key, None)
+
+    async def clear(self) -> None:
+        self._items.clear()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "size": len(self._items)}
+
+
+class RedisCache(Cache):
+    """Общий кэш для всех воркеров и реплик API: инвалидация сразу видна всем."""
+
+    backend = "redis"
+
+    def __init__(self, url: Optional[str] = None, ttl: float = 60, client=None, prefix: str = "api:"):
+        super().__init__()
+        if client is None:
+            try:
+                from redis.asyncio import Redis
+            except ImportError:
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+            client = Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def _get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.client.set(self.prefix + key, json.dumps(value, ensure_ascii=False),
+                              px=int((ttl or self.ttl) * 1000))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def mark_written(self, *keys: str) -> None:
+        # пакетная загрузка помечает сотни студентов: один round trip вместо SET на каждого
+        if not keys:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            if REPLICA_LAG_WINDOW > 0:
+                for key in keys:
+                    pipe.set(self.prefix + written_key(key), 1, px=int(REPLICA_LAG_WINDOW * 1000))
+            pipe.delete(*(self.prefix + key for key in keys))
+            await pipe.execute()
+
+
+class NamespacedCache(Cache):
+    """Ключи с префиксом поверх общего кэша: у баз разных регионов совпадают id студентов"""
+
+    def __init__(self, cache: Cache, prefix: str):
+        self.cache = cache
+        self.prefix = prefix
+
+    @property
+    def backend(self):
+        return self.cache.backend
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await self.cache.get(self.prefix + key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.cache.set(self.prefix + key, value, ttl)
+
+    async def delete(self, *keys: str) -> None:
+        await self.cache.delete(*(self.prefix + key for key in keys))
+
+    async def mark_written(self, *keys: str) -> None:
+        await self.cache.mark_written(*(self.prefix + key for key in keys))
+
+    async def written(self, *keys: str) -> bool:
+        return await self.cache.written(*(self.prefix + key for key in keys))
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+def student_key(student_id: int) -> str:
+    return f"student:{student_id}"
+
+
+def scores_key(student_id: int) -> str:
+    return f"scores:{student_id}"
+
+
+def written_key(key: str) -> str:
+    return f"written:{key}"
+
+
+def create_cache_from_env() -> Cache:
+    backend = os.getenv("CACHE_BACKEND", "memory")
+    ttl = float(os.getenv("CACHE_TTL", "60"))
+    if backend == "memory":
+        return MemoryCache(ttl=ttl, max_size=int(os.getenv("CACHE_MAX_SIZE", "10000")))
+    if backend == "redis":
+        return RedisCache(os.getenv("CACHE_URL", "redis://localhost:6379/0"), ttl=ttl)
+    if backend == "none":
+        return Cache()
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend!r}")
+
+
+cache = create_cache_from_env()
+
+def get_cache() -> Cache:
+    return cache
+
+def get_region_cache(region: Optional[int] = Depends(request_region), cache: Cache = Depends(get_cache)) -> Cache:
+    # регион со своей базой получает свои ключи; остальные делят ключи основной базы
+    return NamespacedCache(cache, f"region{region}:") if shard_router.routes(region) else cache
@@ -0,0 +1,86 @@
+from typing import NamedTuple, Optional
+
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from . import aggregates
+from .db import dialect_insert
+from .models import Score, Student
+
+
+class ScoreWrite(NamedTuple):
+    """Строка после upsert и балл до него (None — строка вставлена)"""
+    id: int
+    subject_id: int
+    score: int
+    student_id: int
+    exam_year: int
+    region: Optional[int]
+    previous_score: Optional[int]
+
+
+def score_upsert(session: AsyncSession):
+    """INSERT ... ON CONFLICT (student_id, subject_id, exam_year) DO UPDATE SET score = excluded.score
+
+    Регион без X-Region (например, исправление из бота) не затирает сохранённый.
+    """
+    stmt = dialect_insert(session, Score)
+    return stmt.on_conflict_do_update(
+        index_elements=[Score.student_id, Score.subject_id, Score.exam_year],
+        set_={"score": stmt.excluded.score, "region": func.coalesce(stmt.excluded.region, Score.region)},
+    )
+
+
+async def current_scores(session: AsyncSession, rows: list[dict]) -> dict[tuple, int]:
+    """Баллы до upsert: {(student_id, subject_id, exam_year): score} по ключам rows.
+
+    В Postgres сначала блокируются строки студентов (FOR NO KEY UPDATE до конца транзакции): параллельный
+    upsert тех же студентов ждёт commit, и балл не меняется между чтением и upsert, даже если строки ещё нет.
+    Внешний ключ score -> student берёт FOR KEY SHARE и с этой блокировкой не конфликтует.
+    """
+    keys = {(row["student_id"], row["subject_id"], row["exam_year"]) for row in rows}
+    student_ids = {key[0] for key in keys}
+    if session.bind.dialect.name == "postgresql":
+        # отдельным запросом: баллы, прочитанные в одном запросе с ожиданием блокировки, были бы из снимка
+        # до commit того upsert, которого ждали. Порядок блокировок один — пакеты не ждут друг друга по кругу
+        await session.exec(select(Student.id).where(Student.id.in_(student_ids)).order_by(Student.id)
+                           .with_for_update(key_share=True))
+    statement = select(Score.student_id, Score.subject_id, Score.exam_year, Score.score).where(
+        Score.student_id.in_(student_ids),
+        Score.subject_id.in_({key[1] for key in keys}),
+        Score.exam_year.in_({key[2] for key in keys}),
+    )
+    found = (await session.exec(statement)).all()
+    return {(student_id, subject_id, exam_year): score for student_id, subject_id, exam_year, score in found
+            if (student_id, subject_id, exam_year) in keys}
+
+
+def score_change(row) -> tuple:
+    return (row.exam_year, row.subject_id), row.previous_score, row.score
+
+
+async def upsert_score(session: AsyncSession, student_id: int, subject_id: int, score: int, exam_year: int,
+                       region: Optional[int] = None) -> ScoreWrite:
+    """upsert_scores для одного балла и commit. Нарушение FK выбрасывает IntegrityError."""
+    written = await upsert_scores(session, [{"student_id": student_id, "subject_id": subject_id, "score": score,
+                                             "exam_year": exam_year, "region": region}])
+    await session.commit()
+    return written[0]
+
+
+async def upsert_scores(session: AsyncSession, rows: list[dict]) -> list[ScoreWrite]:
+    """Пакетный upsert через executemany, без commit.
+
+    Ключи (student_id, subject_id, exam_year) в rows должны быть уникальны, region обязателен (можно None).
+    Возвращает ScoreWrite в произвольном порядке.
+    """
+    if not rows:
+        return []
+    # старый балл нужен для инкрементального обновления гистограмм; в score он не хранится
+    previous = await current_scores(session, rows)
+    stmt = score_upsert(session).returning(Score.id, Score.subject_id, Score.score, Score.student_id,
+                                           Score.exam_year, Score.region)
+    written = [ScoreWrite(*row, previous.get((row.student_id, row.subject_id, row.exam_year)))
+               for row in (await session.exec(stmt, params=rows)).all()]
+    await aggregates.apply_score_changes(session, [score_change(row) for row in written])
+    return written
@@ -1,11 +1,256 @@
-from sqlmodel import SQLModel, Session, create_engine
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Optional
+
+from fastapi import Depends, Header
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel.ext.asyncio.session import AsyncSession
 import os
 
 
 DATABASE_URL = os.getenv("DATABASE_URL","postgresql://postgres:postgres@db:5432/postgres")
 
-engine = create_engine(DATABASE_URL, echo=True)
+# Асинхронные драйверы для синхронных URL (Alembic продолжает ходить через DATABASE_URL)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+# ASYNC_DATABASE_URL позволяет явно задать драйвер, иначе он выводится из DATABASE_URL
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+# Необязательная реплика только для чтения
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+@dataclass
+class EngineSettings:
+    """Настройки движка и пула. from_env читает DB_POOL_SIZE, DB_MAX_OVERFLOW и т.д."""
+    url: str
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: float = 30.0        # сколько ждать свободное соединение, секунд
+    pool_recycle: int = 1800          # пересоздавать соединения старше, секунд
+    pool_pre_ping: bool = True
+    statement_timeout_ms: Optional[int] = None
+    echo: bool = False                # логирование каждого SQL-запроса: только для отладки
+
+    @classmethod
+    def from_env(cls, url: str) -> "EngineSettings":
+        statement_timeout = os.getenv("DB_STATEMENT_TIMEOUT_MS")
+        return cls(
+            url=url,
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            pool_pre_ping=env_flag("DB_POOL_PRE_PING", True),
+            statement_timeout_ms=int(statement_timeout) if statement_timeout else None,
+            echo=env_flag("SQL_ECHO", env_flag("DEBUG")),
+        )
+
+    @property
+    def dialect(self) -> str:
+        return self.url.partition("://")[0].split("+")[0]
+
+    def engine_kwargs(self) -> dict:
+        kwargs = {"echo": self.echo}
+        if self.dialect == "sqlite":
+            # для SQLite SQLAlchemy сам выбирает пул (StaticPool для :memory:), параметры пула к нему неприменимы
+            return kwargs
+        kwargs.update(
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_recycle=self.pool_recycle,
+            pool_pre_ping=self.pool_pre_ping,
+        )
+        if self.statement_timeout_ms and self.dialect == "postgresql":
+            kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(self.statement_timeout_ms)}}
+        return kwargs
+
+
+class PoolMetrics:
+    """Счётчики пула: выдачи соединений, время ожидания, таймауты."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.pool = None
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        if seconds > self.wait_seconds_max:
+            self.wait_seconds_max = seconds
+
+    def snapshot(self) -> dict:
+        data = {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+        pool = self.pool
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            data.update(size=pool.size(), checked_out=pool.checkedout(), overflow=max(pool.overflow(), 0),
+                        checked_in=pool.checkedin())
+        return data
+
+
+def timed_pool_class(metrics: PoolMetrics):
+    """Пул, замеряющий ожидание соединения. metrics — атрибут класса, чтобы пережить pool.recreate()."""
+
+    class TimedQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            started = perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                metrics.timeouts += 1
+                raise
+            metrics.record_wait(perf_counter() - started)
+            metrics.pool = self
+            return connection
+
+    return TimedQueuePool
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite по умолчанию не проверяет внешние ключи
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def make_engine(url: str, **kwargs):
+    engine = create_async_engine(url, **kwargs)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+    return engine
 
-def get_session():
-    with Session(engine) as session:
+
+def make_configured_engine(settings: EngineSettings, metrics: Optional[PoolMetrics] = None):
+    kwargs = settings.engine_kwargs()
+    if metrics is not None and settings.dialect != "sqlite":
+        kwargs["poolclass"] = timed_pool_class(metrics)
+    engine = make_engine(settings.url, **kwargs)
+    if metrics is not None:
+        metrics.pool = engine.sync_engine.pool
+    return engine
+
+
+pool_metrics = PoolMetrics()
+engine = make_configured_engine(EngineSettings.from_env(ASYNC_DATABASE_URL), pool_metrics)
+session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+if READ_DATABASE_URL:
+    read_pool_metrics = PoolMetrics()
+    read_engine = make_configured_engine(EngineSettings.from_env(to_async_url(READ_DATABASE_URL)),
+                                         read_pool_metrics)
+    read_session_factory = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+else:
+    read_pool_metrics = None
+    read_engine = engine
+    read_session_factory = session_factory
+
+
+class ShardRouter:
+    """Регион -> отдельная база. Регионы без своей базы (и запросы без региона) идут в основную.
+
+    DB_SHARD_REGIONS=77,78 — регионы со своей базой, DB_SHARD_URL — шаблон её URL с {region}:
+    postgresql://postgres:postgres@db:5432/scores_{region} или, без Postgres, по SQLite-файлу на шард:
+    sqlite:////data/shards/region_{region}.db. Схема шарда ведётся теми же миграциями
+    (DATABASE_URL=<url шарда> alembic upgrade head), поэтому справочник предметов в них совпадает.
+    id студентов и баллов у каждой базы свои: кэш и события API разделяют их по региону.
+    """
+
+    def __init__(self, urls: Optional[dict[int, str]] = None, engine_factory=None):
+        engine_factory = engine_factory or (lambda url, metrics: make_configured_engine(
+            EngineSettings.from_env(to_async_url(url)), metrics))
+        self.metrics = {region: PoolMetrics() for region in urls or {}}
+        self.engines = {region: engine_factory(url, self.metrics[region]) for region, url in (urls or {}).items()}
+        self.session_factories = {region: async_sessionmaker(shard_engine, class_=AsyncSession,
+                                                             expire_on_commit=False)
+                                  for region, shard_engine in self.engines.items()}
+
+    @classmethod
+    def from_env(cls) -> "ShardRouter":
+        regions = [int(region) for region in os.getenv("DB_SHARD_REGIONS", "").split(",") if region.strip()]
+        template = os.getenv("DB_SHARD_URL")
+        if regions and not template:
+            raise RuntimeError("DB_SHARD_REGIONS requires DB_SHARD_URL, e.g. sqlite:////data/region_{region}.db")
+        return cls({region: template.format(region=region) for region in regions})
+
+    def routes(self, region: Optional[int]) -> bool:
+        """Есть ли у региона своя база"""
+        return region in self.session_factories
+
+    def session_factory(self, region: Optional[int], read: bool = False):
+        # у шардов нет реплик: чтения идут в их primary
+        if region in self.session_factories:
+            return self.session_factories[region]
+        return read_session_factory if read else session_factory
+
+
+shard_router = ShardRouter.from_env()
+
+
+def request_region(x_region: Optional[int] = Header(None, ge=1, le=999)) -> Optional[int]:
+    """Код региона запроса (заголовок X-Region): выбирает базу и записывается в score.region"""
+    return x_region
+
+
+async def get_session(region: Optional[int] = Depends(request_region)):
+    async with shard_router.session_factory(region)() as session:
+        yield session
+
+async def get_read_session(region: Optional[int] = Depends(request_region)):
+    # чтения с реплики; без READ_DATABASE_URL — primary. Кэшируемые чтения сразу после записи берут
+    # get_session (см. Cache.mark_written), иначе отставшая строка прожила бы в кэше CACHE_TTL
+    async with shard_router.session_factory(region, read=True)() as session:
         yield session
+
+
+def pool_stats() -> dict:
+    stats = {"primary": pool_metrics.snapshot()}
+    if read_pool_metrics is not None:
+        stats["replica"] = read_pool_metrics.snapshot()
+    for region, metrics in shard_router.metrics.items():
+        stats[f"region_{region}"] = metrics.snapshot()
+    return stats
+
+
+# INSERT ... ON CONFLICT есть только в диалектных конструкциях
+DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def dialect_insert(session: AsyncSession, table):
+    dialect = session.bind.dialect.name
+    try:
+        return DIALECT_INSERTS[dialect](table)
+    except KeyError:
+        raise NotImplementedError(f"upsert is not supported for dialect {dialect!r}")
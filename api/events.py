@@ -0,0 +1,239 @@
+"""События изменения баллов.
+
+Каждый upsert, который действительно меняет балл, публикует событие. Подписчик (бот) забирает их
+long-poll запросом GET /events/?since=<seq>: запрос висит, пока не появится событие новее since или
+не истечёт timeout, и не держит соединение с БД.
+
+EVENTS_BACKEND:
+- memory (по умолчанию) — кольцевой буфер в процессе; годится, пока API работает одним процессом.
+- postgres — события рассылаются через NOTIFY, каждый процесс API слушает канал и складывает их в свой
+  буфер, поэтому long-poll может попасть в любой воркер. seq выдаёт последовательность в БД.
+- none — события не публикуются.
+
+Доставка best-effort: буфер ограничен EVENTS_BUFFER_SIZE, после рестарта или отставания подписчик
+получает reset=true и продолжает с last_seq. Баллы по-прежнему можно перечитать через /scores.
+
+seq выдаётся при публикации, а NOTIFY доставляются в порядке commit, поэтому событие может прийти позже
+следующего за ним. Буфер отдаёт подписчикам события только до первой такой дыры и ждёт её заполнения
+EVENTS_GAP_TIMEOUT секунд; не заполнилась — значит, публикация откатилась и seq пропущен навсегда.
+Последовательность score_events_seq создаётся миграцией, а не при старте процесса.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from fastapi import Depends, Header
+from sqlalchemy import text
+
+from .db import engine, request_region, shard_router
+from .models import score_events_seq
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class EventBus:
+    """Буфер последних событий в памяти процесса"""
+
+    backend = "memory"
+
+    def __init__(self, size: int = 10_000, gap_timeout: float = 5.0, clock=time.monotonic):
+        self._events: deque[dict] = deque(maxlen=size)
+        self.last_seq = 0
+        # все seq до этого включительно из буфера уже не прочитать: вытеснены или были до старта процесса
+        self._lost_seq = 0
+        self._waiters: set[asyncio.Future] = set()
+        self._closed = False
+        self.gap_timeout = gap_timeout
+        self.clock = clock
+        # seq, которых ещё нет, хотя более поздние уже пришли -> когда дыру заметили
+        self._gaps: dict[int, float] = {}
+
+    async def start(self) -> None:
+        self._closed = False
+
+    async def close(self) -> None:
+        self._closed = True
+        self._wake()
+
+    async def publish(self, events: list[dict]) -> None:
+        for event in events:
+            self._append({"seq": self.last_seq + 1, **event})
+        if events:
+            self._wake()
+
+    def _append(self, event: dict):
+        seq = event["seq"]
+        if seq <= self._lost_seq:
+            return
+        if self._gaps.pop(seq, None) is None and seq > self.last_seq + 1:
+            noticed = self.clock()
+            for missing in range(max(self.last_seq + 1, seq - self._events.maxlen), seq):
+                self._gaps[missing] = noticed
+            self._wake_later(self.gap_timeout)
+        if len(self._events) == self._events.maxlen:
+            self._lost_seq = self._events.popleft()["seq"]
+        # события с разных соединений могут прийти не по порядку seq; вставка почти всегда в конец
+        position = len(self._events)
+        while position and self._events[position - 1]["seq"] > seq:
+            position -= 1
+        self._events.insert(position, event)
+        self.last_seq = max(self.last_seq, seq)
+
+    def _wake(self):
+        waiters, self._waiters = self._waiters, set()
+        for future in waiters:
+            # ожидающий может жить в другом цикле событий (TestClient, несколько потоков)
+            future.get_loop().call_soon_threadsafe(_resolve, future)
+
+    def _wake_later(self, delay: float):
+        # незаполненная дыра через delay перестаёт задерживать события: ожидающим пора их забрать
+        try:
+            asyncio.get_running_loop().call_later(delay, self._wake)
+        except RuntimeError:
+            pass
+
+    def visible_seq(self) -> int:
+        """До какого seq подписчик может дочитать: дальше дыра, которая ещё может заполниться"""
+        expired = self.clock() - self.gap_timeout
+        for seq in [seq for seq, noticed in self._gaps.items() if noticed <= expired]:
+            del self._gaps[seq]
+        return min(self._gaps) - 1 if self._gaps else self.last_seq
+
+    def read(self, since: int, limit: int) -> tuple[list[dict], bool]:
+        """События новее since и флаг reset: часть событий после since уже недоступна"""
+        if since > self.last_seq:
+            # seq начался заново (рестарт с memory-буфером): since клиента больше ничего не значит
+            return [], True
+        visible = self.visible_seq()
+        newer = []
+        for event in reversed(self._events):
+            if event["seq"] <= since:
+                break
+            if event["seq"] <= visible:
+                newer.append(event)
+        newer.reverse()
+        return newer[:limit], since < self._lost_seq
+
+    async def wait(self, since: int, timeout: float, limit: int = 100) -> dict:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        events, reset = self.read(since, limit)
+        # будит и событие за дырой, которое пока не отдаётся: тогда ждём дальше, до timeout или остановки
+        while not events and not reset and not self._closed and deadline > loop.time():
+            future = loop.create_future()
+            self._waiters.add(future)
+            try:
+                await asyncio.wait({future}, timeout=deadline - loop.time())
+            finally:
+                self._waiters.discard(future)
+            events, reset = self.read(since, limit)
+        last_seq = events[-1]["seq"] if events else (self.visible_seq() if reset else since)
+        return {"events": events, "last_seq": last_seq, "reset": reset}
+
+
+class NullEventBus(EventBus):
+    backend = "none"
+
+    async def publish(self, events: list[dict]) -> None:
+        pass
+
+
+class PostgresEventBus(EventBus):
+    """Рассылка событий между процессами API через LISTEN/NOTIFY (драйвер asyncpg)"""
+
+    backend = "postgres"
+    channel = "score_events"
+    sequence = score_events_seq.name
+
+    def __init__(self, engine, size: int = 10_000, gap_timeout: float = 5.0):
+        super().__init__(size, gap_timeout)
+        self.engine = engine
+        self._listener = None
+
+    async def start(self) -> None:
+        await super().start()
+        # отдельное соединение из пула занято на всё время работы процесса
+        self._listener = await self.engine.connect()
+        # события до старта в буфер уже не попадут. Позиция читается до подписки на канал: иначе первое
+        # уведомление выглядело бы дырой от нуля
+        result = await self._listener.execute(
+            text(f"SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {self.sequence}"))
+        self.last_seq = self._lost_seq = max(self.last_seq, result.scalar_one())
+        await self._listener.commit()
+        raw = await self._listener.get_raw_connection()
+        await raw.driver_connection.add_listener(self.channel, self._on_notify)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            raw = await self._listener.get_raw_connection()
+            await raw.driver_connection.remove_listener(self.channel, self._on_notify)
+            await self._listener.close()
+            self._listener = None
+        await super().close()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._append(json.loads(payload))
+        self._wake()
+
+    async def publish(self, events: list[dict]) -> None:
+        if not events:
+            return
+        # seq выдаётся при отправке, а уведомления доставляются в порядке commit: событие с меньшим seq
+        # может прийти позже следующего — такие дыры выдерживает EventBus.visible_seq
+        statement = text(
+            "SELECT pg_notify(:channel, "
+            f"(CAST(:event AS jsonb) || jsonb_build_object('seq', nextval('{self.sequence}')))::text)"
+        )
+        async with self.engine.connect() as conn:
+            await conn.execute(statement, [{"channel": self.channel, "event": json.dumps(event, ensure_ascii=False)}
+                                           for event in events])
+            await conn.commit()
+
+
+def score_events(rows, names: dict[int, str], source: Optional[str] = None) -> list[dict]:
+    """События по строкам crud.upsert_scores (crud.ScoreWrite); неизменившиеся баллы пропускаются.
+
+    names — {subject_id: название} из SubjectCatalog: подписчики получают название предмета.
+    """
+    return [
+        {"type": "score", "student_id": row.student_id, "subject": names[row.subject_id],
+         "exam_year": row.exam_year, "region": row.region, "score": row.score,
+         "previous_score": row.previous_score, "source": source}
+        for row in rows if row.previous_score != row.score
+    ]
+
+
+def event_source(x_source: Optional[str] = Header(None, max_length=50)) -> Optional[str]:
+    """Кто меняет баллы (заголовок X-Source): подписчик не уведомляет о собственных изменениях"""
+    return x_source
+
+
+def create_event_bus_from_env() -> EventBus:
+    backend = os.getenv("EVENTS_BACKEND", "memory")
+    size = int(os.getenv("EVENTS_BUFFER_SIZE", "10000"))
+    gap_timeout = float(os.getenv("EVENTS_GAP_TIMEOUT", "5"))
+    if backend == "memory":
+        return EventBus(size, gap_timeout)
+    if backend == "postgres":
+        if engine.dialect.name != "postgresql":
+            raise RuntimeError("EVENTS_BACKEND=postgres requires a PostgreSQL DATABASE_URL")
+        return PostgresEventBus(engine, size, gap_timeout)
+    if backend == "none":
+        return NullEventBus()
+    raise ValueError(f"Unknown EVENTS_BACKEND: {backend!r}")
+
+
+event_bus = create_event_bus_from_env()
+
+def get_event_bus() -> EventBus:
+    return event_bus
+
+def get_region_event_bus(region: Optional[int] = Depends(request_region),
+                         bus: EventBus = Depends(get_event_bus)) -> EventBus:
+    # подписчики (бот) знают только студентов основной базы: изменения в базах регионов не публикуются
+    return NullEventBus() if shard_router.routes(region) else bus
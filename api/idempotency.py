@@ -0,0 +1,306 @@
+"""Идемпотентность записи по заголовку Idempotency-Key.
+
+Клиент (бот) повторяет запросы после обрывов, а Telegram после рестарта присылает те же апдейты ещё раз.
+Запрос с уже виденным ключом не доходит до эндпоинта: возвращается сохранённый ответ с заголовком
+Idempotent-Replayed: true, основные таблицы не затрагиваются. Ключ занимается до выполнения запроса,
+поэтому параллельный повтор получает 409, а тот же ключ с другим телом — 422.
+
+IDEMPOTENCY_BACKEND:
+- memory (по умолчанию) — в процессе, LRU + TTL; при нескольких воркерах ключ виден только своему.
+- database — таблица idempotency_key, общая для всех воркеров; просроченные записи удаляются периодически.
+- none — заголовок игнорируется.
+
+Сохраняются только успешные (2xx) ответы: после ошибки запрос с тем же ключом можно повторить.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlmodel import delete, update
+
+from .db import dialect_insert, session_factory
+from .models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+# регион выбирает базу, в которую пишет запрос: тот же ключ с другим регионом — другой запрос
+REGION_HEADER = b"x-region"
+REPLAYED_HEADER = (b"idempotent-replayed", b"true")
+MAX_KEY_LENGTH = 255
+
+# эндпоинты, которые понимают Idempotency-Key
+IDEMPOTENT_ROUTES = [
+    ("POST", re.compile(r"/students/")),
+    ("POST", re.compile(r"/students/\d+/scores/(batch)?")),
+]
+
+# результат попытки занять ключ
+NEW = "new"                  # ключ наш: выполняем запрос
+IN_PROGRESS = "in_progress"  # запрос с этим ключом ещё выполняется
+MISMATCH = "mismatch"        # ключ уже использован с другим запросом
+REPLAY = "replay"            # есть сохранённый ответ
+
+
+@dataclass
+class StoredResponse:
+    status_code: int
+    content_type: Optional[str]
+    body: str
+
+
+def _existing(fingerprint: str, response: Optional[StoredResponse], requested: str):
+    if fingerprint != requested:
+        return MISMATCH, None
+    if response is None:
+        return IN_PROGRESS, None
+    return REPLAY, response
+
+
+class IdempotencyStore(ABC):
+    """Ключи идемпотентности: reserve занимает ключ, complete сохраняет ответ, release освобождает ключ"""
+
+    def __init__(self, ttl: float = 86400, lock_timeout: float = 30):
+        self.ttl = ttl                    # сколько хранится ответ
+        self.lock_timeout = lock_timeout  # после этого незавершённый запрос считается брошенным
+
+    @abstractmethod
+    async def reserve(self, key: str, fingerprint: str) -> tuple[str, Optional[StoredResponse]]:
+        pass
+
+    @abstractmethod
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        pass
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        pass
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    response: Optional[StoredResponse]
+    expires_at: float
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    backend = "memory"
+
+    def __init__(self, ttl: float = 86400, lock_timeout: float = 30, max_size: int = 100_000,
+                 clock=time.monotonic):
+        super().__init__(ttl, lock_timeout)
+        self.max_size = max_size
+        self.clock = clock
+        self._items: OrderedDict[str, _Entry] = OrderedDict()
+
+    async def reserve(self, key: str, fingerprint: str) -> tuple[str, Optional[StoredResponse]]:
+        # проверка и запись без await между ними — атомарны в пределах event loop
+        now = self.clock()
+        entry = self._items.get(key)
+        if entry is not None and entry.expires_at > now:
+            return _existing(entry.fingerprint, entry.response, fingerprint)
+        self._items[key] = _Entry(fingerprint, None, now + self.lock_timeout)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return NEW, None
+
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        entry = self._items.get(key)
+        if entry is not None:
+            entry.response = response
+            entry.expires_at = self.clock() + self.ttl
+
+    async def release(self, key: str) -> None:
+        self._items.pop(key, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DatabaseIdempotencyStore(IdempotencyStore):
+    backend = "database"
+
+    def __init__(self, session_factory, ttl: float = 86400, lock_timeout: float = 30,
+                 purge_interval: float = 300, clock=time.time):
+        super().__init__(ttl, lock_timeout)
+        self.session_factory = session_factory
+        self.purge_interval = purge_interval
+        self.clock = clock
+        self._next_purge = 0.0
+
+    async def reserve(self, key: str, fingerprint: str) -> tuple[str, Optional[StoredResponse]]:
+        now = self.clock()
+        locked = {"fingerprint": fingerprint, "status_code": None, "content_type": None, "body": None,
+                  "expires_at": now + self.lock_timeout}
+        async with self.session_factory() as session:
+            if now >= self._next_purge:
+                self._next_purge = now + self.purge_interval
+                await session.exec(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= now))
+
+            insert = dialect_insert(session, IdempotencyRecord).values(key=key, **locked)
+            result = await session.exec(insert.on_conflict_do_nothing(index_elements=[IdempotencyRecord.key]))
+            if result.rowcount == 0:
+                # ключ есть; просроченную запись (истёкший ответ или брошенный запрос) перехватываем атомарно
+                takeover = (update(IdempotencyRecord)
+                            .where(IdempotencyRecord.key == key, IdempotencyRecord.expires_at <= now)
+                            .values(**locked))
+                result = await session.exec(takeover)
+            if result.rowcount == 1:
+                await session.commit()
+                return NEW, None
+            record = await session.get(IdempotencyRecord, key)
+            await session.commit()
+
+        if record is None:
+            # запись удалили между запросами: пусть клиент повторит
+            return IN_PROGRESS, None
+        response = None
+        if record.status_code is not None:
+            response = StoredResponse(record.status_code, record.content_type, record.body)
+        return _existing(record.fingerprint, response, fingerprint)
+
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        async with self.session_factory() as session:
+            await session.exec(
+                update(IdempotencyRecord).where(IdempotencyRecord.key == key).values(
+                    status_code=response.status_code, content_type=response.content_type, body=response.body,
+                    expires_at=self.clock() + self.ttl))
+            await session.commit()
+
+    async def release(self, key: str) -> None:
+        async with self.session_factory() as session:
+            await session.exec(delete(IdempotencyRecord).where(IdempotencyRecord.key == key))
+            await session.commit()
+
+
+def request_fingerprint(scope, body: bytes) -> str:
+    region = next((value for name, value in scope["headers"] if name == REGION_HEADER), b"")
+    digest = hashlib.sha256()
+    for part in (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), region, body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+async def _send_json(send, status_code: int, content: dict):
+    body = json.dumps(content).encode()
+    await send({"type": "http.response.start", "status": status_code,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """ASGI-middleware: Idempotency-Key для эндпоинтов из IDEMPOTENT_ROUTES"""
+
+    def __init__(self, app, store: Optional[IdempotencyStore] = None, routes=IDEMPOTENT_ROUTES):
+        self.app = app
+        self.store = store
+        self.routes = routes
+
+    def applies(self, scope) -> bool:
+        return any(scope["method"] == method and pattern.fullmatch(scope["path"]) for method, pattern in self.routes)
+
+    async def __call__(self, scope, receive, send):
+        store = self.store if self.store is not None else get_idempotency_store()
+        if scope["type"] != "http" or store is None or not self.applies(scope):
+            await self.app(scope, receive, send)
+            return
+        key = next((value for name, value in scope["headers"] if name == IDEMPOTENCY_HEADER), None)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"})
+            return
+        key = key.decode("latin-1")
+
+        # тело эндпоинтов с ключом небольшое: читаем целиком, чтобы посчитать отпечаток
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+
+        state, stored = await store.reserve(key, request_fingerprint(scope, body))
+        if state == REPLAY:
+            headers = [(b"content-type", stored.content_type.encode())] if stored.content_type else []
+            payload = stored.body.encode()
+            await send({"type": "http.response.start", "status": stored.status_code,
+                        "headers": headers + [(b"content-length", str(len(payload)).encode()), REPLAYED_HEADER]})
+            await send({"type": "http.response.body", "body": payload})
+            return
+        if state == IN_PROGRESS:
+            await _send_json(send, 409, {"detail": "A request with this Idempotency-Key is in progress"})
+            return
+        if state == MISMATCH:
+            await _send_json(send, 422, {"detail": "Idempotency-Key was already used with a different request"})
+            return
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status_code, content_type, response_chunks = None, None, []
+
+        async def send_wrapper(message):
+            nonlocal status_code, content_type
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                for name, value in message.get("headers", []):
+                    if name == b"content-type":
+                        content_type = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        except BaseException:
+            await store.release(key)
+            raise
+        try:
+            if status_code is not None and 200 <= status_code < 300:
+                await store.complete(key, StoredResponse(status_code, content_type,
+                                                         b"".join(response_chunks).decode()))
+            else:
+                await store.release(key)
+        except Exception:
+            # ответ клиенту уже отправлен; ключ освободится по lock_timeout
+            logger.exception("Failed to store response for Idempotency-Key %r", key)
+
+
+def create_idempotency_store_from_env() -> Optional[IdempotencyStore]:
+    backend = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+    ttl = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+    lock_timeout = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "30"))
+    if backend == "memory":
+        return MemoryIdempotencyStore(ttl, lock_timeout, max_size=int(os.getenv("IDEMPOTENCY_MAX_SIZE", "100000")))
+    if backend == "database":
+        return DatabaseIdempotencyStore(session_factory, ttl, lock_timeout)
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown IDEMPOTENCY_BACKEND: {backend!r}")
+
+
+idempotency_store = create_idempotency_store_from_env()
+
+def get_idempotency_store() -> Optional[IdempotencyStore]:
+    return idempotency_store
@@ -0,0 +1,250 @@
+import codecs
+import csv
+import json
+import os
+from collections import deque
+from typing import AsyncIterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import crud
+from .cache import Cache, scores_key
+from .events import EventBus, score_events
+from .models import Student
+from .schemas import BulkRowError, BulkScoreReport, BulkScoreRow
+from .subjects import SubjectCatalog, get_subject_catalog
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", "1000"))
+MAX_LINE_LENGTH = 64 * 1024  # символов; строка длиннее считается ошибкой и пропускается
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_length: int = MAX_LINE_LENGTH):
+    """Режет поток байтов на строки (line_no, text), держа в памяти не больше одной строки.
+
+    Для слишком длинной строки вместо текста отдаётся None. BOM в начале (CSV из Excel) отбрасывается.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    line_no = 0
+    overflow = False
+
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line_no += 1
+            if overflow:
+                overflow = False
+                yield line_no, None
+            else:
+                yield line_no, line.rstrip("\r")
+        if len(buffer) > max_length:
+            # хвост строки без перевода строки выбрасываем до ближайшего "\n"
+            overflow = True
+            buffer = ""
+
+    buffer += decoder.decode(b"", final=True)
+    if buffer or overflow:
+        yield line_no + 1, None if overflow else buffer.rstrip("\r")
+
+
+class LineFeed:
+    """Источник строк для одного csv.reader на весь поток: строки подкладываются по одной записи"""
+
+    def __init__(self):
+        self.lines: deque[str] = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def iter_csv_rows(lines, max_length: int = MAX_LINE_LENGTH):
+    """Строки CSV -> (номер первой строки записи, значения) или (номер, текст ошибки).
+
+    Поле в кавычках может содержать перевод строки: строки копятся, пока кавычки не закроются
+    (чётное число '"'), и только тогда csv.reader читает запись целиком.
+    """
+    feed = LineFeed()
+    reader = csv.reader(feed)
+    start, length, quotes = None, 0, 0
+    async for line_no, line in lines:
+        if line is None:
+            yield start or line_no, "Line is too long"
+            feed.lines.clear()
+            start, length, quotes = None, 0, 0
+            continue
+        if start is None:
+            if not line.strip():
+                continue
+            start = line_no
+        feed.lines.append(line + "\n")
+        length += len(line) + 1
+        quotes += line.count('"')
+        if quotes % 2:
+            if length > max_length:
+                yield start, "Line is too long"
+                feed.lines.clear()
+                start, length, quotes = None, 0, 0
+            continue
+        try:
+            yield start, next(reader)
+        except csv.Error as e:
+            feed.lines.clear()
+            yield start, f"Invalid CSV: {e}"
+        start, length, quotes = None, 0, 0
+    if start is not None:
+        yield start, "Unterminated quoted field"
+
+
+async def iter_records(lines, fmt: str):
+    """Превращает строки NDJSON/CSV в (line_no, dict) или (line_no, текст ошибки)."""
+    if fmt == "csv":
+        header = None
+        async for line_no, values in iter_csv_rows(lines):
+            if isinstance(values, str):
+                yield line_no, values
+            elif header is None:
+                header = [name.strip() for name in values]
+            elif len(values) != len(header):
+                yield line_no, f"Expected {len(header)} columns, got {len(values)}"
+            else:
+                yield line_no, dict(zip(header, values))
+        return
+
+    async for line_no, line in lines:
+        if line is None:
+            yield line_no, "Line is too long"
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, "Expected a JSON object"
+            continue
+        yield line_no, record
+
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
+
+
+class ScoreIngest:
+    """Копит валидные строки в пакет и пишет их одной executemany-операцией с commit на пакет."""
+
+    def __init__(self, session: AsyncSession, batch_size: int = BULK_BATCH_SIZE,
+                 max_errors: int = BULK_MAX_ERRORS, cache: Optional[Cache] = None,
+                 events: Optional[EventBus] = None, source: Optional[str] = None,
+                 catalog: Optional[SubjectCatalog] = None, region: Optional[int] = None):
+        self.session = session
+        self.region = region  # регион запроса (X-Region) проставляется всем строкам
+        self.catalog = catalog if catalog is not None else get_subject_catalog()
+        self.cache = cache
+        self.events = events
+        self.source = source
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.report = BulkScoreReport()
+        # (student_id, subject, exam_year) -> (строка для upsert, номера строк входа);
+        # дубли внутри пакета схлопываются
+        self.batch: dict[tuple[int, str, int], tuple[dict, list[int]]] = {}
+
+    def add_error(self, line: int, detail: str):
+        self.report.failed += 1
+        if len(self.report.errors) < self.max_errors:
+            self.report.errors.append(BulkRowError(line=line, detail=detail))
+        else:
+            self.report.errors_truncated = True
+
+    async def add(self, line: int, record):
+        self.report.processed += 1
+        if isinstance(record, str):
+            self.add_error(line, record)
+            return
+        try:
+            row = BulkScoreRow.model_validate(record)
+        except ValidationError as e:
+            self.add_error(line, format_validation_error(e))
+            return
+
+        key = (row.student_id, row.subject, row.exam_year)
+        _, lines = self.batch.get(key, (None, []))
+        self.batch[key] = (row.model_dump(), lines + [line])
+        if len(self.batch) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        batch, self.batch = self.batch, {}
+        if not batch:
+            return
+
+        # Несуществующих студентов и предметы не из справочника отсекаем заранее,
+        # чтобы одна строка не роняла весь пакет по FK
+        student_ids = {student_id for student_id, _, _ in batch}
+        statement = select(Student.id).where(Student.id.in_(student_ids))
+        existing = set((await self.session.exec(statement)).all())
+        subject_ids = await self.catalog.ids(self.session, {subject for _, subject, _ in batch})
+
+        rows, written = [], 0
+        for (student_id, subject, exam_year), (row, lines) in batch.items():
+            if student_id not in existing:
+                error = "Student not found"
+            elif subject not in subject_ids:
+                error = f"Unknown subject: {subject}"
+            else:
+                rows.append({"student_id": student_id, "subject_id": subject_ids[subject], "score": row["score"],
+                             "exam_year": exam_year, "region": self.region})
+                written += len(lines)
+                continue
+            for line in lines:
+                self.add_error(line, error)
+
+        try:
+            upserted = await crud.upsert_scores(self.session, rows)
+            await self.session.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            for (student_id, subject, _), (_, lines) in batch.items():
+                if student_id in existing and subject in subject_ids:
+                    for line in lines:
+                        self.add_error(line, f"Database error: {e.__class__.__name__}")
+            return
+        self.report.upserted += written
+        if self.cache is not None:
+            await self.cache.mark_written(*(scores_key(row["student_id"]) for row in rows))
+        if self.events is not None:
+            await self.events.publish(score_events(upserted, await self.catalog.names(self.session), self.source))
+
+
+async def ingest_scores(session: AsyncSession, chunks: AsyncIterator[bytes], fmt: str,
+                        batch_size: int = BULK_BATCH_SIZE,
+                        max_errors: int = BULK_MAX_ERRORS,
+                        cache: Optional[Cache] = None, events: Optional[EventBus] = None,
+                        source: Optional[str] = None,
+                        catalog: Optional[SubjectCatalog] = None,
+                        region: Optional[int] = None) -> BulkScoreReport:
+    ingest = ScoreIngest(session, batch_size, max_errors, cache, events, source, catalog, region)
+    async for line_no, record in iter_records(iter_lines(chunks), fmt):
+        await ingest.add(line_no, record)
+    await ingest.flush()
+    return ingest.report
+
+
+def detect_format(content_type: Optional[str]) -> str:
+    if content_type and content_type.split(";")[0].strip() in ("text/csv", "application/csv"):
+        return "csv"
+    return "ndjson"
@@ -0,0 +1,231 @@
+"""Фоновые задачи: тяжёлая работа выполняется вне обработчика запроса.
+
+Эндпоинт ставит задачу (строка в таблице job) и сразу отвечает 202 с её id, статус и прогресс —
+GET /jobs/{id}. Задачи выполняет JobRunner: в каждом процессе API (JOBS_IN_PROCESS=1, по умолчанию)
+и/или в отдельном процессе `python -m api.worker`; все они разбирают одну и ту же таблицу.
+
+Задача захватывается условным UPDATE ... WHERE status = 'queued' (rowcount = 1 — наша), поэтому два
+исполнителя не возьмут одну задачу дважды. Одновременно выполняется не больше concurrency задач на
+исполнителя. Упавшая задача повторяется с паузой retry_delay * 2^(попытка - 1) до max_attempts; задача,
+чей исполнитель пропал (истекла аренда locked_until), возвращается в очередь.
+
+Обработчик — async-функция от JobContext, зарегистрированная через @job_handler(kind); возвращает
+JSON-совместимый dict (сохраняется в job.result) или None.
+
+Таблица job всегда в основной базе — её разбирают все исполнители. Задача для региона со своей базой
+хранит регион в params["region"], и JobContext.session() открывает сессию базы этого региона.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import aggregates
+from .db import env_flag, session_factory, shard_router
+from .models import Job
+from .responses import json_response
+from .schemas import JobOut
+from .subjects import get_subject_catalog
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+JobHandler = Callable[["JobContext"], Awaitable[Optional[dict]]]
+JOB_HANDLERS: dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str):
+    def register(handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+class JobContext:
+    """То, что видит обработчик: параметры задачи, сессии и отчёт о прогрессе"""
+
+    def __init__(self, runner: "JobRunner", job: Job):
+        self.runner = runner
+        self.id = job.id
+        self.params = job.params
+
+    def session(self) -> AsyncSession:
+        """Сессия базы, над которой работает задача (базы региона, если он со своей базой)"""
+        region = self.params.get("region")
+        if shard_router.routes(region):
+            return shard_router.session_factory(region)()
+        return self.runner.session_factory()
+
+    async def progress(self, done: int, total: Optional[int] = None) -> None:
+        # отдельной короткой транзакцией: прогресс виден, пока основная работа ещё не закоммичена;
+        # заодно продлевает аренду
+        values = {"progress": done, "locked_until": self.runner.clock() + self.runner.lease}
+        if total is not None:
+            values["total"] = total
+        async with self.runner.session_factory() as session:
+            await session.exec(update(Job).where(Job.id == self.id).values(**values))
+            await session.commit()
+
+
+def accepted(job: Job):
+    """202 Accepted со статусом задачи; Location — куда смотреть за прогрессом"""
+    response = json_response(JobOut.model_validate(job).model_dump(), status_code=202)
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return response
+
+
+class JobRunner:
+    def __init__(self, session_factory, concurrency: int = 2, poll_interval: float = 1.0, lease: float = 600,
+                 retry_delay: float = 5, clock=time.time):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval  # как часто смотреть в таблицу, если не разбудили раньше
+        self.lease = lease                  # сколько задача может молчать (без progress), прежде чем её заберут
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self.tasks: set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def enqueue(self, kind: str, params: Optional[dict] = None, max_attempts: int = 3) -> Job:
+        """Ставит задачу в очередь (с commit). Этот процесс берёт её сразу, остальные — за poll_interval."""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind!r}")
+        now = self.clock()
+        job = Job(kind=kind, params=params or {}, max_attempts=max_attempts, created_at=now, run_after=now)
+        async with self.session_factory() as session:
+            session.add(job)
+            await session.commit()
+        self.wake()
+        return job
+
+    async def get(self, job_id: int) -> Optional[Job]:
+        async with self.session_factory() as session:
+            return await session.get(Job, job_id)
+
+    async def start(self) -> None:
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        """Останавливает приём задач; выполняющиеся отменяются и после аренды достанутся другому исполнителю"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_pending()
+            except SQLAlchemyError:
+                logger.warning("Failed to poll job queue", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def run_pending(self) -> int:
+        """Захватывает готовые задачи в свободные слоты и запускает их. Возвращает число запущенных."""
+        free = self.concurrency - len(self.tasks)
+        if free <= 0:
+            return 0
+        jobs = await self.claim(free)
+        for job in jobs:
+            task = asyncio.create_task(self.execute(job))
+            self.tasks.add(task)
+            task.add_done_callback(self._finished)
+        return len(jobs)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+        self.wake()  # освободился слот
+
+    async def drain(self) -> None:
+        """Выполняет задачи, пока готовые к запуску не кончатся (worker --once и тесты)"""
+        while await self.run_pending() or self.tasks:
+            await asyncio.wait(self.tasks)
+
+    async def claim(self, limit: int) -> list[Job]:
+        now = self.clock()
+        async with self.session_factory() as session:
+            await self._release_abandoned(session, now)
+            candidates = (await session.exec(
+                select(Job.id).where(Job.status == QUEUED, Job.run_after <= now).order_by(Job.id).limit(limit)
+            )).all()
+            claimed = []
+            for job_id in candidates:
+                result = await session.exec(
+                    update(Job).where(Job.id == job_id, Job.status == QUEUED)
+                    .values(status=RUNNING, attempts=Job.attempts + 1, started_at=now,
+                            locked_until=now + self.lease))
+                if result.rowcount == 1:
+                    claimed.append(job_id)
+            await session.commit()
+            if not claimed:
+                return []
+            return list((await session.exec(select(Job).where(Job.id.in_(claimed)).order_by(Job.id))).all())
+
+    async def _release_abandoned(self, session: AsyncSession, now: float) -> None:
+        abandoned = (Job.status == RUNNING, Job.locked_until <= now)
+        await session.exec(update(Job).where(*abandoned, Job.attempts >= Job.max_attempts)
+                           .values(status=FAILED, error="Worker lost", finished_at=now, locked_until=None))
+        await session.exec(update(Job).where(*abandoned).values(status=QUEUED, run_after=now, locked_until=None))
+
+    async def execute(self, job: Job) -> None:
+        handler = JOB_HANDLERS.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for job kind {job.kind!r}")
+            result = await handler(JobContext(self, job))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Job %s (%s) failed, attempt %d of %d", job.id, job.kind, job.attempts,
+                             job.max_attempts)
+            now = self.clock()
+            values = {"error": f"{e.__class__.__name__}: {e}", "locked_until": None}
+            if job.attempts < job.max_attempts:
+                values.update(status=QUEUED, run_after=now + self.retry_delay * 2 ** (job.attempts - 1))
+            else:
+                values.update(status=FAILED, finished_at=now)
+        else:
+            values = {"status": SUCCEEDED, "result": result, "error": None, "finished_at": self.clock(),
+                      "locked_until": None}
+        async with self.session_factory() as session:
+            await session.exec(update(Job).where(Job.id == job.id).values(**values))
+            await session.commit()
+
+
+@job_handler("rebuild_histograms")
+async def rebuild_histograms(job: JobContext) -> dict:
+    async with job.session() as session:
+        return {"subjects": await aggregates.rebuild_histograms(session, job.progress)}
+
+
+@job_handler("check_consistency")
+async def check_consistency(job: JobContext) -> dict:
+    async with job.session() as session:
+        return await aggregates.consistency_report(session, get_subject_catalog())
+
+
+JOBS_IN_PROCESS = env_flag("JOBS_IN_PROCESS", True)
+job_runner = JobRunner(session_factory, concurrency=int(os.getenv("JOBS_CONCURRENCY", "2")),
+                       poll_interval=float(os.getenv("JOBS_POLL_INTERVAL", "1")))
+
+
+def get_job_runner() -> JobRunner:
+    return job_runner
@@ -0,0 +1,115 @@
+"""Запуск и остановка процесса API.
+
+Схемой БД управляет Alembic (alembic upgrade head до старта воркеров). create_all выполняется только
+в APP_ENV=development/test или с DB_CREATE_ALL=1: при N воркерах это N параллельных проходов DDL,
+которые к тому же гоняются с миграциями.
+
+На старте пул заранее открывает DB_POOL_WARM соединений и прогоняет на них горячие запросы: первые
+запросы пользователей не ждут TCP/TLS/аутентификацию, а SQLAlchemy (кэш компиляции) и asyncpg
+(кэш prepared statements на соединении) уже подготовили их. Пока старт не завершён, /health/ready
+отвечает 503 — балансировщик не шлёт запросы в непрогретый воркер.
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from time import perf_counter
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import IMPORT_STARTED
+from .db import env_flag
+from .events import get_event_bus
+from .jobs import JOBS_IN_PROCESS, get_job_runner
+from .models import Score, Student
+from .responses import select_schema
+from .schemas import StudentOut
+from .subjects import get_subject_catalog, seed_subjects, select_scores
+
+logger = logging.getLogger(__name__)
+
+APP_ENV = os.getenv("APP_ENV", "development")
+DB_CREATE_ALL = env_flag("DB_CREATE_ALL", APP_ENV in ("development", "test"))
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", "2"))
+
+
+def warmup_statements() -> list:
+    """Запросы горячих эндпоинтов в той же форме, что в роутерах; условия заведомо ничего не находят"""
+    return [
+        select(1),
+        select_schema(Student, StudentOut).where(Student.id == -1),
+        select_scores().where(Score.student_id == -1),
+    ]
+
+
+async def warm_pool(engine, connections: int, statements=()) -> int:
+    """Одновременно открывает connections соединений (иначе пул отдаст одно и то же) и прогоняет statements"""
+    if connections <= 0:
+        return 0
+    opened = await asyncio.gather(*(engine.connect() for _ in range(connections)), return_exceptions=True)
+    try:
+        for conn in opened:
+            if isinstance(conn, BaseException):
+                raise conn
+            for statement in statements:
+                await conn.execute(statement)
+            await conn.rollback()
+    finally:
+        for conn in opened:
+            if not isinstance(conn, BaseException):
+                await conn.close()
+    return len(opened)
+
+
+def create_lifespan(engines, create_schema: bool = DB_CREATE_ALL, warm_connections: int = DB_POOL_WARM,
+                    shards=(), run_jobs: bool = JOBS_IN_PROCESS):
+    """engines[0] — primary: на нём create_all; прогреваются все (реплика — если отличается от primary).
+
+    shards — базы регионов (api.db.shard_router): create_all и прогрев как у primary.
+    run_jobs — выполнять фоновые задачи в этом процессе (иначе их разбирает python -m api.worker).
+    """
+    shards = list(shards)
+    engines = list(dict.fromkeys([*engines, *shards]))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        app.state.ready = False
+        started = perf_counter()
+        app.state.import_seconds = started - IMPORT_STARTED
+        if create_schema:
+            for schema_engine in [engines[0], *shards]:
+                async with schema_engine.begin() as conn:
+                    await conn.run_sync(SQLModel.metadata.create_all)
+                    # в проде справочник заполняют миграции
+                    await seed_subjects(conn)
+        statements = warmup_statements()
+        await asyncio.gather(*(warm_pool(engine, warm_connections, statements) for engine in engines))
+        # справочник предметов нужен почти каждому запросу с баллами: читаем его до первого запроса;
+        # если не вышло, каталог загрузится при первом обращении
+        try:
+            async with AsyncSession(engines[0]) as session:
+                await get_subject_catalog().load(session)
+        except SQLAlchemyError:
+            logger.warning("Subject catalog was not preloaded", exc_info=True)
+        await get_event_bus().start()
+        if run_jobs:
+            await get_job_runner().start()
+        app.state.startup_seconds = perf_counter() - started
+        app.state.ready = True
+        logger.info("API ready: import %.0f ms, startup %.0f ms (APP_ENV=%s, create_all=%s, warm=%d)",
+                    app.state.import_seconds * 1000, app.state.startup_seconds * 1000, APP_ENV, create_schema,
+                    warm_connections)
+        try:
+            yield
+        finally:
+            app.state.ready = False
+            # будим висящие long-poll запросы, чтобы они ответили до остановки
+            await get_event_bus().close()
+            if run_jobs:
+                await get_job_runner().close()
+            for engine in engines:
+                await engine.dispose()
+
+    return lifespan
@@ -1,14 +1,81 @@
 from fastapi import FastAPI
-from sqlmodel import SQLModel
-from .db import engine
-from .routers import students, scores
+from fastapi.responses import PlainTextResponse
+from common.metrics import CONTENT_TYPE, Counter, Gauge, snapshot
+from .cache import get_cache
+from .db import engine, pool_stats, read_engine, shard_router
+from .idempotency import IdempotencyMiddleware
+from .lifespan import create_lifespan
+from .profiling import setup_profiling
+from .responses import DefaultJSONResponse
+from .metrics import MetricsMiddleware, api_metrics, registry
+from .routers import students, scores, leaderboard, stats, events, health, subjects, jobs, export
 
-app = FastAPI(title="EGE Scores API")
-
-# создаём таблицы при старте
-@app.on_event("startup")
-def on_startup():
-    SQLModel.metadata.create_all(engine)
+# схема (create_all только в dev/test), прогрев пула и готовность — в api.lifespan
+app = FastAPI(title="EGE Scores API", default_response_class=DefaultJSONResponse,
+              lifespan=create_lifespan([engine, read_engine], shards=shard_router.engines.values()))
+# add_middleware оборачивает снаружи: метрики видят и повторы, на которые ответил IdempotencyMiddleware
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(MetricsMiddleware, metrics=api_metrics)
+api_metrics.instrument_engine(engine)
+api_metrics.instrument_engine(read_engine)
+for shard_engine in shard_router.engines.values():
+    api_metrics.instrument_engine(shard_engine)
 
 app.include_router(students.router)
 app.include_router(scores.router)
+app.include_router(scores.collection_router)
+app.include_router(leaderboard.router)
+app.include_router(stats.router)
+app.include_router(events.router)
+app.include_router(health.router)
+app.include_router(subjects.router)
+app.include_router(jobs.router)
+app.include_router(export.router)
+
+
+@app.get("/cache/stats", tags=["cache"])
+async def cache_stats():
+    return get_cache().stats()
+
+
+@app.get("/db/pool", tags=["db"])
+async def db_pool_stats():
+    return pool_stats()
+
+
+def collect_pool_and_cache():
+    # пул и кэш читаются только при запросе /metrics, на горячем пути ничего не считается
+    pools = pool_stats()
+    yield snapshot(Gauge, "db_pool_connections", "Connections in the pool by state", ("engine", "state"), {
+        (name, state): stats[state] for name, stats in pools.items()
+        for state in ("size", "checked_out", "checked_in", "overflow") if state in stats
+    })
+    for field, documentation in (("checkouts", "Connections handed out by the pool"),
+                                 ("timeouts", "Pool checkout timeouts"),
+                                 ("wait_seconds", "Time spent waiting for a pool connection")):
+        key = "wait_seconds_total" if field == "wait_seconds" else field
+        yield snapshot(Counter, f"db_pool_{field}_total", documentation, ("engine",),
+                       {(name,): stats[key] for name, stats in pools.items()})
+
+    cache = get_cache().stats()
+    backend = cache["backend"]
+    yield snapshot(Counter, "cache_requests_total", "Cache lookups", ("backend", "result"),
+                   {(backend, "hit"): cache["hits"], (backend, "miss"): cache["misses"]})
+    if "size" in cache:
+        yield snapshot(Gauge, "cache_entries", "Entries in the cache", ("backend",), {(backend,): cache["size"]})
+
+    if getattr(app.state, "ready", False):
+        yield snapshot(Gauge, "app_startup_seconds", "Time to import the app and to run lifespan startup",
+                       ("phase",), {("import",): app.state.import_seconds, ("startup",): app.state.startup_seconds})
+
+
+registry.add_collector(collect_pool_and_cache)
+
+
+@app.get("/metrics", tags=["metrics"], response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+
+# в самом конце: оборачиваются уже подключённые маршруты
+setup_profiling(app, [engine, read_engine, *shard_router.engines.values()])
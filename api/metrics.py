@@ -0,0 +1,136 @@
+"""Метрики HTTP и БД в API. Типы метрик и формат вывода — common.metrics."""
+import contextvars
+from time import perf_counter
+from typing import Optional
+
+from sqlalchemy import event
+
+from common.metrics import Counter, CounterChild, Gauge, Histogram, Registry
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class QueryStats:
+    """Запросы к БД в рамках одного HTTP-запроса"""
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_query_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+
+
+class RouteSlot:
+    """Заранее созданные дочерние метрики одного маршрута"""
+    __slots__ = ("latency", "queries", "query_seconds", "statuses", "method", "route", "requests")
+
+    def __init__(self, metrics: "ApiMetrics", method: str, route: str):
+        self.method = method
+        self.route = route
+        self.requests = metrics.requests
+        self.latency = metrics.latency.labels(method, route)
+        self.queries = metrics.queries_per_request.labels(method, route)
+        self.query_seconds = metrics.query_seconds_per_request.labels(method, route)
+        self.statuses: dict[int, CounterChild] = {}
+
+    def status(self, code: int) -> CounterChild:
+        child = self.statuses.get(code)
+        if child is None:
+            child = self.statuses[code] = self.requests.labels(self.method, self.route, str(code))
+        return child
+
+
+class ApiMetrics:
+    def __init__(self, registry: Optional[Registry] = None):
+        self.registry = registry = registry or Registry()
+        labels = ("method", "route")
+        self.requests = Counter("http_requests_total", "HTTP requests", labels + ("status",), registry)
+        self.latency = Histogram("http_request_duration_seconds", "HTTP request latency", labels, registry)
+        self.in_flight = Gauge("http_requests_in_flight", "HTTP requests being processed", (), registry)
+        self.queries_per_request = Histogram("http_request_db_queries", "DB queries per HTTP request",
+                                             labels, registry, buckets=QUERY_COUNT_BUCKETS)
+        self.query_seconds_per_request = Histogram("http_request_db_duration_seconds",
+                                                   "Time spent in DB per HTTP request", labels, registry)
+        self.queries = Counter("db_queries_total", "DB queries", (), registry)
+        self.query_errors = Counter("db_query_errors_total", "Failed DB queries", (), registry)
+        self.query_latency = Histogram("db_query_duration_seconds", "DB query latency", (), registry)
+        self._slots: dict[tuple, RouteSlot] = {}
+        self._engines: set[int] = set()
+
+    def slot(self, method: str, route: str) -> RouteSlot:
+        key = (method, route)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = RouteSlot(self, method, route)
+        return slot
+
+    def instrument_engine(self, engine):
+        """Подписка на события движка: время каждого запроса и привязка к текущему HTTP-запросу"""
+        sync_engine = getattr(engine, "sync_engine", engine)
+        if id(sync_engine) in self._engines:
+            return
+        self._engines.add(id(sync_engine))
+        event.listen(sync_engine, "before_cursor_execute", self._before_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_execute)
+        event.listen(sync_engine, "handle_error", self._on_error)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - context._metrics_started
+        self.queries.inc()
+        self.query_latency.observe(elapsed)
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+    def _on_error(self, exception_context):
+        self.query_errors.inc()
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: счётчики, латентность и запросы к БД по шаблону маршрута"""
+
+    def __init__(self, app, metrics: ApiMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        status_code = 500
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        metrics.in_flight.inc()
+        started = perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - started
+            metrics.in_flight.dec()
+            _query_stats.reset(token)
+            # FastAPI кладёт найденный маршрут в scope; сырой путь как метку не берём — он с id
+            route = scope.get("route")
+            slot = metrics.slot(scope["method"], getattr(route, "path", "<unmatched>"))
+            slot.status(status_code).inc()
+            slot.latency.observe(elapsed)
+            slot.queries.observe(stats.count)
+            slot.query_seconds.observe(stats.seconds)
+
+
+registry = Registry()
+api_metrics = ApiMetrics(registry)
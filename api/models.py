@@ -1,18 +1,113 @@
 from typing import Optional, List
-from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import JSON, BigInteger, Index, Integer, Sequence, SmallInteger, UniqueConstraint
+from sqlmodel import AutoString, SQLModel, Field, Relationship
+
+# в SQLite автоинкремент есть только у INTEGER PRIMARY KEY, в Postgres это SMALLSERIAL
+SubjectId = SmallInteger().with_variant(Integer(), "sqlite")
+
+
+# seq событий api.events при EVENTS_BACKEND=postgres; в SQLite не создаётся
+score_events_seq = Sequence("score_events_seq", metadata=SQLModel.metadata)
+
+
+class Subject(SQLModel, table=True):
+    """Справочник предметов: в score и гистограммах хранится короткий целый id вместо названия."""
+    id: Optional[int] = Field(default=None, primary_key=True, sa_type=SubjectId)
+    name: str = Field(max_length=50, unique=True)
+
 
 class Score(SQLModel, table=True):
+    # В Postgres таблица секционирована по exam_year (миграция eb53ce55cc1d): запрос с условием на год
+    # читает только секцию своего года. Там же первичный ключ (id, exam_year) — ключ секционирования
+    # обязан входить в уникальные ограничения; здесь он не указан, чтобы в SQLite id оставался rowid.
+    __table_args__ = (
+        # один результат на предмет в год: на этом индексе держится upsert через ON CONFLICT
+        UniqueConstraint("student_id", "subject_id", "exam_year", name="uq_score_student_subject_year"),
+        # фильтр по предмету + keyset-пагинация по id в GET /scores/
+        Index("ix_score_subject_id", "subject_id", "id"),
+        # предмет + диапазон баллов в GET /scores/: страницы по (score, id)
+        Index("ix_score_subject_score_id", "subject_id", "score", "id"),
+        # топ-N по предмету за год
+        Index("ix_score_subject_score", "exam_year", "subject_id", "score"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    subject: str
+    # название предмета наружу отдаёт api.subjects.SubjectCatalog, join со справочником не нужен
+    subject_id: int = Field(foreign_key="subject.id", sa_type=SmallInteger)
     score: int
+    exam_year: int = Field(sa_type=SmallInteger)
+    # код субъекта РФ из заголовка X-Region; по нему же api.db.ShardRouter выбирает базу
+    region: Optional[int] = Field(default=None, sa_type=SmallInteger)
 
+    # отдельный индекс не нужен: student_id — первая колонка uq_score_student_subject_year
     student_id: int = Field(foreign_key="student.id")
-    student: "Student" = Relationship(back_populates="scores")
+    # lazy="raise": связь грузится только явно (selectinload/joinedload), случайная ленивая загрузка —
+    # это лишний запрос на каждый объект, а в async-сессии ещё и MissingGreenlet
+    student: "Student" = Relationship(back_populates="scores", sa_relationship_kwargs={"lazy": "raise"})
 
 
 class Student(SQLModel, table=True):
+    __table_args__ = (
+        # поиск по префиксу фамилии диапазоном last_name >= 'Ив' AND < 'Иг' со страницами по (last_name, id)
+        Index("ix_student_last_name_id", "last_name", "id"),
+        # один студент на аккаунт Telegram: повторная регистрация из бота не создаёт дубль; NULL не конфликтуют
+        Index("ix_student_telegram_id", "telegram_id", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     first_name: str
-    last_name: str
+    # в Postgres побайтовое сравнение (COLLATE "C", как BINARY в SQLite): только тогда строки с префиксом
+    # образуют непрерывный диапазон индекса
+    last_name: str = Field(sa_type=AutoString().with_variant(AutoString(collation="C"), "postgresql"))
+    telegram_id: Optional[int] = Field(default=None, sa_type=BigInteger)
+
+    scores: List[Score] = Relationship(back_populates="student",
+                                       sa_relationship_kwargs={"lazy": "raise", "order_by": "Score.id"})
 
-    scores: List[Score] = Relationship(back_populates="student")
+
+class SubjectScoreCount(SQLModel, table=True):
+    """Гистограмма баллов по предмету за год: сколько результатов с каждым баллом 0..100."""
+    __tablename__ = "subject_score_count"
+
+    exam_year: int = Field(primary_key=True, sa_type=SmallInteger)
+    subject_id: int = Field(primary_key=True, foreign_key="subject.id", sa_type=SmallInteger)
+    score: int = Field(primary_key=True)
+    count: int = 0
+
+
+class IdempotencyRecord(SQLModel, table=True):
+    """Сохранённый ответ на запрос с Idempotency-Key; status_code NULL — запрос ещё выполняется."""
+    __tablename__ = "idempotency_key"
+
+    key: str = Field(primary_key=True, max_length=255)
+    fingerprint: str = Field(max_length=64)  # sha256 метода, пути, query, X-Region и тела: другой запрос — ошибка
+    status_code: Optional[int] = None
+    content_type: Optional[str] = None
+    body: Optional[str] = None
+    # unix time: до этого момента действует блокировка выполняющегося запроса или хранится ответ
+    expires_at: float = Field(index=True)
+
+
+class Job(SQLModel, table=True):
+    """Фоновая задача api.jobs: статус, прогресс и результат видны через GET /jobs/{id} и переживают рестарт."""
+    __table_args__ = (
+        # выбор следующей задачи исполнителем: WHERE status = 'queued' AND run_after <= now ORDER BY id
+        Index("ix_job_status_run_after", "status", "run_after"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(max_length=50)
+    status: str = Field(default="queued", max_length=20)  # queued / running / succeeded / failed
+    params: dict = Field(default_factory=dict, sa_type=JSON)
+    result: Optional[dict] = Field(default=None, sa_type=JSON)
+    error: Optional[str] = None
+    progress: int = 0
+    total: Optional[int] = None
+    attempts: int = 0
+    max_attempts: int = 3
+    # unix time, как в idempotency_key
+    created_at: float
+    run_after: float                      # не раньше этого момента: пауза перед повтором
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    locked_until: Optional[float] = None  # аренда исполнителя: после неё задача считается брошенной
@@ -0,0 +1,65 @@
+from typing import Literal, Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import tuple_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+Order = Literal["asc", "desc"]
+
+
+class KeysetParams:
+    """Параметры keyset-пагинации: страница начинается строго после курсора, без OFFSET."""
+
+    def __init__(
+        self,
+        after: Optional[str] = Query(None, max_length=200, description="next_cursor предыдущей страницы"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        order: Order = "asc",
+    ):
+        self.after = after
+        self.limit = limit
+        self.order = order
+
+
+def decode_cursor(cursor: str, sort_column=None) -> tuple:
+    """Курсор "42" -> (42,); при сортировке по колонке "<значение>:<id>" -> (значение, id)"""
+    try:
+        if sort_column is None:
+            return (int(cursor),)
+        value, separator, row_id = cursor.rpartition(":")
+        if not separator:
+            raise ValueError(cursor)
+        # AutoString (TypeDecorator) сам python_type не знает — берём у его impl
+        column_type = getattr(sort_column.type, "impl", sort_column.type)
+        return column_type.python_type(value), int(row_id)
+    except ValueError:
+        raise HTTPException(422, "Invalid cursor")
+
+
+def encode_cursor(row, sort_column=None) -> str:
+    if sort_column is None:
+        return str(row.id)
+    return f"{getattr(row, sort_column.key)}:{row.id}"
+
+
+async def fetch_page(session: AsyncSession, statement, id_column, params: KeysetParams, sort_column=None):
+    """Выполняет statement с условием по курсору; возвращает (строки страницы, next_cursor).
+
+    Без sort_column страницы идут по id. С sort_column — по (sort_column, id): нужен, когда фильтр выбирает
+    узкий диапазон этой колонки, тогда индекс (..., sort_column, id) отдаёт страницу одним проходом по
+    диапазону, а не перебором всей таблицы по id или сортировкой всех совпадений.
+    """
+    keys = (id_column,) if sort_column is None else (sort_column, id_column)
+    if params.after is not None:
+        position, cursor = tuple_(*keys), tuple_(*decode_cursor(params.after, sort_column))
+        statement = statement.where(position > cursor if params.order == "asc" else position < cursor)
+    ordering = [key.asc() if params.order == "asc" else key.desc() for key in keys]
+    # берём на одну строку больше, чтобы узнать, есть ли следующая страница
+    rows = (await session.exec(statement.order_by(*ordering).limit(params.limit + 1))).all()
+    if len(rows) > params.limit:
+        rows = rows[:params.limit]
+        return rows, encode_cursor(rows[-1], sort_column)
+    return rows, None
@@ -0,0 +1,301 @@
+"""Профилирование запросов и трассировка медленных SQL.
+
+Всё включается переменными окружения и при выключенном режиме ничего не добавляет в обработку запроса:
+
+- PROFILING=1 — middleware с разбивкой времени запроса (заголовок Server-Timing) и профилированием
+  выборки запросов: доля PROFILE_SAMPLE_RATE или запросы с заголовком X-Profile: 1.
+  Профиль (pyinstrument, если установлен, иначе cProfile) пишется в PROFILE_DIR.
+- SLOW_QUERY_MS=200 — запросы к БД дольше порога логируются вместе с EXPLAIN.
+"""
+import contextvars
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import random
+import time
+from time import perf_counter
+from typing import Optional
+
+from fastapi.routing import APIRoute, request_response
+from sqlalchemy import event
+
+from .db import env_flag
+
+logger = logging.getLogger(__name__)
+
+PROFILING = env_flag("PROFILING")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/api-profiles")
+SLOW_QUERY_MS = os.getenv("SLOW_QUERY_MS")
+
+# заголовок прокси (nginx: proxy_set_header X-Request-Start "t=${msec}") — из него считается ожидание в очереди
+REQUEST_START_HEADER = b"x-request-start"
+
+
+class RequestTrace:
+    """Отметки времени одного запроса; все значения — perf_counter()"""
+    __slots__ = ("started", "queue_seconds", "endpoint_started", "endpoint_finished", "response_started",
+                 "db_seconds", "queries")
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queue_seconds: Optional[float] = None
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+        self.response_started: Optional[float] = None
+        self.db_seconds = 0.0
+        self.queries: list[tuple[str, float]] = []
+
+    def spans(self) -> dict[str, float]:
+        """Разбивка в секундах: deps — тело, зависимости (в т.ч. синхронные через threadpool) до эндпоинта;
+        endpoint — сам эндпоинт вместе с db; serialize — валидация и рендер ответа."""
+        end = self.response_started or perf_counter()
+        spans = {}
+        if self.queue_seconds is not None:
+            spans["queue"] = self.queue_seconds
+        if self.endpoint_started is not None:
+            spans["deps"] = self.endpoint_started - self.started
+            if self.endpoint_finished is not None:
+                spans["endpoint"] = self.endpoint_finished - self.endpoint_started
+                spans["serialize"] = end - self.endpoint_finished
+        spans["db"] = self.db_seconds
+        spans["total"] = end - self.started
+        return spans
+
+    def server_timing(self) -> str:
+        parts = []
+        for name, seconds in self.spans().items():
+            part = f"{name};dur={seconds * 1000:.2f}"
+            if name == "db":
+                part += f';desc="{len(self.queries)} queries"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace",
+                                                                                       default=None)
+
+
+def parse_request_start(value: bytes) -> Optional[float]:
+    """Время ожидания до приложения по X-Request-Start (t=секунды, миллисекунды или микросекунды)"""
+    try:
+        started = float(value.decode().removeprefix("t="))
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, time.time() - started)
+
+
+# ----- эндпоинты -----
+
+def traced_endpoint(call):
+    """Обёртка, отмечающая начало и конец эндпоинта в текущем trace"""
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.endpoint_started = perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                if trace is not None:
+                    trace.endpoint_finished = perf_counter()
+    else:
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            # синхронный эндпоинт работает в threadpool: contextvars копируются туда, trace тот же
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.endpoint_started = perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                if trace is not None:
+                    trace.endpoint_finished = perf_counter()
+    return wrapper
+
+
+def trace_endpoints(app):
+    """Оборачивает эндпоинты всех маршрутов; вызывается только в режиме профилирования"""
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not getattr(route.dependant.call, "_traced", False):
+            route.dependant.call = traced_endpoint(route.dependant.call)
+            route.dependant.call._traced = True
+            route.app = request_response(route.get_route_handler())
+
+
+# ----- SQL -----
+
+class QueryTracer:
+    """Время каждого запроса: в trace текущего HTTP-запроса и в лог, если дольше порога"""
+
+    def __init__(self, slow_query_ms: Optional[float] = None, explain: bool = True):
+        self.slow_query_seconds = slow_query_ms / 1000 if slow_query_ms is not None else None
+        self.explain = explain
+
+    def instrument_engine(self, engine):
+        sync_engine = getattr(engine, "sync_engine", engine)
+        if event.contains(sync_engine, "after_cursor_execute", self._after_execute):
+            return
+        event.listen(sync_engine, "before_cursor_execute", self._before_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._trace_started = perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("explaining"):
+            return
+        elapsed = perf_counter() - context._trace_started
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.db_seconds += elapsed
+            trace.queries.append((statement, elapsed))
+        if self.slow_query_seconds is not None and elapsed >= self.slow_query_seconds:
+            self._log_slow(conn, statement, parameters, elapsed, executemany)
+
+    def _log_slow(self, conn, statement, parameters, elapsed, executemany):
+        plan = None
+        if self.explain and not executemany:
+            plan = self._explain(conn, statement, parameters)
+        logger.warning("Slow query %.1f ms: %s\nparams: %.500r%s", elapsed * 1000, statement, parameters,
+                       f"\nplan:\n{plan}" if plan else "")
+
+    def _explain(self, conn, statement, parameters) -> Optional[str]:
+        # обычный EXPLAIN (без ANALYZE) не выполняет запрос, поэтому безопасен и для INSERT/UPDATE
+        prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+        conn.info["explaining"] = True
+        try:
+            rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+        except Exception as e:
+            return f"EXPLAIN failed: {e!r}"
+        finally:
+            conn.info["explaining"] = False
+        return "\n".join(" | ".join(str(value) for value in row) for row in rows)
+
+
+# ----- профайлер -----
+
+class RequestProfiler:
+    """Профиль одного запроса. pyinstrument, если установлен, иначе cProfile.
+
+    cProfile видит всё, что выполняется в потоке, поэтому одновременно профилируется только один запрос.
+    """
+
+    active = False
+
+    def __init__(self, output_dir: str = PROFILE_DIR):
+        self.output_dir = output_dir
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            self.profiler = cProfile.Profile()
+            self.kind = "cprofile"
+        else:
+            self.profiler = Profiler(async_mode="enabled")
+            self.kind = "pyinstrument"
+
+    def start(self):
+        RequestProfiler.active = True
+        if self.kind == "pyinstrument":
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        try:
+            if self.kind == "pyinstrument":
+                self.profiler.stop()
+            else:
+                self.profiler.disable()
+        finally:
+            RequestProfiler.active = False
+
+    def save(self, name: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.kind == "pyinstrument":
+            path = os.path.join(self.output_dir, name + ".html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.profiler.output_html())
+        else:
+            # смотреть: python -m pstats файл или snakeviz
+            path = os.path.join(self.output_dir, name + ".prof")
+            self.profiler.dump_stats(path)
+        return path
+
+
+class ProfilingMiddleware:
+    """Server-Timing для каждого запроса и профиль для выборки запросов"""
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE, header: str = PROFILE_HEADER,
+                 output_dir: str = PROFILE_DIR):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode()
+        self.output_dir = output_dir
+
+    def sampled(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return value not in (b"0", b"")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        for name, value in scope["headers"]:
+            if name == REQUEST_START_HEADER:
+                trace.queue_seconds = parse_request_start(value)
+        token = _current_trace.set(trace)
+
+        profiler = None
+        if self.sampled(scope) and not RequestProfiler.active:
+            profiler = RequestProfiler(self.output_dir)
+        profile_name = None
+        if profiler is not None:
+            profile_name = f"{int(time.time() * 1000)}-{scope['method']}-{scope['path'].strip('/').replace('/', '_')}"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                trace.response_started = perf_counter()
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                if profile_name is not None:
+                    headers.append((b"x-profile-id", profile_name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if profiler is not None:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+                path = profiler.save(profile_name)
+                logger.info("Profile for %s %s saved to %s", scope["method"], scope["path"], path)
+            _current_trace.reset(token)
+            spans = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in trace.spans().items())
+            logger.info("%s %s %s queries=%d", scope["method"], scope["path"], spans, len(trace.queries))
+
+
+def setup_profiling(app, engines):
+    """Подключает профилирование по настройкам окружения; без них приложение не меняется"""
+    if SLOW_QUERY_MS or PROFILING:
+        tracer = QueryTracer(float(SLOW_QUERY_MS) if SLOW_QUERY_MS else None,
+                             explain=env_flag("SLOW_QUERY_EXPLAIN", True))
+        for engine in engines:
+            tracer.instrument_engine(engine)
+    if PROFILING:
+        app.add_middleware(ProfilingMiddleware)
+        trace_endpoints(app)
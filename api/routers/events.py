@@ -0,0 +1,20 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from ..events import EventBus, get_event_bus
+from ..schemas import EventPage
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+@router.get("/", response_model=EventPage)
+async def poll_events(
+    since: Optional[int] = Query(None, ge=0),
+    timeout: float = Query(25, ge=0, le=60),
+    limit: int = Query(100, ge=1, le=1000),
+    bus: EventBus = Depends(get_event_bus),
+):
+    # Long-poll: ответ приходит сразу, если есть события новее since, иначе ждём до timeout секунд.
+    # Без since — только текущий last_seq, чтобы подписаться с этого момента.
+    if since is None:
+        return {"events": [], "last_seq": bus.visible_seq()}
+    return await bus.wait(since, timeout, limit)
@@ -0,0 +1,41 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .. import export
+from ..db import get_read_session
+from ..schemas import MAX_EXAM_YEAR, MIN_EXAM_YEAR
+from ..subjects import SubjectCatalog, get_subject_catalog
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+@router.get("/scores", response_class=StreamingResponse)
+async def export_scores(
+    format: Literal["csv", "ndjson", "parquet", "arrow"] = "csv",
+    gzip: bool = Query(False, description="сжать поток gzip (файл .gz)"),
+    subject: Optional[str] = Query(None, min_length=1, max_length=50),
+    exam_year: Optional[int] = Query(None, ge=MIN_EXAM_YEAR, le=MAX_EXAM_YEAR),
+    region: Optional[int] = Query(None, ge=1, le=999),
+    min_id: Optional[int] = Query(None, ge=1, description="с этого id баллов включительно — продолжение выгрузки"),
+    max_id: Optional[int] = Query(None, ge=1),
+    session: AsyncSession = Depends(get_read_session),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
+):
+    # Полная выгрузка одним запросом вместо get_student + list_scores на каждого студента.
+    # Сессия живёт, пока отдаётся тело: FastAPI закрывает yield-зависимости после ответа
+    if format in export.COLUMNAR_FORMATS and export.pyarrow is None:
+        raise HTTPException(501, f"format={format} requires the 'pyarrow' package")
+    subject_id = None
+    if subject is not None:
+        subject_id = (await catalog.ids(session, [subject])).get(subject)
+        if subject_id is None:
+            raise HTTPException(422, f"Unknown subject: {subject}")
+
+    statement = export.select_export(subject_id, exam_year, region, min_id, max_id)
+    filename = f"scores.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export.export_chunks(export.iter_batches(session, statement, catalog), format, gzip),
+        media_type="application/gzip" if gzip else export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
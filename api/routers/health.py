@@ -0,0 +1,33 @@
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends, Request
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from ..db import get_session
+from ..responses import json_response
+
+router = APIRouter(prefix="/health", tags=["health"])
+logger = logging.getLogger(__name__)
+
+# readiness не должна висеть дольше, чем ждёт балансировщик
+READY_DB_TIMEOUT = 2.0
+
+@router.get("/live")
+async def live():
+    # процесс жив и обслуживает event loop; БД не проверяем, иначе её сбой перезапустит все воркеры
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def ready(request: Request, session: AsyncSession = Depends(get_session)):
+    state = request.app.state
+    if not getattr(state, "ready", False):
+        return json_response({"status": "starting"}, status_code=503)
+    try:
+        await asyncio.wait_for(session.exec(select(1)), READY_DB_TIMEOUT)
+    except Exception:
+        # подробности ошибки (адрес БД, драйвер) — только в лог: эндпоинт доступен снаружи
+        logger.exception("Readiness check failed: database")
+        return json_response({"status": "unavailable", "check": "database"}, status_code=503)
+    return {"status": "ready", "import_ms": round(state.import_seconds * 1000, 1),
+            "startup_ms": round(state.startup_seconds * 1000, 1)}
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends, HTTPException
+from ..jobs import JobRunner, get_job_runner
+from ..schemas import JobOut
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(job_id: int, runner: JobRunner = Depends(get_job_runner)):
+    # задачи всех регионов — в основной базе, заголовок X-Region здесь не важен
+    job = await runner.get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
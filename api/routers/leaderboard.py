@@ -0,0 +1,73 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .. import aggregates, jobs
+from ..db import get_session, request_region
+from ..jobs import JobRunner, get_job_runner
+from ..models import Score, Student
+from ..schemas import (MAX_EXAM_YEAR, MIN_EXAM_YEAR, JobOut, LeaderboardEntry, LeaderboardOut, RankOut,
+                       current_exam_year)
+from ..subjects import SubjectCatalog, get_subject_catalog
+
+router = APIRouter(tags=["leaderboard"])
+
+@router.get("/leaderboard/{subject}", response_model=LeaderboardOut)
+async def get_leaderboard(subject: str, limit: int = Query(10, ge=1, le=100),
+                          exam_year: Optional[int] = Query(None, ge=MIN_EXAM_YEAR, le=MAX_EXAM_YEAR),
+                          session: AsyncSession = Depends(get_session),
+                          catalog: SubjectCatalog = Depends(get_subject_catalog)):
+    # рейтинг считается внутри одного года: баллы разных лет между собой не сравниваются
+    exam_year = exam_year or current_exam_year()
+    subject_id = (await catalog.ids(session, [subject])).get(subject)
+    histogram = None
+    if subject_id is not None:
+        histogram = (await aggregates.load_histograms(session, exam_year, [subject_id])).get(subject_id)
+    if histogram is None:
+        return LeaderboardOut(subject=subject, exam_year=exam_year, total=0, top=[])
+
+    # топ-N читается по индексу (exam_year, subject_id, score), место — по гистограмме
+    statement = (select(Score.student_id, Score.score)
+                 .where(Score.exam_year == exam_year, Score.subject_id == subject_id)
+                 .order_by(Score.score.desc(), Score.id)
+                 .limit(limit))
+    top = [
+        LeaderboardEntry(rank=aggregates.rank_in(histogram, score)["rank"], student_id=student_id, score=score)
+        for student_id, score in (await session.exec(statement)).all()
+    ]
+    return LeaderboardOut(subject=subject, exam_year=exam_year, total=sum(histogram), top=top)
+
+@router.get("/students/{student_id}/rank", response_model=list[RankOut])
+async def get_student_rank(student_id: int,
+                           exam_year: Optional[int] = Query(None, ge=MIN_EXAM_YEAR, le=MAX_EXAM_YEAR),
+                           session: AsyncSession = Depends(get_session),
+                           catalog: SubjectCatalog = Depends(get_subject_catalog)):
+    student = await session.get(Student, student_id)
+    if not student:
+        raise HTTPException(404, "Student not found")
+
+    exam_year = exam_year or current_exam_year()
+    statement = select(Score.subject_id, Score.score).where(Score.student_id == student_id,
+                                                            Score.exam_year == exam_year)
+    scores = (await session.exec(statement)).all()
+    subject_ids = [subject_id for subject_id, _ in scores]
+    histograms = await aggregates.load_histograms(session, exam_year, subject_ids)
+    names = await catalog.names(session, subject_ids)
+    return [
+        RankOut(subject=names[subject_id], exam_year=exam_year, score=score,
+                **aggregates.rank_in(histograms[subject_id], score))
+        for subject_id, score in scores
+        if subject_id in histograms
+    ]
+
+@router.post("/leaderboard/rebuild", responses={202: {"model": JobOut}})
+async def rebuild_leaderboard(background: bool = Query(False, description="202 и задача вместо ожидания пересчёта"),
+                              region: Optional[int] = Depends(request_region),
+                              session: AsyncSession = Depends(get_session),
+                              runner: JobRunner = Depends(get_job_runner)):
+    # пересчёт с нуля из таблицы score — на случай ручных правок в базе
+    if background:
+        job = await runner.enqueue("rebuild_histograms", {"region": region})
+        return jobs.accepted(job)
+    return {"subjects": await aggregates.rebuild_histograms(session)}
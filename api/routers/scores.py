@@ -1,34 +1,152 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from ..db import get_session
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .. import crud, ingest
+from ..cache import Cache, get_region_cache, scores_key
+from ..db import get_read_session, get_session, request_region
+from ..events import EventBus, event_source, get_region_event_bus, score_events
 from ..models import Student, Score
-from ..schemas import ScoreCreate, ScoreOut
+from ..pagination import KeysetParams, fetch_page
+from ..responses import json_response
+from ..schemas import (MAX_EXAM_YEAR, MIN_EXAM_YEAR, BulkScoreReport, ScoreBatch, ScoreCreate, ScoreOut,
+                       ScorePage)
+from ..subjects import SubjectCatalog, get_subject_catalog, score_dicts, select_scores
 
 router = APIRouter(prefix="/students/{student_id}/scores", tags=["scores"])
+# Операции над всеми баллами сразу, без привязки к одному студенту
+collection_router = APIRouter(prefix="/scores", tags=["scores"])
+
+
+async def subject_ids(catalog: SubjectCatalog, session: AsyncSession, names: list[str]) -> dict[str, int]:
+    ids = await catalog.ids(session, names)
+    unknown = [name for name in names if name not in ids]
+    if unknown:
+        raise HTTPException(422, f"Unknown subject: {', '.join(unknown)}")
+    return ids
 
 @router.post("/", response_model=ScoreOut)
-def upsert_score(student_id: int, payload: ScoreCreate, session: Session = Depends(get_session)):
-    student = session.get(Student, student_id)
-    if not student:
+async def upsert_score(student_id: int, payload: ScoreCreate, session: AsyncSession = Depends(get_session),
+                       cache: Cache = Depends(get_region_cache), events: EventBus = Depends(get_region_event_bus),
+                       source: Optional[str] = Depends(event_source),
+                       region: Optional[int] = Depends(request_region),
+                       catalog: SubjectCatalog = Depends(get_subject_catalog)):
+    subject_id = (await subject_ids(catalog, session, [payload.subject]))[payload.subject]
+    # Атомарный upsert одним запросом: гонка двух одинаковых запросов больше не даёт дублей
+    try:
+        score = await crud.upsert_score(session, student_id, subject_id, payload.score, payload.exam_year, region)
+    except IntegrityError:
+        # предмет уже проверен, поэтому сработать может только внешний ключ на student
+        await session.rollback()
         raise HTTPException(404, "Student not found")
+    await cache.mark_written(scores_key(student_id))
+    names = await catalog.names(session)
+    await events.publish(score_events([score], names, source))
+    return json_response(score_dicts([score], names)[0])
 
-    # Поиск существующего результата
-    statement = select(Score).where(Score.student_id == student_id, Score.subject == payload.subject)
-    score = session.exec(statement).first()
-
-    if score:
-        score.score = payload.score
-    else:
-        score = Score(subject=payload.subject, score=payload.score, student_id=student_id)
-        session.add(score)
+@router.post("/batch", response_model=list[ScoreOut])
+async def upsert_scores_batch(student_id: int, payload: ScoreBatch, session: AsyncSession = Depends(get_session),
+                              cache: Cache = Depends(get_region_cache),
+                              events: EventBus = Depends(get_region_event_bus),
+                              source: Optional[str] = Depends(event_source),
+                              region: Optional[int] = Depends(request_region),
+                              catalog: SubjectCatalog = Depends(get_subject_catalog)):
+    ids = await subject_ids(catalog, session, [score.subject for score in payload.scores])
+    # все предметы одним executemany и одной транзакцией вместо запроса на каждый предмет
+    rows = [{"student_id": student_id, "subject_id": ids[score.subject], "score": score.score,
+             "exam_year": score.exam_year, "region": region}
+            for score in payload.scores]
+    try:
+        written = await crud.upsert_scores(session, rows)
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(404, "Student not found")
+    await cache.mark_written(scores_key(student_id))
+    names = await catalog.names(session)
+    await events.publish(score_events(written, names, source))
+    return json_response(score_dicts(sorted(written, key=lambda row: row.id), names))
 
-    session.commit()
-    session.refresh(score)
-    return score
+def for_year(scores: list[dict], exam_year: Optional[int]) -> list[dict]:
+    return scores if exam_year is None else [score for score in scores if score["exam_year"] == exam_year]
 
 @router.get("/", response_model=list[ScoreOut])
-def list_scores(student_id: int, session: Session = Depends(get_session)):
-    student = session.get(Student, student_id)
-    if not student:
+async def list_scores(student_id: int,
+                      exam_year: Optional[int] = Query(None, ge=MIN_EXAM_YEAR, le=MAX_EXAM_YEAR,
+                                                       description="только за этот год; по умолчанию — все годы"),
+                      session: AsyncSession = Depends(get_read_session),
+                      primary: AsyncSession = Depends(get_session),
+                      cache: Cache = Depends(get_region_cache),
+                      catalog: SubjectCatalog = Depends(get_subject_catalog)):
+    # в кэше все годы студента (их единицы), год отбирается уже из него
+    cached = await cache.get(scores_key(student_id))
+    if cached is not None:
+        return json_response(for_year(cached, exam_year))
+    # промах читается с реплики, но сразу после upsert (сохранить и тут же /view_scores в боте) — из primary:
+    # реплика могла не догнать, и отставший список прожил бы в кэше весь CACHE_TTL
+    if await cache.written(scores_key(student_id)):
+        session = primary
+
+    # только нужные колонки: строки сразу становятся словарями, без ORM-объектов и повторной валидации;
+    # название предмета берётся из каталога в памяти, а не join'ом со справочником
+    rows = (await session.exec(select_scores().where(Score.student_id == student_id))).all()
+    data = score_dicts(rows, await catalog.names(session, {row.subject_id for row in rows}))
+    # существование студента проверяем, только если баллов нет
+    if not data and await session.get(Student, student_id) is None:
         raise HTTPException(404, "Student not found")
-    return student.scores
\ No newline at end of file
+    await cache.set(scores_key(student_id), data)
+    return json_response(for_year(data, exam_year))
+
+
+@collection_router.get("/", response_model=ScorePage)
+async def list_all_scores(
+    page: KeysetParams = Depends(),
+    subject: Optional[str] = Query(None, min_length=1, max_length=50),
+    min_score: Optional[int] = Query(None, ge=0, le=100),
+    max_score: Optional[int] = Query(None, ge=0, le=100),
+    exam_year: Optional[int] = Query(None, ge=MIN_EXAM_YEAR, le=MAX_EXAM_YEAR),
+    region: Optional[int] = Query(None, ge=1, le=999),
+    session: AsyncSession = Depends(get_read_session),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
+):
+    statement = select_scores()
+    if exam_year is not None:
+        # в Postgres условие на ключ секционирования: читается только секция этого года
+        statement = statement.where(Score.exam_year == exam_year)
+    if region is not None:
+        statement = statement.where(Score.region == region)
+    if subject is not None:
+        subject_id = (await catalog.ids(session, [subject])).get(subject)
+        if subject_id is None:
+            return json_response({"items": [], "next_cursor": None})
+        statement = statement.where(Score.subject_id == subject_id)
+    if min_score is not None:
+        statement = statement.where(Score.score >= min_score)
+    if max_score is not None:
+        statement = statement.where(Score.score <= max_score)
+    # предмет + диапазон баллов: страницы по (score, id) по индексу ix_score_subject_score_id. Диапазон без
+    # предмета идёт по id и фильтрует по пути — на узком диапазоне это не постоянная стоимость страницы
+    ranged = subject is not None and (min_score is not None or max_score is not None)
+    items, next_cursor = await fetch_page(session, statement, Score.id, page, Score.score if ranged else None)
+    names = await catalog.names(session, {row.subject_id for row in items})
+    return json_response({"items": score_dicts(items, names), "next_cursor": next_cursor})
+
+
+@collection_router.post("/bulk", response_model=BulkScoreReport)
+async def bulk_upsert_scores(
+    request: Request,
+    format: Optional[Literal["ndjson", "csv"]] = None,
+    batch_size: int = Query(ingest.BULK_BATCH_SIZE, ge=1, le=10000),
+    max_errors: int = Query(ingest.BULK_MAX_ERRORS, ge=0, le=100000),
+    session: AsyncSession = Depends(get_session),
+    cache: Cache = Depends(get_region_cache),
+    events: EventBus = Depends(get_region_event_bus),
+    source: Optional[str] = Depends(event_source),
+    region: Optional[int] = Depends(request_region),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
+):
+    # Тело читается потоком: в памяти только текущая строка и один пакет
+    fmt = format or ingest.detect_format(request.headers.get("content-type"))
+    return await ingest.ingest_scores(session, request.stream(), fmt, batch_size, max_errors, cache,
+                                      events, source, catalog, region)
@@ -0,0 +1,66 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .. import aggregates, jobs
+from ..db import get_session, request_region
+from ..jobs import JobRunner, get_job_runner
+from ..models import Score, Student
+from ..schemas import (MAX_EXAM_YEAR, MIN_EXAM_YEAR, ConsistencyReport, JobOut, StudentStats, SubjectStats,
+                       current_exam_year)
+from ..subjects import SubjectCatalog, get_subject_catalog
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+@router.get("/subjects", response_model=list[SubjectStats])
+async def subject_stats(exam_year: Optional[int] = Query(None, ge=MIN_EXAM_YEAR, le=MAX_EXAM_YEAR),
+                        session: AsyncSession = Depends(get_session),
+                        catalog: SubjectCatalog = Depends(get_subject_catalog)):
+    # считается по гистограммам (<= 101 строки на предмет за год), а не GROUP BY по score
+    exam_year = exam_year or current_exam_year()
+    histograms = await aggregates.load_histograms(session, exam_year)
+    names = await catalog.names(session, histograms)
+    return sorted(
+        (SubjectStats(subject=names[subject_id], exam_year=exam_year, **aggregates.histogram_stats(histogram))
+         for subject_id, histogram in histograms.items()),
+        key=lambda stats: stats.subject,
+    )
+
+@router.get("/students/{student_id}", response_model=StudentStats)
+async def student_stats(student_id: int,
+                        exam_year: Optional[int] = Query(None, ge=MIN_EXAM_YEAR, le=MAX_EXAM_YEAR),
+                        session: AsyncSession = Depends(get_session),
+                        catalog: SubjectCatalog = Depends(get_subject_catalog)):
+    student = await session.get(Student, student_id)
+    if not student:
+        raise HTTPException(404, "Student not found")
+    exam_year = exam_year or current_exam_year()
+    # у студента не больше пары десятков строк, и они читаются по индексу student_id
+    statement = select(Score.subject_id, Score.score).where(Score.student_id == student_id,
+                                                            Score.exam_year == exam_year)
+    rows = (await session.exec(statement)).all()
+    names = await catalog.names(session, [subject_id for subject_id, _ in rows])
+    scores = {names[subject_id]: score for subject_id, score in rows}
+    total = sum(scores.values())
+    return StudentStats(
+        student_id=student_id,
+        exam_year=exam_year,
+        subjects=len(scores),
+        total=total,
+        average=round(total / len(scores), 2) if scores else None,
+        scores=scores,
+    )
+
+@router.get("/consistency", response_model=ConsistencyReport)
+async def check_consistency(session: AsyncSession = Depends(get_session),
+                            catalog: SubjectCatalog = Depends(get_subject_catalog)):
+    # полный пересчёт из таблицы score — для проверки, не для горячего пути
+    return ConsistencyReport(**await aggregates.consistency_report(session, catalog))
+
+@router.post("/consistency", response_model=JobOut, status_code=202)
+async def start_consistency_check(region: Optional[int] = Depends(request_region),
+                                  runner: JobRunner = Depends(get_job_runner)):
+    # та же проверка фоновой задачей: на большой таблице score не держит воркер; отчёт — в result задачи
+    job = await runner.enqueue("check_consistency", {"region": region})
+    return jobs.accepted(job)
@@ -1,23 +1,118 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from ..db import get_session
+from typing import Literal, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from ..cache import Cache, get_region_cache, scores_key, student_key
+from ..db import get_read_session, get_session
 from ..models import Student
-from ..schemas import StudentCreate, StudentOut
+from ..pagination import KeysetParams, fetch_page
+from ..responses import json_response, objects_to_dicts, rows_to_dicts, select_schema
+from ..schemas import StudentCreate, StudentOut, StudentPage, StudentWithScores, StudentWithScoresPage
+from ..subjects import SubjectCatalog, get_subject_catalog, score_dicts
 
 router = APIRouter(prefix="/students", tags=["students"])
 
 @router.post("/", response_model=StudentOut, status_code=201)
-def create_student(student: StudentCreate, session: Session = Depends(get_session)):
+async def create_student(student: StudentCreate, response: Response, session: AsyncSession = Depends(get_session),
+                         cache: Cache = Depends(get_region_cache)):
     # Создаем объект модели из схемы
     db_student = Student(**student.dict())
     session.add(db_student)
-    session.commit()
-    session.refresh(db_student)
+    try:
+        await session.commit()
+    except IntegrityError:
+        # единственное уникальное ограничение — telegram_id: аккаунт уже привязан, отдаём его студента
+        await session.rollback()
+        statement = select(Student).where(Student.telegram_id == student.telegram_id)
+        existing = (await session.exec(statement)).first() if student.telegram_id is not None else None
+        if existing is None:
+            raise
+        response.status_code = 200
+        return existing
+    await session.refresh(db_student)
+    await cache.mark_written(student_key(db_student.id))
     return db_student
 
-@router.get("/{student_id}", response_model=StudentOut)
-def get_student(student_id: int, session: Session = Depends(get_session)):
-    student = session.get(Student, student_id)
-    if not student:
+Include = Optional[Literal["scores"]]
+
+
+async def with_scores(students: list[Student], session: AsyncSession, catalog: SubjectCatalog) -> list[dict]:
+    names = await catalog.names(session, {score.subject_id for student in students for score in student.scores})
+    return [{**data, "scores": score_dicts(student.scores, names)}
+            for student, data in zip(students, objects_to_dicts(students, StudentOut))]
+
+
+@router.get("/", response_model=Union[StudentPage, StudentWithScoresPage])
+async def list_students(
+    page: KeysetParams = Depends(),
+    name_prefix: Optional[str] = Query(None, min_length=1, max_length=50,
+                                       description="Префикс фамилии (с учётом регистра); страницы — по фамилии"),
+    include: Include = Query(None, description="scores — вместе с баллами"),
+    session: AsyncSession = Depends(get_read_session),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
+):
+    if include == "scores":
+        # баллы страницы — одним запросом WHERE student_id IN (...), а не по запросу на студента
+        statement = select(Student).options(selectinload(Student.scores))
+    else:
+        statement = select_schema(Student, StudentOut)
+    sort_column = None
+    if name_prefix:
+        # префикс как диапазон [prefix, следующая строка) и страницы по (last_name, id): одна страница —
+        # один проход по индексу ix_student_last_name_id, как бы редко ни встречался префикс
+        upper = name_prefix[:-1] + chr(ord(name_prefix[-1]) + 1)
+        statement = statement.where(Student.last_name >= name_prefix, Student.last_name < upper)
+        sort_column = Student.last_name
+    items, next_cursor = await fetch_page(session, statement, Student.id, page, sort_column)
+    if include == "scores":
+        return json_response({"items": await with_scores(items, session, catalog), "next_cursor": next_cursor})
+    return json_response({"items": rows_to_dicts(items, StudentOut), "next_cursor": next_cursor})
+
+@router.get("/{student_id}", response_model=Union[StudentOut, StudentWithScores])
+async def get_student(student_id: int, include: Include = Query(None, description="scores — вместе с баллами"),
+                      session: AsyncSession = Depends(get_read_session),
+                      primary: AsyncSession = Depends(get_session), cache: Cache = Depends(get_region_cache),
+                      catalog: SubjectCatalog = Depends(get_subject_catalog)):
+    # промах читается с реплики; сразу после записи студента — из primary (соединение сессия берёт только
+    # при первом запросе, так что неиспользованная ничего не стоит)
+    if include == "scores":
+        return await get_student_with_scores(student_id, session, primary, cache, catalog)
+
+    cached = await cache.get(student_key(student_id))
+    if cached is not None:
+        return json_response(cached)
+
+    if await cache.written(student_key(student_id)):
+        session = primary
+
+    statement = select_schema(Student, StudentOut).where(Student.id == student_id)
+    rows = rows_to_dicts((await session.exec(statement)).all(), StudentOut)
+    if not rows:
+        raise HTTPException(404, "Student not found")
+    data = rows[0]
+    await cache.set(student_key(student_id), data)
+    return json_response(data)
+
+
+async def get_student_with_scores(student_id: int, session: AsyncSession, primary: AsyncSession, cache: Cache,
+                                  catalog: SubjectCatalog):
+    # собирается из тех же записей кэша, что GET /students/{id} и GET /students/{id}/scores/,
+    # поэтому существующая инвалидация подходит без изменений
+    student, scores = await cache.get(student_key(student_id)), await cache.get(scores_key(student_id))
+    if student is not None and scores is not None:
+        return json_response({**student, "scores": scores})
+    if await cache.written(student_key(student_id), scores_key(student_id)):
+        session = primary
+
+    # студент и баллы одним запросом: LEFT OUTER JOIN score
+    statement = select(Student).where(Student.id == student_id).options(joinedload(Student.scores))
+    db_student = (await session.exec(statement)).unique().first()
+    if db_student is None:
         raise HTTPException(404, "Student not found")
-    return student
\ No newline at end of file
+    data = (await with_scores([db_student], session, catalog))[0]
+    await cache.set(student_key(student_id), {key: data[key] for key in StudentOut.model_fields})
+    await cache.set(scores_key(student_id), data["scores"])
+    return json_response(data)
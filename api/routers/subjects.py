@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+from sqlmodel.ext.asyncio.session import AsyncSession
+from ..db import get_read_session
+from ..responses import json_response
+from ..schemas import SubjectOut
+from ..subjects import SubjectCatalog, get_subject_catalog
+
+router = APIRouter(tags=["subjects"])
+
+@router.get("/subjects", response_model=list[SubjectOut])
+async def list_subjects(session: AsyncSession = Depends(get_read_session),
+                        catalog: SubjectCatalog = Depends(get_subject_catalog)):
+    # справочник отдаётся из памяти процесса: база читается только при первом запросе
+    return json_response(await catalog.items(session))
@@ -1,10 +1,23 @@
 
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+import os
+from datetime import date
+
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List, Optional
+
+MIN_EXAM_YEAR, MAX_EXAM_YEAR = 2000, 2100
+
+
+def current_exam_year() -> int:
+    """Год по умолчанию для записи и чтения баллов; EXAM_YEAR задаёт сезон явно (например, для пересдач)"""
+    return int(os.getenv("EXAM_YEAR") or date.today().year)
+
 
 class StudentCreate(BaseModel):
     first_name: str = Field(..., min_length=1, max_length=50)
     last_name: str = Field(..., min_length=1, max_length=50)
+    # аккаунт Telegram, из которого регистрируется студент; в ответах не отдаётся
+    telegram_id: Optional[int] = Field(None, gt=0)
 
 class StudentOut(BaseModel):
     id: int
@@ -15,15 +28,153 @@ class StudentOut(BaseModel):
         from_attributes = True  # Замените orm_mode для Pydantic v2
 
 
+class SubjectOut(BaseModel):
+    id: int
+    name: str
+
+
 class ScoreCreate(BaseModel):
+    # название из справочника GET /subjects; незнакомый предмет — 422
     subject: str = Field(..., min_length=1, max_length=50)
     score: int = Field(..., ge=0, le=100)  # от 0 до 100 включительно
+    exam_year: int = Field(default_factory=current_exam_year, ge=MIN_EXAM_YEAR, le=MAX_EXAM_YEAR)
+
+class ScoreBatch(BaseModel):
+    # по одному баллу на предмет за год; повтор в одном пакете — ошибка валидации
+    scores: List[ScoreCreate] = Field(..., min_length=1, max_length=50)
+
+    @field_validator("scores", mode="after")
+    @classmethod
+    def unique_subjects(cls, scores: List[ScoreCreate]) -> List[ScoreCreate]:
+        keys = [(s.subject, s.exam_year) for s in scores]
+        duplicates = sorted({subject for subject, year in keys if keys.count((subject, year)) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate subjects: {', '.join(duplicates)}")
+        return scores
 
 class ScoreOut(BaseModel):
     id: int
     subject: str
     score: int
     student_id: int
+    exam_year: int
+    region: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+class StudentPage(BaseModel):
+    items: List[StudentOut]
+    next_cursor: Optional[str] = None  # передать как after, чтобы получить следующую страницу
+
+class StudentWithScores(StudentOut):
+    scores: List[ScoreOut]
+
+class StudentWithScoresPage(BaseModel):
+    items: List[StudentWithScores]
+    next_cursor: Optional[str] = None
+
+class ScorePage(BaseModel):
+    items: List[ScoreOut]
+    next_cursor: Optional[str] = None
+
+
+class RankOut(BaseModel):
+    subject: str
+    exam_year: int
+    score: int
+    rank: int             # место, одинаковые баллы делят место
+    total: int            # сколько всего результатов по предмету
+    percentile: float     # процент результатов строго ниже
+    top_percent: float    # "ты в топ N%"
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    student_id: int
+    score: int
+
+class LeaderboardOut(BaseModel):
+    subject: str
+    exam_year: int
+    total: int
+    top: List[LeaderboardEntry]
+
+
+class SubjectStats(BaseModel):
+    subject: str
+    exam_year: int
+    count: int
+    mean: Optional[float]
+    median: Optional[float]
+    stddev: Optional[float]
+    distribution: Dict[int, int]  # балл -> число результатов, только ненулевые
+
+class StudentStats(BaseModel):
+    student_id: int
+    exam_year: int
+    subjects: int
+    total: int                # сумма баллов — то, что важно для поступления
+    average: Optional[float]
+    scores: Dict[str, int]
+
+class HistogramMismatch(BaseModel):
+    exam_year: int
+    subject: str
+    score: int
+    expected: int
+    actual: int
+
+class ConsistencyReport(BaseModel):
+    consistent: bool
+    mismatches: List[HistogramMismatch]
+
+
+class BulkScoreRow(ScoreCreate):
+    student_id: int
+
+class BulkRowError(BaseModel):
+    line: int
+    detail: str
+
+class BulkScoreReport(BaseModel):
+    processed: int = 0
+    upserted: int = 0
+    failed: int = 0
+    errors: List[BulkRowError] = []
+    errors_truncated: bool = False  # ошибок больше, чем max_errors; в errors только первые
+
+
+class ScoreEvent(BaseModel):
+    seq: int
+    type: str
+    student_id: int
+    subject: str
+    exam_year: int
+    region: Optional[int] = None
+    score: int
+    previous_score: Optional[int] = None  # None — балл по предмету появился впервые
+    source: Optional[str] = None          # заголовок X-Source запроса, который изменил балл
+
+class EventPage(BaseModel):
+    events: List[ScoreEvent]
+    last_seq: int         # передать как since в следующий запрос
+    reset: bool = False   # часть событий после since потеряна (рестарт API, отставание подписчика)
+
+
+class JobOut(BaseModel):
+    id: int
+    kind: str
+    status: str               # queued / running / succeeded / failed
+    progress: int
+    total: Optional[int]      # None — обработчик не знает объёма заранее
+    attempts: int
+    max_attempts: int
+    result: Optional[dict]
+    error: Optional[str]      # последняя ошибка; у задачи в очереди — причина повтора
+    created_at: float         # unix time
+    started_at: Optional[float]
+    finished_at: Optional[float]
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
@@ -0,0 +1,85 @@
+"""Справочник предметов.
+
+В score и subject_score_count хранится subject_id (SMALLINT) вместо названия: строки и индексы короче,
+группировка и ранжирование по предмету сравнивают целые числа. Наружу API по-прежнему принимает и отдаёт
+названия, перевод делает SubjectCatalog из памяти процесса, без join со справочником.
+
+Предметы добавляются миграциями (в dev/test — seed_subjects после create_all). Каталог перечитывает
+таблицу, когда встречает незнакомое название или id, но не чаще раза в refresh_interval секунд.
+"""
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models import Score, Subject
+
+# порядок задаёт id при начальном заполнении и порядок кнопок в боте
+DEFAULT_SUBJECTS = ["Математика", "Русский язык", "Физика", "Информатика", "Химия", "Литература", "Биология"]
+
+
+async def seed_subjects(conn, names: Iterable[str] = DEFAULT_SUBJECTS) -> None:
+    """Добавляет недостающие предметы; conn — AsyncConnection после create_all"""
+    existing = set((await conn.execute(select(Subject.name))).scalars())
+    missing = [name for name in names if name not in existing]
+    if missing:
+        await conn.execute(insert(Subject), [{"name": name} for name in missing])
+
+
+class SubjectCatalog:
+    """{id: название} и {название: id} в памяти процесса."""
+
+    def __init__(self, refresh_interval: float = 60, clock=time.monotonic):
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self.by_id: dict[int, str] = {}
+        self.by_name: dict[str, int] = {}
+        self.loaded_at: Optional[float] = None
+        self.loads = 0
+
+    async def load(self, session: AsyncSession) -> None:
+        rows = (await session.exec(select(Subject.id, Subject.name).order_by(Subject.id))).all()
+        self.by_id = dict(rows)
+        self.by_name = {name: subject_id for subject_id, name in rows}
+        self.loaded_at = self.clock()
+        self.loads += 1
+
+    async def _ensure(self, session: AsyncSession, missing: bool) -> None:
+        if self.loaded_at is None or (missing and self.clock() - self.loaded_at >= self.refresh_interval):
+            await self.load(session)
+
+    async def ids(self, session: AsyncSession, names: Iterable[str]) -> dict[str, int]:
+        """{название: id}; незнакомых названий в ответе нет"""
+        names = set(names)
+        await self._ensure(session, not names <= self.by_name.keys())
+        return {name: self.by_name[name] for name in names if name in self.by_name}
+
+    async def names(self, session: AsyncSession, ids: Iterable[int] = ()) -> dict[int, str]:
+        """{id: название} всех предметов; ids — какие нужны вызывающему, при незнакомом каталог перечитывается"""
+        await self._ensure(session, not set(ids) <= self.by_id.keys())
+        return self.by_id
+
+    async def items(self, session: AsyncSession) -> list[dict]:
+        await self._ensure(session, False)
+        return [{"id": subject_id, "name": name} for subject_id, name in self.by_id.items()]
+
+
+def select_scores():
+    """Колонки ScoreOut, только вместо названия предмета — subject_id"""
+    return select(Score.id, Score.subject_id, Score.score, Score.student_id, Score.exam_year, Score.region)
+
+
+def score_dicts(rows, names: dict[int, str]) -> list[dict]:
+    """Строки select_scores или объекты Score -> словари ScoreOut"""
+    return [{"id": row.id, "subject": names[row.subject_id], "score": row.score, "student_id": row.student_id,
+             "exam_year": row.exam_year, "region": row.region}
+            for row in rows]
+
+
+subject_catalog = SubjectCatalog()
+
+
+def get_subject_catalog() -> SubjectCatalog:
+    return subject_catalog
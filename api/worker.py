@@ -0,0 +1,48 @@
+"""Отдельный исполнитель фоновых задач (api.jobs).
+
+    python -m api.worker --concurrency 4
+    python -m api.worker --once    # выполнить готовые задачи и выйти (cron, отладка)
+
+Разбирает ту же таблицу job, что и процессы API, поэтому может работать рядом с ними. С JOBS_IN_PROCESS=0
+API только ставит задачи, а выполняет их этот процесс: тяжёлая работа не делит event loop с запросами.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+
+from .db import engine, session_factory, shard_router
+from .jobs import JobRunner
+
+
+async def run(concurrency: int, poll_interval: float, once: bool) -> None:
+    runner = JobRunner(session_factory, concurrency=concurrency, poll_interval=poll_interval)
+    try:
+        if once:
+            await runner.drain()
+            return
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await runner.start()
+        await stop.wait()
+    finally:
+        await runner.close()
+        for db_engine in (engine, *shard_router.engines.values()):
+            await db_engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("JOBS_CONCURRENCY", "2")))
+    parser.add_argument("--poll-interval", type=float, default=float(os.getenv("JOBS_POLL_INTERVAL", "1")))
+    parser.add_argument("--once", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    asyncio.run(run(args.concurrency, args.poll_interval, args.once))
+
+
+if __name__ == "__main__":
+    main()
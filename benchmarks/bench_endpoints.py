@@ -0,0 +1,47 @@
+"""Эндпоинты целиком (валидация, сериализация, ответ) через ASGI в процессе: pytest benchmarks/bench_endpoints.py"""
+import httpx
+import pytest
+
+from api.cache import Cache, get_cache
+from api.db import get_read_session, get_session
+from api.main import app
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def client(loop, session_factory):
+    async def get_session_override():
+        async with session_factory() as session:
+            yield session
+
+    # без кэша: меряется путь через БД и сериализацию
+    overrides = {get_session: get_session_override, get_read_session: get_session_override, get_cache: Cache}
+    app.dependency_overrides.update(overrides)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api")
+    yield client
+    loop.run_until_complete(client.aclose())
+    for dependency in overrides:
+        app.dependency_overrides.pop(dependency, None)
+
+
+@pytest.mark.parametrize("limit", [50, 500])
+def test_list_all_scores(benchmark, run, client, limit):
+    def request():
+        resp = run(client.get("/scores/", params={"limit": limit}))
+        assert resp.status_code == 200
+        return resp
+
+    benchmark(request)
+
+
+def test_list_student_scores(benchmark, run, client):
+    benchmark(lambda: run(client.get("/students/500/scores/")))
+
+
+def test_list_students(benchmark, run, client):
+    benchmark(lambda: run(client.get("/students/", params={"limit": 500})))
+
+
+def test_get_student(benchmark, run, client):
+    benchmark(lambda: run(client.get("/students/500")))
@@ -0,0 +1,42 @@
+"""Микробенчмарки ORM-путей на SQLite в памяти: pytest benchmarks/bench_orm.py"""
+import itertools
+
+import pytest
+from sqlmodel import select
+
+from api import crud
+from api.models import Score, Student
+from api.schemas import StudentOut
+
+pytest.importorskip("pytest_benchmark")
+
+
+def test_create_student(benchmark, run, session_factory):
+    async def create():
+        async with session_factory() as session:
+            student = Student(first_name="Иван", last_name="Иванов")
+            session.add(student)
+            await session.commit()
+            await session.refresh(student)
+            return StudentOut.model_validate(student)
+
+    benchmark(lambda: run(create()))
+
+
+def test_upsert_score(benchmark, run, session_factory):
+    scores = itertools.cycle(range(101))
+
+    async def upsert():
+        async with session_factory() as session:
+            return await crud.upsert_score(session, 1, 1, next(scores), 2026)
+
+    benchmark(lambda: run(upsert()))
+
+
+def test_list_scores(benchmark, run, session_factory):
+    async def list_scores():
+        async with session_factory() as session:
+            await session.get(Student, 500)
+            return (await session.exec(select(Score).where(Score.student_id == 500))).all()
+
+    benchmark(lambda: run(list_scores()))
@@ -0,0 +1,45 @@
+"""Микробенчмарки сериализации ответов: pytest benchmarks/bench_serialization.py"""
+import json
+
+import pytest
+
+from api.models import Score, Student
+from api.schemas import ScoreOut, StudentOut
+from api.subjects import score_dicts
+
+pytest.importorskip("pytest_benchmark")
+
+SCORES = [Score(id=i, subject_id=1, score=i % 101, student_id=1, exam_year=2026) for i in range(1000)]
+NAMES = {1: "Математика"}
+STUDENT = Student(id=1, first_name="Иван", last_name="Иванов")
+
+
+def test_student_out_from_orm(benchmark):
+    benchmark(lambda: StudentOut.model_validate(STUDENT).model_dump())
+
+
+def test_score_list_from_orm(benchmark):
+    benchmark(lambda: [ScoreOut.model_validate(score).model_dump() for score in score_dicts(SCORES, NAMES)])
+
+
+def test_score_list_json_stdlib(benchmark):
+    data = score_dicts(SCORES, NAMES)
+    benchmark(lambda: json.dumps(data, ensure_ascii=False).encode())
+
+
+def test_score_list_json_orjson(benchmark):
+    orjson = pytest.importorskip("orjson")
+    data = score_dicts(SCORES, NAMES)
+    benchmark(lambda: orjson.dumps(data))
+
+
+def test_score_rows_to_dicts(benchmark):
+    # то, что делает json_response-путь: строки SELECT по колонкам -> словари с названием предмета из каталога
+    from sqlalchemy.engine import Row
+    from sqlalchemy.engine.result import SimpleResultMetaData
+
+    metadata = SimpleResultMetaData(["id", "subject_id", "score", "student_id", "exam_year", "region"])
+    rows = [Row(metadata, None, metadata._key_to_index,
+                (s.id, s.subject_id, s.score, s.student_id, s.exam_year, s.region))
+            for s in SCORES]
+    benchmark(lambda: score_dicts(rows, NAMES))
@@ -0,0 +1,117 @@
+"""Прогон синтетических диалогов через диспетчер бота без Telegram и без API.
+
+Каждый пользователь проходит /start -> /register -> /enter_scores по всем предметам -> /view_scores -> /rank;
+апдейты одного пользователя идут по порядку, разные пользователи — параллельно.
+Задержку API можно имитировать через --api-latency.
+
+    python -m benchmarks.bot_replay --users 200 --api-latency 0.005 --out bot.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+
+os.environ.setdefault("BOT_TOKEN", "42:TEST")
+
+from benchmarks.results import save_results, summarize
+from tests.bot_fakes import FakeApi, make_bot, message_update
+
+
+class SlowApi(FakeApi):
+    """FakeApi с задержкой на каждый вызов, как у сетевого запроса"""
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    async def _wait(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def create_student(self, *args, **kwargs):
+        await self._wait()
+        return await super().create_student(*args, **kwargs)
+
+    async def upsert_score(self, *args, **kwargs):
+        await self._wait()
+        return await super().upsert_score(*args, **kwargs)
+
+    async def upsert_scores(self, *args, **kwargs):
+        await self._wait()
+        return await super().upsert_scores(*args, **kwargs)
+
+    async def list_scores(self, *args, **kwargs):
+        await self._wait()
+        return await super().list_scores(*args, **kwargs)
+
+    async def get_rank(self, *args, **kwargs):
+        await self._wait()
+        return await super().get_rank(*args, **kwargs)
+
+
+def dialog(subjects: list[str], batch: bool = False) -> list[tuple[str, str]]:
+    """(операция, текст сообщения) одного пользователя"""
+    steps = [("start", "/start"), ("register", "/register"), ("name", "Иван Иванов")]
+    if batch:
+        entries = ", ".join(f"{subject} {random.randint(0, 100)}" for subject in subjects)
+        steps += [("enter_scores", "/enter_scores"), ("score_batch", entries)]
+    else:
+        for subject in subjects:
+            steps += [("enter_scores", "/enter_scores"), ("subject", subject),
+                      ("score", str(random.randint(0, 100)))]
+    return steps + [("view_scores", "/view_scores"), ("rank", "/rank")]
+
+
+async def replay_user(dp, bot, api, user_id: int, steps, latencies):
+    for operation, text in steps:
+        update = message_update(user_id, text)
+        started = time.perf_counter()
+        await dp.feed_update(bot, update, api=api)
+        latencies[operation].append(time.perf_counter() - started)
+
+
+async def main(args):
+    from bot.bot import SUBJECTS, dp
+
+    bot = make_bot()
+    api = SlowApi(args.api_latency)
+    latencies = defaultdict(list)
+    steps = dialog(SUBJECTS[:args.subjects], args.batch)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def user(user_id: int):
+        async with semaphore:
+            await replay_user(dp, bot, api, user_id, steps, latencies)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(100_000 + i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    operations = {name: summarize(values, 0) for name, values in sorted(latencies.items())}
+    operations["all"] = summarize(all_latencies, 0)
+    save_results(
+        args.out, "bot-replay",
+        {"users": args.users, "subjects": args.subjects, "concurrency": args.concurrency,
+         "api_latency": args.api_latency, "batch": args.batch, "storage": os.getenv("BOT_STORAGE", "memory")},
+        operations,
+        updates_per_second=round(len(all_latencies) / elapsed, 1),
+        sent_messages=len(bot.session.sent_texts),
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--subjects", type=int, default=3, help="сколько предметов вводит каждый пользователь")
+    parser.add_argument("--concurrency", type=int, default=50, help="сколько пользователей активны одновременно")
+    parser.add_argument("--batch", action="store_true", help="все баллы одним сообщением")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="имитируемая задержка API, секунд")
+    parser.add_argument("--out", help="куда сохранить JSON с результатами")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
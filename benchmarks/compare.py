@@ -0,0 +1,55 @@
+"""Сравнение двух JSON с результатами loadgen/bot_replay.
+
+    python -m benchmarks.compare baseline.json current.json --threshold 10
+
+Код возврата 1, если какой-либо процентиль вырос больше чем на threshold процентов.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> tuple[list[str], list[str]]:
+    lines, regressions = [], []
+    for operation, before in baseline["operations"].items():
+        after = current["operations"].get(operation)
+        if after is None:
+            continue
+        for metric in METRICS:
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            line = f"{operation:<16} {metric:<7} {old:>10.3f} -> {new:>10.3f} ms  {change:+7.1f}%"
+            if change > threshold:
+                line += "  REGRESSION"
+                regressions.append(line)
+            lines.append(line)
+    return lines, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10, help="допустимый рост задержки, %%")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    print(f"{baseline.get('commit')} -> {current.get('commit')}")
+    lines, regressions = compare(baseline, current, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}%")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.pool import StaticPool
+
+os.environ.setdefault("BOT_TOKEN", "42:TEST")
+
+from api.db import make_engine
+from api.models import Score, Student
+from api.subjects import DEFAULT_SUBJECTS, seed_subjects
+
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def engine(loop):
+    engine = make_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    async def seed():
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+            await seed_subjects(conn)
+        async with AsyncSession(engine) as session:
+            for i in range(1000):
+                student = Student(first_name="Имя", last_name=f"Фамилия{i}")
+                session.add(student)
+                await session.flush()
+                # seed_subjects выдаёт id по порядку DEFAULT_SUBJECTS, начиная с 1
+                for j in range(len(DEFAULT_SUBJECTS)):
+                    session.add(Score(subject_id=j + 1, score=(i * 7 + j) % 101, student_id=student.id,
+                                      exam_year=2026))
+            await session.commit()
+
+    loop.run_until_complete(seed())
+    yield engine
+    loop.run_until_complete(engine.dispose())
+
+
+@pytest.fixture(scope="session")
+def session_factory(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+def run(loop):
+    """Запуск корутины в общем цикле событий: benchmark() принимает только синхронные функции"""
+    return loop.run_until_complete
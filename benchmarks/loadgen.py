@@ -0,0 +1,163 @@
+"""Нагрузочный генератор API с фиксированным RPS (open loop).
+
+Запросы стартуют по расписанию независимо от того, успел ли ответить сервер, а задержка
+считается от запланированного момента — медленный сервер не "притормаживает" нагрузку.
+
+    python -m benchmarks.loadgen --rps 200 --duration 20 --out load.json          # API в процессе, SQLite
+    python -m benchmarks.loadgen --url http://localhost:8000 --rps 500 --out load.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.results import save_results, summarize
+
+SUBJECTS = ["Математика", "Русский язык", "Физика", "Информатика", "Химия", "Литература", "Биология"]
+
+# доли операций в смешанной нагрузке: чтения заметно чаще записей, как после публикации результатов
+DEFAULT_MIX = {"list_scores": 0.5, "upsert_score": 0.35, "get_student": 0.1, "create_student": 0.05}
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, student_ids: list[int], mix: dict, max_in_flight: int):
+        self.client = client
+        self.student_ids = student_ids
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.dropped = 0
+        self.in_flight = 0
+        self.max_in_flight = max_in_flight
+
+    async def call(self, operation: str) -> httpx.Response:
+        student_id = random.choice(self.student_ids)
+        if operation == "create_student":
+            return await self.client.post("/students/", json={"first_name": "Нагрузка", "last_name": "Тестов"})
+        if operation == "get_student":
+            return await self.client.get(f"/students/{student_id}")
+        if operation == "upsert_score":
+            return await self.client.post(f"/students/{student_id}/scores/",
+                                          json={"subject": random.choice(SUBJECTS), "score": random.randint(0, 100)})
+        if operation == "list_scores":
+            return await self.client.get(f"/students/{student_id}/scores/")
+        raise ValueError(f"Unknown operation {operation!r}")
+
+    async def one(self, operation: str, scheduled_at: float):
+        self.in_flight += 1
+        try:
+            resp = await self.call(operation)
+            ok = resp.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        finally:
+            self.in_flight -= 1
+        if ok:
+            self.latencies[operation].append(time.perf_counter() - scheduled_at)
+        else:
+            self.errors[operation] += 1
+
+    async def run(self, rps: float, duration: float):
+        total = int(rps * duration)
+        start = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            scheduled_at = start + i / rps
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.in_flight >= self.max_in_flight:
+                # сервер не успевает: не копим бесконечную очередь в генераторе
+                self.dropped += 1
+                continue
+            operation = random.choices(self.operations, self.weights)[0]
+            tasks.append(asyncio.create_task(self.one(operation, scheduled_at)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+
+async def seed_students(client: httpx.AsyncClient, count: int) -> list[int]:
+    ids = []
+    for i in range(count):
+        resp = await client.post("/students/", json={"first_name": "Ученик", "last_name": f"Нагрузочный{i}"})
+        resp.raise_for_status()
+        ids.append(resp.json()["id"])
+    return ids
+
+
+async def make_inprocess_client(db_path: str):
+    # URL задаётся до импорта api: движок создаётся при импорте модуля
+    os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    from sqlmodel import SQLModel
+    from api.db import engine
+    from api.main import app
+    from api.subjects import seed_subjects
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await seed_subjects(conn)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api"), engine
+
+
+async def main(args):
+    engine = None
+    if args.url:
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout)
+        target = args.url
+    else:
+        db_path = os.path.join(tempfile.mkdtemp(), "load.db")
+        client, engine = await make_inprocess_client(db_path)
+        target = f"in-process sqlite:{db_path}"
+
+    async with client:
+        student_ids = await seed_students(client, args.students)
+        generator = LoadGenerator(client, student_ids, parse_mix(args.mix), args.max_in_flight)
+        elapsed = await generator.run(args.rps, args.duration)
+    if engine is not None:
+        # иначе поток aiosqlite не даёт процессу завершиться
+        await engine.dispose()
+
+    all_latencies = [v for values in generator.latencies.values() for v in values]
+    operations = {name: summarize(generator.latencies[name], generator.errors[name])
+                  for name in sorted(set(generator.latencies) | set(generator.errors))}
+    operations["all"] = summarize(all_latencies, sum(generator.errors.values()))
+    save_results(
+        args.out, "api-load",
+        {"target": target, "rps": args.rps, "duration": args.duration, "mix": args.mix,
+         "students": args.students, "max_in_flight": args.max_in_flight},
+        operations,
+        achieved_rps=round(len(all_latencies) / elapsed, 1),
+        dropped=generator.dropped,
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="адрес запущенного API; без него API поднимается в процессе на SQLite")
+    parser.add_argument("--rps", type=float, default=100)
+    parser.add_argument("--duration", type=float, default=10, help="секунд")
+    parser.add_argument("--students", type=int, default=200, help="сколько студентов создать перед прогоном")
+    parser.add_argument("--mix", default=",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--out", help="куда сохранить JSON с результатами")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
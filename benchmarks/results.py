@@ -0,0 +1,56 @@
+import json
+import platform
+import subprocess
+import time
+from typing import Optional
+
+
+def percentile(sorted_values: list[float], p: float) -> Optional[float]:
+    """Процентиль методом ближайшего ранга по уже отсортированному списку"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], errors: int) -> dict:
+    """Латентности в секундах -> сводка в миллисекундах"""
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "count": len(values) + errors,
+        "ok": len(values),
+        "errors": errors,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "max_ms": ms(values[-1]) if values else None,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(path: Optional[str], kind: str, params: dict, operations: dict, **extra) -> dict:
+    """Результаты в JSON: их можно сравнивать между коммитами через benchmarks.compare"""
+    result = {
+        "kind": kind,
+        "commit": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "params": params,
+        "operations": operations,
+        **extra,
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return result
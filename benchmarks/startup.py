@@ -0,0 +1,102 @@
+"""Время холодного старта API: импорт api.main и lifespan startup, каждый прогон в новом процессе.
+
+    python -m benchmarks.startup --runs 10 --env APP_ENV=production --out startup.json
+    python -m benchmarks.startup --importtime   # самые дорогие импорты (python -X importtime)
+
+Без --url база — временный SQLite-файл, схема в нём создаётся миграциями Alembic, как в проде.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.results import save_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# выполняется в дочернем процессе: до первой строки не импортировано ничего из проекта
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import api.main
+imported = time.perf_counter()
+
+async def lifespan():
+    async with api.main.app.router.lifespan_context(api.main.app):
+        ready = time.perf_counter()
+    await api.db.engine.dispose()  # иначе поток aiosqlite не даёт процессу завершиться
+    return ready
+
+ready = asyncio.run(lifespan())
+print(json.dumps({"import_ms": (imported - started) * 1000, "startup_ms": (ready - imported) * 1000}))
+"""
+
+
+def run_probe(env: dict) -> dict:
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True, timeout=60)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_profile(env: dict, top: int) -> list[str]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import api.main"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split(":", 1)[1].split("|")
+        if not name[1:].startswith(" "):  # вложенные импорты идут с отступом
+            rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return [f"{us / 1000:8.1f} ms  {name}" for us, name in rows[:top]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--url", help="DATABASE_URL; по умолчанию временный SQLite с миграциями")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="переменные окружения для прогона, например APP_ENV=production")
+    parser.add_argument("--importtime", action="store_true", help="показать самые дорогие импорты")
+    parser.add_argument("--out", help="сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="0")
+    env.update(item.split("=", 1) for item in args.env)
+    tmp = None
+    if args.url:
+        env["DATABASE_URL"] = args.url
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        env["DATABASE_URL"] = f"sqlite:///{tmp.name}/startup.db"
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env,
+                       capture_output=True, check=True)
+    env.pop("ASYNC_DATABASE_URL", None)
+
+    try:
+        if args.importtime:
+            print("\n".join(import_profile(env, 15)))
+            return
+        run_probe(env)  # первый прогон компилирует .pyc, в статистику не идёт
+        runs = [run_probe(env) for _ in range(args.runs)]
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    summary = {}
+    for field in ("import_ms", "startup_ms"):
+        values = [run[field] for run in runs]
+        summary[field] = {"median": round(statistics.median(values), 1), "min": round(min(values), 1),
+                          "max": round(max(values), 1)}
+        print(f"{field:<11} median {summary[field]['median']:8.1f}  min {summary[field]['min']:8.1f}  "
+              f"max {summary[field]['max']:8.1f}")
+    if args.out:
+        save_results(args.out, "startup", {"runs": args.runs, "env": args.env}, summary, samples=runs)
+
+
+if __name__ == "__main__":
+    main()
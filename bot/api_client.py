@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+from time import perf_counter
+from typing import Optional
+
+import httpx
+
+from bot.metrics import API_ERRORS, API_LATENCY, error_reason
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = {500, 502, 503, 504}
+# До этих ошибок запрос не ушёл на сервер, поэтому повтор безопасен даже для POST
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Попадает в события API: о баллах, введённых через бота, бот не уведомляет повторно
+SOURCE = "bot"
+
+
+def idempotency_headers(key: Optional[str]) -> Optional[dict]:
+    return {"Idempotency-Key": key} if key is not None else None
+
+
+class ApiError(Exception):
+    def __init__(self, status_code: Optional[int], text: str):
+        super().__init__(status_code, text)
+        self.status_code = status_code
+        self.text = text
+
+    def __str__(self):
+        if self.status_code is None:
+            return f"API недоступен: {self.text}"
+        return f"{self.status_code} {self.text}"
+
+
+class ApiClient:
+    """Один пул соединений к API на весь процесс бота: keep-alive, таймауты и повторы с backoff."""
+
+    def __init__(self, base_url: str, *, timeout: float = 10.0, max_connections: int = 100,
+                 max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0,
+                 http2: bool = False, retries: int = 3, backoff: float = 0.2,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        try:
+            self._client = httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits,
+                                             http2=http2, transport=transport, headers={"X-Source": SOURCE})
+        except ImportError:
+            # для HTTP/2 нужен пакет h2
+            logger.warning("HTTP/2 requested but h2 is not installed, falling back to HTTP/1.1")
+            self._client = httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits,
+                                             transport=transport, headers={"X-Source": SOURCE})
+
+    @classmethod
+    def from_env(cls, base_url: str, **kwargs) -> "ApiClient":
+        settings = dict(
+            timeout=float(os.getenv("API_TIMEOUT", "10")),
+            max_connections=int(os.getenv("API_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("API_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("API_KEEPALIVE_EXPIRY", "30")),
+            http2=os.getenv("API_HTTP2", "0").lower() in ("1", "true", "yes"),
+            retries=int(os.getenv("API_RETRIES", "3")),
+            backoff=float(os.getenv("API_RETRY_BACKOFF", "0.2")),
+        )
+        settings.update(kwargs)
+        return cls(base_url, **settings)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _request(self, operation: str, method: str, path: str, *, idempotent: bool,
+                       timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """Запрос с метриками по operation: латентность считается вместе с повторами."""
+        started = perf_counter()
+        try:
+            return await self._send(method, path, idempotent=idempotent, timeout=timeout, **kwargs)
+        except ApiError as e:
+            API_ERRORS.labels(operation, error_reason(e.status_code)).inc()
+            raise
+        finally:
+            API_LATENCY.labels(operation).observe(perf_counter() - started)
+
+    async def _send(self, method: str, path: str, *, idempotent: bool,
+                    timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """Запрос с повторами; 5xx и обрывы после отправки повторяются только для идемпотентных вызовов."""
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        attempt = 0
+        while True:
+            try:
+                resp = await self._client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                retryable = isinstance(e, CONNECT_ERRORS) or idempotent
+                if not retryable or attempt >= self.retries:
+                    raise ApiError(None, repr(e)) from e
+            else:
+                if resp.status_code not in RETRY_STATUSES or not idempotent or attempt >= self.retries:
+                    if resp.is_error:
+                        raise ApiError(resp.status_code, resp.text)
+                    return resp
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    async def create_student(self, first_name: str, last_name: str, *, telegram_id: Optional[int] = None,
+                             idempotency_key: Optional[str] = None, timeout: Optional[float] = None) -> dict:
+        # с ключом идемпотентности повтор вернёт того же студента, поэтому его можно повторять
+        resp = await self._request("create_student", "POST", "/students/", idempotent=idempotency_key is not None,
+                                   timeout=timeout, headers=idempotency_headers(idempotency_key),
+                                   json={"first_name": first_name, "last_name": last_name,
+                                         "telegram_id": telegram_id})
+        return resp.json()
+
+    async def upsert_score(self, student_id: int, subject: str, score: int, *,
+                           idempotency_key: Optional[str] = None, timeout: Optional[float] = None) -> dict:
+        # upsert идемпотентен: повтор запишет тот же балл
+        resp = await self._request("upsert_score", "POST", f"/students/{student_id}/scores/",
+                                   idempotent=True, timeout=timeout, headers=idempotency_headers(idempotency_key),
+                                   json={"subject": subject, "score": score})
+        return resp.json()
+
+    async def upsert_scores(self, student_id: int, scores: dict[str, int], *,
+                            idempotency_key: Optional[str] = None, timeout: Optional[float] = None) -> list[dict]:
+        # все предметы одним запросом и одной транзакцией на стороне API
+        resp = await self._request("upsert_scores", "POST", f"/students/{student_id}/scores/batch",
+                                   idempotent=True, timeout=timeout, headers=idempotency_headers(idempotency_key),
+                                   json={"scores": [{"subject": s, "score": v} for s, v in scores.items()]})
+        return resp.json()
+
+    async def list_subjects(self, *, timeout: Optional[float] = None) -> list[dict]:
+        resp = await self._request("list_subjects", "GET", "/subjects", idempotent=True, timeout=timeout)
+        return resp.json()
+
+    async def list_scores(self, student_id: int, *, timeout: Optional[float] = None) -> list[dict]:
+        resp = await self._request("list_scores", "GET", f"/students/{student_id}/scores/",
+                                   idempotent=True, timeout=timeout)
+        return resp.json()
+
+    async def get_rank(self, student_id: int, *, timeout: Optional[float] = None) -> list[dict]:
+        resp = await self._request("get_rank", "GET", f"/students/{student_id}/rank",
+                                   idempotent=True, timeout=timeout)
+        return resp.json()
+
+    async def poll_events(self, since: Optional[int] = None, wait: float = 25.0) -> dict:
+        """Long-poll событий API; HTTP-таймаут больше времени ожидания на сервере"""
+        params = {"timeout": wait} if since is None else {"since": since, "timeout": wait}
+        resp = await self._request("poll_events", "GET", "/events/", idempotent=True,
+                                   timeout=self.timeout + wait, params=params)
+        return resp.json()
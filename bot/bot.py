@@ -1,36 +1,104 @@
 import asyncio
+import logging
+import math
 import os
-import httpx
 
 from aiogram import Bot, Dispatcher, F
-from aiogram.filters import Command
-from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, Update
 from dotenv import load_dotenv
 
+from bot.api_client import ApiClient, ApiError
+from bot.metrics import HandlerMetricsMiddleware
+from bot.notifications import ScoreNotifier
+from bot.parsing import looks_like_batch, parse_score_batch
+from bot.sender import NOTIFICATION, OutboundSender, send_priority
+from bot.storage import StoreFSMStorage, StudentRegistry, create_store_from_env
+from bot.subjects import SubjectList
+from bot.webhook import run_metrics_server, run_webhook
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
+# polling — один процесс тянет апдейты сам; webhook — Telegram присылает их на наш HTTP-сервер
+BOT_MODE = os.getenv("BOT_MODE", "polling")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise RuntimeError("Set BOT_TOKEN in env or .env")
 
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher()
+# Порт для /metrics в режиме polling (в webhook-режиме метрики отдаёт тот же сервер)
+BOT_METRICS_PORT = os.getenv("BOT_METRICS_PORT")
+
+# Кому разрешена команда /broadcast (telegram id через запятую)
+BOT_ADMIN_IDS = {int(i) for i in os.getenv("BOT_ADMIN_IDS", "").split(",") if i.strip()}
+
+# Уведомления об изменении баллов по событиям API; при нескольких репликах — только на одной
+BOT_NOTIFICATIONS = os.getenv("BOT_NOTIFICATIONS", "1").lower() in ("1", "true", "yes")
 
-# --- Простое in-memory хранилище состояний ---
-user_ids = {}              # telegram_id -> student_id
-pending_subject = {}       # telegram_id -> выбранный предмет (None = ждём выбор предмета)
-pending_registration = {}  # telegram_id -> True если ждем ФИ для регистрации
+# Незавершённый диалог (регистрация, ввод балла) забывается через BOT_STATE_TTL секунд
+BOT_STATE_TTL = float(os.getenv("BOT_STATE_TTL", "3600"))
 
+# Как часто перечитывать справочник предметов из API, секунд
+BOT_SUBJECTS_TTL = float(os.getenv("BOT_SUBJECTS_TTL", "600"))
+
+# Встроенный список предметов — только пока справочник ещё не загружен из API
 SUBJECTS = ["Математика", "Русский язык", "Физика", "Информатика", "Химия", "Литература", "Биология"]
 
+# --- Хранилище состояний: memory / sqlite / redis (BOT_STORAGE, BOT_STORAGE_URL) ---
+store = create_store_from_env()
+students = StudentRegistry(store)
+subjects = SubjectList(SUBJECTS, ttl=BOT_SUBJECTS_TTL)
+
+bot = Bot(token=BOT_TOKEN)
+# все исходящие сообщения проходят через планировщик с лимитами Telegram
+sender = OutboundSender.from_env()
+bot.session.middleware(sender)
+# students (telegram_id -> student_id), subjects и sender попадают в хендлеры как аргументы
+dp = Dispatcher(storage=StoreFSMStorage(store, state_ttl=BOT_STATE_TTL), students=students, subjects=subjects,
+                sender=sender)
+dp.message.middleware(HandlerMetricsMiddleware())
+
+# задачи, которые хендлер запускает и не ждёт: ссылка нужна, иначе event loop может собрать задачу GC
+background_tasks: set[asyncio.Task] = set()
+
+
+def _background_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task %s failed", task.get_name(), exc_info=task.exception())
+
+
+def run_in_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(_background_done)
+    return task
+
+
+def update_key(bot: Bot, update: Update, operation: str) -> str:
+    """Ключ идемпотентности записи: повторная доставка того же апдейта не повторит её в API"""
+    return f"tg:{bot.id}:{update.update_id}:{operation}"
+
+
+class Registration(StatesGroup):
+    name = State()  # ждём ФИ
+
+
+class ScoreEntry(StatesGroup):
+    subject = State()  # ждём выбор предмета
+    score = State()    # предмет выбран, ждём балл
+
 
 @dp.message(Command("start"))
 async def cmd_start(message: Message):
     kb = ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="/register"), KeyboardButton(text="/enter_scores")],
-            [KeyboardButton(text="/view_scores")]
+            [KeyboardButton(text="/view_scores"), KeyboardButton(text="/rank")]
         ],
         resize_keyboard=True
     )
@@ -40,6 +108,7 @@ async def cmd_start(message: Message):
         "/register - зарегистрировать студента\n"
         "/enter_scores - ввести баллы\n"
         "/view_scores - посмотреть результаты\n"
+        "/rank - место в рейтинге по предметам\n"
         "/cancel - отменить текущее действие",
         reply_markup=kb
     )
@@ -47,64 +116,69 @@ async def cmd_start(message: Message):
 
 # ----- Регистрация -----
 @dp.message(Command("register"))
-async def cmd_register(message: Message):
-    user_id = message.from_user.id
-    pending_registration[user_id] = True
+async def cmd_register(message: Message, state: FSMContext):
+    await state.set_state(Registration.name)
     # убираем клавиатуру, чтобы пользователь просто ввёл "Иван Иванов"
     await message.answer("Отправь своё имя и фамилию через пробел (например: Иван Иванов). Для отмены нажми /cancel.",
                          reply_markup=ReplyKeyboardMarkup(keyboard=[[]], resize_keyboard=True))
 
 
-@dp.message(F.text.regexp(r"^\S+\s+\S+$"))
-async def handle_name(message: Message):
+# Обработка только если пользователь действительно в состоянии регистрации
+@dp.message(Registration.name, F.text.regexp(r"^\S+\s+\S+$"))
+async def handle_name(message: Message, state: FSMContext, api: ApiClient, students: StudentRegistry,
+                      bot: Bot, event_update: Update):
     user_id = message.from_user.id
-    # Обработка только если пользователь действительно в состоянии регистрации
-    if user_id not in pending_registration:
-        return
 
     first_name, last_name = message.text.split(maxsplit=1)
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{API_URL}/students/", json={
-            "first_name": first_name,
-            "last_name": last_name
-        }, timeout=10)
-    if resp.status_code == 201:
-        student = resp.json()
-        user_ids[user_id] = student["id"]
-        await message.answer(f"Зарегистрирован как: {student['first_name']} {student['last_name']}")
+    try:
+        # повторная регистрация с того же аккаунта вернёт уже существующего студента
+        student = await api.create_student(first_name, last_name, telegram_id=user_id,
+                                           idempotency_key=update_key(bot, event_update, "register"))
+    except ApiError as e:
+        await message.answer(f"Ошибка при регистрации: {e}")
     else:
-        await message.answer(f"Ошибка при регистрации: {resp.status_code} {resp.text}")
+        await students.set(user_id, student["id"])
+        await message.answer(f"Зарегистрирован как: {student['first_name']} {student['last_name']}")
 
-    # Снимаем флаг ожидания регистрации
-    pending_registration.pop(user_id, None)
+    # Снимаем состояние ожидания регистрации
+    await state.clear()
 
 
 # ----- Ввод баллов -----
 @dp.message(Command("enter_scores"))
-async def cmd_enter_scores(message: Message):
+async def cmd_enter_scores(message: Message, command: CommandObject, state: FSMContext, api: ApiClient,
+                           students: StudentRegistry, subjects: SubjectList, bot: Bot, event_update: Update):
     user_id = message.from_user.id
-    if user_id not in user_ids:
+    if await students.get(user_id) is None:
         await message.answer("Сначала зарегистрируйся через /register")
         return
 
+    # "/enter_scores Математика 85, Физика 72" — сразу пакетный ввод, без выбора предмета
+    if command.args and looks_like_batch(command.args):
+        await save_score_batch(message, command.args, state, api, students, subjects,
+                               update_key(bot, event_update, "scores"))
+        return
+
     kb = ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=s)] for s in SUBJECTS] + [[KeyboardButton(text="/cancel")]],
+        keyboard=[[KeyboardButton(text=s)] for s in await subjects.refresh(api)] + [[KeyboardButton(text="/cancel")]],
         resize_keyboard=True
     )
     # помечаем: пользователь в режиме выбора предмета
-    pending_subject[user_id] = None
-    await message.answer("Выбери предмет (кнопкой):", reply_markup=kb)
+    await state.set_state(ScoreEntry.subject)
+    await message.answer("Выбери предмет (кнопкой) или отправь сразу несколько баллов одним сообщением, "
+                         "например: Математика 85, Физика 72", reply_markup=kb)
 
 
-@dp.message(F.text.in_(SUBJECTS))
-async def choose_subject(message: Message):
-    user_id = message.from_user.id
-    # действуем только если пользователь в режиме ввода баллов
-    if user_id not in pending_subject:
-        return
+def is_subject(message: Message, subjects: SubjectList) -> bool:
+    # список предметов обновляется на лету, поэтому не F.text.in_ со списком на момент импорта
+    return message.text in subjects
 
+
+@dp.message(ScoreEntry.subject, is_subject)
+async def choose_subject(message: Message, state: FSMContext):
     # Зафиксировали предмет и попросили ввести балл
-    pending_subject[user_id] = message.text
+    await state.update_data(subject=message.text)
+    await state.set_state(ScoreEntry.score)
     await message.answer(f"Введи балл по предмету {message.text} (0-100). Для отмены нажми /cancel.",
                          reply_markup=ReplyKeyboardMarkup(
                              keyboard=[[KeyboardButton(text="/cancel")]],
@@ -112,18 +186,46 @@ async def choose_subject(message: Message):
                          ))
 
 
-@dp.message(F.text & ~F.text.startswith("/"))
-async def handle_score(message: Message):
-    user_id = message.from_user.id
-    # действуем только если пользователь действительно в режиме ввода баллов
-    if user_id not in pending_subject:
+async def save_score_batch(message: Message, text: str, state: FSMContext, api: ApiClient,
+                           students: StudentRegistry, subjects: SubjectList, idempotency_key: str):
+    # всё проверяем локально: в API уходит только полностью корректный пакет
+    scores, errors = parse_score_batch(text, await subjects.refresh(api))
+    if errors:
+        await message.answer("Не получилось разобрать:\n" + "\n".join(errors) +
+                             "\nИсправь и отправь ещё раз или нажми /cancel.")
+        # исправленное сообщение можно прислать без повторной команды
+        await state.set_state(ScoreEntry.subject)
         return
 
-    subject = pending_subject.get(user_id)
-    # Если предмет ещё не выбран — игнорируем (пользователь может писать что-то другое)
-    if subject is None:
-        await message.answer("Пожалуйста, выбери предмет кнопкой из списка или нажми /cancel.")
-        return
+    student_id = await students.get(message.from_user.id)
+    try:
+        await api.upsert_scores(student_id, scores, idempotency_key=idempotency_key)
+    except ApiError as e:
+        await message.answer(f"Ошибка при сохранении: {e}")
+    else:
+        lines = "\n".join(f"{subject} → {score}" for subject, score in scores.items())
+        await message.answer(f"Сохранил:\n{lines}")
+    await state.clear()
+
+
+@dp.message(ScoreEntry.subject, F.text & ~F.text.startswith("/"), F.text.func(looks_like_batch))
+async def handle_score_batch(message: Message, state: FSMContext, api: ApiClient, students: StudentRegistry,
+                             subjects: SubjectList, bot: Bot, event_update: Update):
+    await save_score_batch(message, message.text, state, api, students, subjects,
+                           update_key(bot, event_update, "scores"))
+
+
+@dp.message(ScoreEntry.subject, F.text & ~F.text.startswith("/"))
+async def remind_subject(message: Message):
+    # Предмет ещё не выбран — пользователь написал что-то другое
+    await message.answer("Пожалуйста, выбери предмет кнопкой из списка или нажми /cancel.")
+
+
+@dp.message(ScoreEntry.score, F.text & ~F.text.startswith("/"))
+async def handle_score(message: Message, state: FSMContext, api: ApiClient, students: StudentRegistry,
+                       bot: Bot, event_update: Update):
+    user_id = message.from_user.id
+    subject = (await state.get_data())["subject"]
 
     # Парсим и валидируем балл
     try:
@@ -135,56 +237,102 @@ async def handle_score(message: Message):
         return
 
     # Сохраняем через API
-    student_id = user_ids.get(user_id)
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{API_URL}/students/{student_id}/scores/", json={
-            "subject": subject,
-            "score": score
-        }, timeout=10)
-
-    if resp.status_code in (200, 201):
-        await message.answer(f"Сохранил: {subject} → {score}")
+    student_id = await students.get(user_id)
+    try:
+        await api.upsert_score(student_id, subject, score, idempotency_key=update_key(bot, event_update, "score"))
+    except ApiError as e:
+        await message.answer(f"Ошибка при сохранении: {e}")
     else:
-        await message.answer(f"Ошибка при сохранении: {resp.status_code} {resp.text}")
+        await message.answer(f"Сохранил: {subject} → {score}")
 
     # выходим из режима ввода баллов
-    pending_subject.pop(user_id, None)
+    await state.clear()
 
 
 # ----- Просмотр баллов -----
 @dp.message(Command("view_scores"))
-async def cmd_view_scores(message: Message):
+async def cmd_view_scores(message: Message, api: ApiClient, students: StudentRegistry):
     user_id = message.from_user.id
-    if user_id not in user_ids:
+    student_id = await students.get(user_id)
+    if student_id is None:
         await message.answer("Сначала зарегистрируйся через /register")
         return
 
-    student_id = user_ids[user_id]
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{API_URL}/students/{student_id}/scores/", timeout=10)
+    try:
+        scores = await api.list_scores(student_id)
+    except ApiError as e:
+        await message.answer(f"Ошибка при получении баллов: {e}")
+        return
+
+    years = sorted({s.get("exam_year") for s in scores}, key=lambda year: year or 0)
+    if len(years) > 1:
+        # пересдачи и прошлые годы: баллы группируются по году экзамена
+        text = "\n\n".join(
+            f"{year}:\n" + "\n".join(f"{s['subject']}: {s['score']}" for s in scores if s.get("exam_year") == year)
+            for year in years
+        )
+        await message.answer(f"Твои баллы:\n{text}")
+    elif scores:
+        text = "\n".join(f"{s['subject']}: {s['score']}" for s in scores)
+        await message.answer(f"Твои баллы:\n{text}")
+    else:
+        await message.answer("У тебя пока нет сохранённых баллов.")
 
-    if resp.status_code == 200:
-        scores = resp.json()
-        if scores:
-            text = "\n".join(f"{s['subject']}: {s['score']}" for s in scores)
-            await message.answer(f"Твои баллы:\n{text}")
-        else:
-            await message.answer("У тебя пока нет сохранённых баллов.")
+
+# ----- Рейтинг -----
+@dp.message(Command("rank"))
+async def cmd_rank(message: Message, api: ApiClient, students: StudentRegistry):
+    student_id = await students.get(message.from_user.id)
+    if student_id is None:
+        await message.answer("Сначала зарегистрируйся через /register")
+        return
+
+    try:
+        ranks = await api.get_rank(student_id)
+    except ApiError as e:
+        await message.answer(f"Ошибка при получении рейтинга: {e}")
+        return
+
+    if ranks:
+        text = "\n".join(
+            f"{r['subject']}: {r['score']} — место {r['rank']} из {r['total']}, "
+            f"ты в топ {max(1, math.ceil(r['top_percent']))}%"
+            for r in ranks
+        )
+        await message.answer(f"Твой рейтинг:\n{text}")
     else:
-        await message.answer(f"Ошибка при получении баллов: {resp.status_code} {resp.text}")
+        await message.answer("У тебя пока нет сохранённых баллов.")
+
+
+# ----- Рассылка -----
+@dp.message(Command("broadcast"), F.from_user.id.in_(BOT_ADMIN_IDS))
+async def cmd_broadcast(message: Message, command: CommandObject, bot: Bot, sender: OutboundSender,
+                        students: StudentRegistry):
+    if not command.args:
+        await message.answer("Использование: /broadcast текст сообщения")
+        return
+
+    job = sender.broadcast(bot, students.telegram_ids(), command.args)
+    await message.answer("Рассылка запущена.")
+
+    async def report():
+        await job.wait()
+        send_priority.set(NOTIFICATION)
+        await message.answer(f"Рассылка завершена: доставлено {job.sent}, ошибок {job.failed}.")
+
+    # хендлер не ждёт окончания рассылки
+    run_in_background(report())
 
 
 # ----- Отмена -----
 @dp.message(Command("cancel"))
-async def cmd_cancel(message: Message):
-    user_id = message.from_user.id
-    pending_subject.pop(user_id, None)
-    pending_registration.pop(user_id, None)
+async def cmd_cancel(message: Message, state: FSMContext):
+    await state.clear()
     await message.answer("Действие отменено. Возвращаю главное меню.",
                          reply_markup=ReplyKeyboardMarkup(
                              keyboard=[
                                  [KeyboardButton(text="/register"), KeyboardButton(text="/enter_scores")],
-                                 [KeyboardButton(text="/view_scores")]
+                                 [KeyboardButton(text="/view_scores"), KeyboardButton(text="/rank")]
                              ],
                              resize_keyboard=True
                          ))
@@ -193,7 +341,23 @@ async def cmd_cancel(message: Message):
 # ----- main -----
 async def main():
     print("Bot started...")
-    await dp.start_polling(bot)
+    # один клиент с пулом соединений на весь процесс; попадает в хендлеры как аргумент api
+    api = ApiClient.from_env(API_URL)
+    await subjects.refresh(api)
+    notifier = asyncio.create_task(ScoreNotifier(api, bot, students).run()) if BOT_NOTIFICATIONS else None
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot, api=api)
+        else:
+            if BOT_METRICS_PORT:
+                await run_metrics_server(int(BOT_METRICS_PORT))
+            await dp.start_polling(bot, api=api)
+    finally:
+        if notifier is not None:
+            notifier.cancel()
+            await asyncio.gather(notifier, return_exceptions=True)
+        await sender.close()
+        await api.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
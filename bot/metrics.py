@@ -0,0 +1,47 @@
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from common.metrics import Counter, Histogram, Registry
+
+registry = Registry()
+
+HANDLER_LATENCY = Histogram("bot_handler_duration_seconds", "Handler latency", ("handler",), registry)
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handlers that raised", ("handler",), registry)
+API_LATENCY = Histogram("bot_api_request_duration_seconds", "API call latency including retries",
+                        ("operation",), registry)
+API_ERRORS = Counter("bot_api_errors_total", "Failed API calls", ("operation", "reason"), registry)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Латентность и ошибки по хендлерам. Вешается как inner-middleware: хендлер уже выбран фильтрами."""
+
+    def __init__(self):
+        # callback -> (гистограмма, счётчик ошибок); заполняется один раз на хендлер
+        self._children: dict[Callable, tuple] = {}
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        callback = data["handler"].callback
+        children = self._children.get(callback)
+        if children is None:
+            name = getattr(callback, "__name__", repr(callback))
+            children = self._children[callback] = (HANDLER_LATENCY.labels(name), HANDLER_ERRORS.labels(name))
+        latency, errors = children
+
+        started = perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(perf_counter() - started)
+
+
+def error_reason(status_code) -> str:
+    if status_code is None:
+        return "network"
+    return f"{status_code // 100}xx"
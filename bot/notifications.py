@@ -0,0 +1,98 @@
+"""Уведомления об изменении баллов.
+
+ScoreNotifier подписывается на события API (long-poll GET /events/) и сам пишет студенту, когда его балл
+меняется не через бота: импорт результатов, исправление администратором. Студенту не нужно
+перепроверять /view_scores. Сообщения уходят через OutboundSender с приоритетом NOTIFICATION,
+поэтому не задерживают ответы на команды.
+
+Подписчик должен быть один: при нескольких репликах бота уведомления включают только на одной
+(BOT_NOTIFICATIONS).
+"""
+import asyncio
+import logging
+from collections import defaultdict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+
+from bot.api_client import SOURCE, ApiClient, ApiError
+from bot.sender import NOTIFICATION, send_priority
+from bot.storage import StudentRegistry
+
+logger = logging.getLogger(__name__)
+
+
+def format_changes(events: list[dict]) -> str:
+    lines = []
+    for event in events:
+        line = f"{event['subject']}: {event['score']}"
+        if event.get("previous_score") is not None:
+            line += f" (было {event['previous_score']})"
+        lines.append(line)
+    if len(lines) == 1:
+        return f"Обновился балл: {lines[0]}"
+    return "Обновились баллы:\n" + "\n".join(lines)
+
+
+class ScoreNotifier:
+    def __init__(self, api: ApiClient, bot: Bot, students: StudentRegistry, wait: float = 25.0,
+                 retry_delay: float = 5.0):
+        self.api = api
+        self.bot = bot
+        self.students = students
+        self.wait = wait
+        self.retry_delay = retry_delay
+        self.since = None
+
+    async def run(self):
+        send_priority.set(NOTIFICATION)  # задача работает в своей копии контекста
+        added = await self.students.reindex()
+        if added:
+            logger.info("Indexed %d students for notifications", added)
+        while True:
+            try:
+                page = await self.api.poll_events(self.since, self.wait)
+            except ApiError as e:
+                logger.warning("Event poll failed: %s", e)
+                await asyncio.sleep(self.retry_delay)
+                continue
+            if page.get("reset"):
+                logger.warning("Event stream reset, some notifications may be lost")
+            try:
+                await self.notify(page["events"])
+            except Exception:
+                # страница не перечитывается: повтор отправил бы уведомления тем, кто их уже получил
+                logger.exception("Failed to process events up to seq %s", page["last_seq"])
+            self.since = page["last_seq"]
+
+    async def notify(self, events: list[dict]) -> int:
+        """Одно сообщение на студента за страницу событий; возвращает число отправленных"""
+        by_student = defaultdict(dict)
+        for event in events:
+            if event["type"] != "score" or event.get("source") == SOURCE:
+                continue
+            changes = by_student[event["student_id"]]
+            earlier = changes.get(event["subject"])
+            if earlier is not None:
+                # несколько изменений одного предмета: новый балл из последнего, "было" — из первого
+                event = {**event, "previous_score": earlier["previous_score"]}
+            changes[event["subject"]] = event
+
+        async def send(student_id, changes) -> bool:
+            # одна попытка на студента: сбой логируется и не мешает остальным
+            try:
+                telegram_id = await self.students.telegram_id(student_id)
+                if telegram_id is None:
+                    return False
+                await self.bot.send_message(telegram_id, format_changes(list(changes.values())))
+            except TelegramAPIError as e:
+                logger.info("Notification to student %s failed: %s", student_id, e)
+                return False
+            except Exception:
+                logger.exception("Notification to student %s failed", student_id)
+                return False
+            return True
+
+        # отправки параллельны: лимиты Telegram соблюдает OutboundSender
+        sent = await asyncio.gather(*(send(student_id, changes) for student_id, changes in by_student.items()))
+        return sum(sent)
@@ -0,0 +1,51 @@
+import re
+
+# элементы пакета разделяются запятой, точкой с запятой или переводом строки
+ENTRY_SEPARATORS = re.compile(r"[,;\n]+")
+# "Русский язык 72", "Физика: 72", "Химия - 64"
+ENTRY = re.compile(r"^\s*(?P<subject>\D+?)\s*[:\-—]?\s*(?P<score>\d+)\s*$")
+# сокращение предмета должно быть не короче, чтобы "Х" не превращалось в "Химия"
+MIN_PREFIX = 3
+
+
+def looks_like_batch(text: str) -> bool:
+    """Есть ли в сообщении хотя бы один балл — иначе это не пакетный ввод"""
+    return any(ch.isdigit() for ch in text)
+
+
+def match_subject(name: str, subjects: list[str]):
+    """Предмет по названию без учёта регистра; допускается однозначное начало названия ("Русский")"""
+    name = " ".join(name.split()).lower()
+    for subject in subjects:
+        if subject.lower() == name:
+            return subject
+    if len(name) < MIN_PREFIX:
+        return None
+    candidates = [subject for subject in subjects if subject.lower().startswith(name)]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def parse_score_batch(text: str, subjects: list[str]) -> tuple[dict[str, int], list[str]]:
+    """"Математика 85, Физика 72" -> ({предмет: балл}, [ошибки]). Пакет без ошибок можно сразу отправлять в API."""
+    scores: dict[str, int] = {}
+    errors: list[str] = []
+    for entry in ENTRY_SEPARATORS.split(text):
+        if not entry.strip():
+            continue
+        match = ENTRY.match(entry)
+        if not match:
+            errors.append(f"«{entry.strip()}»: нужно «Предмет балл»")
+            continue
+        subject = match_subject(match["subject"], subjects)
+        score = int(match["score"])
+        if subject is None:
+            errors.append(f"«{match['subject'].strip()}»: неизвестный предмет")
+        elif not 0 <= score <= 100:
+            errors.append(f"{subject}: балл должен быть от 0 до 100")
+        elif subject in scores:
+            errors.append(f"{subject}: указан дважды")
+        else:
+            scores[subject] = score
+    if not scores and not errors:
+        errors.append("не найдено ни одного балла")
+    return scores, errors
@@ -0,0 +1,318 @@
+"""Исходящие сообщения с учётом лимитов Telegram.
+
+OutboundSender подключается как middleware сессии (bot.session.middleware(sender)), поэтому через него идут
+все SendMessage, включая message.answer в хендлерах. Лимиты: общий token bucket (~30 сообщений в секунду
+на бота) и bucket на каждый чат (~1 в секунду). Ответы пользователям идут раньше уведомлений и рассылок.
+Пока чат ждёт своей очереди, его сообщения склеиваются в одно. На 429 (TelegramRetryAfter) отправка
+приостанавливается на retry_after, и сообщение уходит повторно.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Iterable, Optional, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+logger = logging.getLogger(__name__)
+
+# приоритеты: меньше — раньше
+INTERACTIVE = 0   # ответ на сообщение пользователя
+NOTIFICATION = 1  # уведомление, которого пользователь не ждёт прямо сейчас
+BROADCAST = 2     # массовая рассылка
+
+# приоритет сообщений, отправленных из текущего контекста; рассылка выставляет BROADCAST
+send_priority: contextvars.ContextVar[int] = contextvars.ContextVar("send_priority", default=INTERACTIVE)
+
+MAX_MESSAGE_LENGTH = 4096
+COALESCE_SEPARATOR = "\n\n"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Через сколько секунд будет доступен токен; 0 — можно сейчас"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+@dataclass
+class Pending:
+    method: SendMessage
+    make_request: Any
+    bot: Bot
+    priority: int
+    future: asyncio.Future
+    attempts: int = 0
+
+
+@dataclass
+class ChatQueue:
+    bucket: TokenBucket
+    pending: deque = field(default_factory=deque)
+    blocked_until: float = 0.0
+    in_flight: bool = False
+    scheduled: bool = False
+
+
+def _mergeable(first: SendMessage, second: SendMessage) -> bool:
+    """Склеивать можно сообщения с одинаковыми параметрами; клавиатура допустима только у последнего"""
+    if first.reply_markup is not None or first.entities or second.entities:
+        return False
+    exclude = {"text", "reply_markup"}
+    return first.model_dump(exclude=exclude) == second.model_dump(exclude=exclude)
+
+
+class BroadcastJob:
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.task: Optional[asyncio.Task] = None
+
+    async def wait(self) -> "BroadcastJob":
+        await self.task
+        return self
+
+
+class OutboundSender(BaseRequestMiddleware):
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 concurrency: int = 8, max_retries: int = 5, coalesce: bool = True, clock=time.monotonic):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.coalesce = coalesce
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock)
+        self.blocked_until = 0.0
+        self._chats: dict[Any, ChatQueue] = {}
+        self._ready: list = []    # (priority, seq, chat_id) — чаты, которые можно отправлять
+        self._delayed: list = []  # (when, seq, chat_id) — чаты, ждущие свой лимит или retry_after
+        self._seq = itertools.count()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._deliveries: set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls) -> "OutboundSender":
+        return cls(
+            global_rate=float(os.getenv("BOT_SEND_RATE", "30")),
+            chat_rate=float(os.getenv("BOT_CHAT_SEND_RATE", "1")),
+            chat_burst=float(os.getenv("BOT_CHAT_SEND_BURST", "3")),
+            concurrency=int(os.getenv("BOT_SEND_CONCURRENCY", "8")),
+        )
+
+    async def __call__(self, make_request, bot, method):
+        if not isinstance(method, SendMessage):
+            return await make_request(bot, method)
+        return await self.enqueue(make_request, bot, method, send_priority.get())
+
+    async def enqueue(self, make_request, bot: Bot, method: SendMessage, priority: int = INTERACTIVE):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        chat = self._chats.get(method.chat_id)
+        if chat is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst, self.clock)
+            chat = self._chats[method.chat_id] = ChatQueue(bucket)
+        future = asyncio.get_running_loop().create_future()
+        chat.pending.append(Pending(method, make_request, bot, priority, future))
+        self._schedule(method.chat_id, chat)
+        return await future
+
+    def _schedule(self, chat_id, chat: ChatQueue):
+        if chat.scheduled or chat.in_flight or not chat.pending:
+            return
+        chat.scheduled = True
+        priority = min(p.priority for p in chat.pending)
+        heapq.heappush(self._ready, (priority, next(self._seq), chat_id))
+        self._wakeup.set()
+
+    def _promote_delayed(self, now: float):
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, chat_id = heapq.heappop(self._delayed)
+            chat = self._chats.get(chat_id)
+            if chat is not None:
+                chat.scheduled = False
+                self._schedule(chat_id, chat)
+
+    async def _run(self):
+        while True:
+            now = self.clock()
+            self._promote_delayed(now)
+            if not self._ready:
+                self._forget_idle_chats()
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # общий лимит и пауза после 429; после ожидания выбираем заново — мог прийти более срочный чат
+            wait = max(self.global_bucket.delay(), self.blocked_until - now)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            _, _, chat_id = heapq.heappop(self._ready)
+            chat = self._chats[chat_id]
+            chat.scheduled = False
+            if chat.in_flight or not chat.pending:
+                continue
+            chat_wait = max(chat.bucket.delay(), chat.blocked_until - now)
+            if chat_wait > 0:
+                # пока чат ждёт, новые сообщения в нём копятся и потом уйдут одним
+                chat.scheduled = True
+                heapq.heappush(self._delayed, (now + chat_wait, next(self._seq), chat_id))
+                continue
+
+            await self._slots.acquire()
+            batch = self._take_batch(chat)
+            if not batch:
+                # все ожидания в чате отменены, отправлять нечего
+                self._slots.release()
+                continue
+            self.global_bucket.take()
+            chat.bucket.take()
+            chat.in_flight = True
+            task = asyncio.create_task(self._deliver(chat_id, chat, batch))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    def _take_batch(self, chat: ChatQueue) -> list[Pending]:
+        # ожидание отменено (например, хендлер прервали) — такие сообщения не отправляем
+        chat.pending = deque(p for p in chat.pending if not p.future.done())
+        if not chat.pending:
+            return []
+        batch = [chat.pending.popleft()]
+        length = len(batch[0].method.text)
+        while self.coalesce and chat.pending:
+            candidate = chat.pending[0]
+            length += len(COALESCE_SEPARATOR) + len(candidate.method.text)
+            if length > MAX_MESSAGE_LENGTH or candidate.bot is not batch[-1].bot \
+                    or not _mergeable(batch[-1].method, candidate.method):
+                break
+            batch.append(chat.pending.popleft())
+        return batch
+
+    async def _deliver(self, chat_id, chat: ChatQueue, batch: list[Pending]):
+        method = batch[0].method
+        if len(batch) > 1:
+            text = COALESCE_SEPARATOR.join(p.method.text for p in batch)
+            method = batch[-1].method.model_copy(update={"text": text})
+        try:
+            result = await batch[0].make_request(batch[0].bot, method)
+        except TelegramRetryAfter as e:
+            # Telegram просит подождать: тормозим и этот чат, и всю отправку, иначе следующий 429 близко
+            until = self.clock() + e.retry_after
+            chat.blocked_until = until
+            self.blocked_until = max(self.blocked_until, until)
+            logger.warning("Flood limit for chat %s, retry after %s s", chat_id, e.retry_after)
+            retry = []
+            for pending in batch:
+                pending.attempts += 1
+                if pending.future.done():
+                    continue
+                if pending.attempts > self.max_retries:
+                    pending.future.set_exception(e)
+                else:
+                    retry.append(pending)
+            chat.pending.extendleft(reversed(retry))
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+        else:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_result(result)
+        finally:
+            chat.in_flight = False
+            self._slots.release()
+            self._schedule(chat_id, chat)
+
+    def _forget_idle_chats(self):
+        # чат без очереди и с полным bucket ничем не отличается от нового
+        idle = [chat_id for chat_id, chat in self._chats.items()
+                if not chat.pending and not chat.in_flight and not chat.scheduled
+                and chat.blocked_until <= self.clock() and chat.bucket.full]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+    def broadcast(self, bot: Bot, chat_ids: Union[Iterable[int], AsyncIterable[int]], text: str,
+                  max_pending: int = 1000, **kwargs) -> BroadcastJob:
+        """Рассылка на максимальной разрешённой скорости; ответы пользователям её обгоняют"""
+        job = BroadcastJob()
+
+        async def run():
+            send_priority.set(BROADCAST)  # задача работает в своей копии контекста
+            slots = asyncio.Semaphore(max_pending)
+            tasks = set()
+
+            async def one(chat_id):
+                try:
+                    await bot.send_message(chat_id, text, **kwargs)
+                    job.sent += 1
+                except TelegramAPIError as e:
+                    # пользователь заблокировал бота и т.п. — рассылку не прерываем
+                    logger.info("Broadcast to %s failed: %s", chat_id, e)
+                    job.failed += 1
+                finally:
+                    slots.release()
+
+            async def iterate():
+                if hasattr(chat_ids, "__aiter__"):
+                    async for chat_id in chat_ids:
+                        yield chat_id
+                else:
+                    for chat_id in chat_ids:
+                        yield chat_id
+
+            async for chat_id in iterate():
+                await slots.acquire()
+                task = asyncio.create_task(one(chat_id))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+
+        job.task = asyncio.create_task(run())
+        return job
+
+    async def close(self, drain: bool = True):
+        if drain:
+            while any(chat.pending or chat.in_flight for chat in self._chats.values()):
+                await asyncio.sleep(0.05)
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        await asyncio.gather(*self._deliveries, return_exceptions=True)
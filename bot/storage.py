@@ -0,0 +1,286 @@
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+
+class StateStore(ABC):
+    """Хранилище ключ-значение для состояния бота. Значения — любые JSON-сериализуемые объекты."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """ttl в секундах; None — хранить бессрочно"""
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def scan(self, prefix: str) -> AsyncIterator[str]:
+        """Ключи с префиксом, без загрузки всех сразу (в реализациях — async-генератор)"""
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryStateStore(StateStore):
+    """Память процесса: для разработки и тестов, в проде — sqlite или redis (BOT_STORAGE).
+
+    Не переживает рестарт. Записи с TTL (состояние диалогов) ограничены max_size и вытесняются по LRU.
+    Бессрочные записи — регистрации StudentRegistry — хранятся отдельно и не вытесняются, иначе под
+    нагрузкой бот забывал бы пользователей; поэтому память растёт с числом зарегистрированных.
+    """
+
+    def __init__(self, max_size: int = 100_000, clock=time.monotonic):
+        self.max_size = max_size
+        self.clock = clock
+        self._items: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._permanent: dict[str, Any] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        if key in self._permanent:
+            return self._permanent[key]
+        item = self._items.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= self.clock():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            self._items.pop(key, None)
+            self._permanent[key] = value
+            return
+        self._permanent.pop(key, None)
+        self._items[key] = (value, self.clock() + ttl)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._items.pop(key, None)
+        self._permanent.pop(key, None)
+
+    async def scan(self, prefix: str) -> AsyncIterator[str]:
+        for key in list(self._permanent):
+            if key.startswith(prefix):
+                yield key
+        now = self.clock()
+        for key, (_, expires_at) in list(self._items.items()):
+            if key.startswith(prefix) and expires_at > now:
+                yield key
+
+    def __len__(self):
+        return len(self._items) + len(self._permanent)
+
+
+class SQLiteStateStore(StateStore):
+    """Файл SQLite: переживает рестарт одного процесса бота. TTL по wall-clock времени."""
+
+    # просроченные записи чистятся не на каждой записи, а раз в PURGE_EVERY вызовов set
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._db = None
+        self._writes = 0
+
+    async def _connection(self):
+        if self._db is None:
+            import aiosqlite
+
+            self._db = await aiosqlite.connect(self.path)
+            await self._db.execute("PRAGMA journal_mode=WAL")
+            await self._db.execute(
+                "CREATE TABLE IF NOT EXISTS bot_state ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            await self._db.commit()
+        return self._db
+
+    async def get(self, key: str) -> Optional[Any]:
+        db = await self._connection()
+        async with db.execute(
+            "SELECT value FROM bot_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, self.clock()),
+        ) as cursor:
+            row = await cursor.fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        db = await self._connection()
+        expires_at = self.clock() + ttl if ttl is not None else None
+        await db.execute(
+            "INSERT INTO bot_state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, json.dumps(value, ensure_ascii=False), expires_at),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            await self.purge_expired()
+        await db.commit()
+
+    async def delete(self, key: str) -> None:
+        db = await self._connection()
+        await db.execute("DELETE FROM bot_state WHERE key = ?", (key,))
+        await db.commit()
+
+    async def scan(self, prefix: str) -> AsyncIterator[str]:
+        db = await self._connection()
+        # keyset по ключу: курсор не держится открытым, пока вызывающий обрабатывает ключи
+        last = prefix
+        while True:
+            async with db.execute(
+                "SELECT key FROM bot_state WHERE key > ? AND key < ? AND (expires_at IS NULL OR expires_at > ?) "
+                "ORDER BY key LIMIT 500",
+                (last, prefix + "\uffff", self.clock()),
+            ) as cursor:
+                rows = await cursor.fetchall()
+            if not rows:
+                return
+            for (key,) in rows:
+                yield key
+            last = rows[-1][0]
+
+    async def purge_expired(self) -> None:
+        db = await self._connection()
+        await db.execute("DELETE FROM bot_state WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                         (self.clock(),))
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+
+class RedisStateStore(StateStore):
+    """Любой сервер с протоколом Redis; общий для нескольких реплик бота. TTL выставляет сам Redis."""
+
+    def __init__(self, url: Optional[str] = None, client=None, prefix: str = "bot:"):
+        if client is None:
+            try:
+                from redis.asyncio import Redis
+            except ImportError:
+                raise RuntimeError("BOT_STORAGE=redis requires the 'redis' package")
+            client = Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        px = int(ttl * 1000) if ttl is not None else None
+        await self.client.set(self.prefix + key, json.dumps(value, ensure_ascii=False), px=px)
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
+
+    async def scan(self, prefix: str) -> AsyncIterator[str]:
+        async for key in self.client.scan_iter(match=self.prefix + prefix + "*", count=500):
+            if isinstance(key, bytes):
+                key = key.decode()
+            yield key[len(self.prefix):]
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def create_store(kind: str, url: Optional[str] = None) -> StateStore:
+    if kind == "memory":
+        return MemoryStateStore()
+    if kind == "sqlite":
+        return SQLiteStateStore(url or "bot_state.db")
+    if kind == "redis":
+        return RedisStateStore(url or "redis://localhost:6379/0")
+    raise ValueError(f"Unknown BOT_STORAGE: {kind!r}")
+
+
+def create_store_from_env() -> StateStore:
+    return create_store(os.getenv("BOT_STORAGE", "memory"), os.getenv("BOT_STORAGE_URL"))
+
+
+class StoreFSMStorage(BaseStorage):
+    """FSM-хранилище aiogram поверх StateStore: состояние и данные диалога истекают через state_ttl."""
+
+    def __init__(self, store: StateStore, state_ttl: Optional[float] = 3600,
+                 key_builder: Optional[KeyBuilder] = None):
+        self.store = store
+        self.state_ttl = state_ttl
+        self.key_builder = key_builder or DefaultKeyBuilder()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key, "state")
+        state = state.state if isinstance(state, State) else state
+        if state is None:
+            await self.store.delete(storage_key)
+        else:
+            await self.store.set(storage_key, state, ttl=self.state_ttl)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self.store.get(self.key_builder.build(key, "state"))
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self.key_builder.build(key, "data")
+        if not data:
+            await self.store.delete(storage_key)
+        else:
+            await self.store.set(storage_key, dict(data), ttl=self.state_ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return await self.store.get(self.key_builder.build(key, "data")) or {}
+
+    async def close(self) -> None:
+        await self.store.close()
+
+
+class StudentRegistry:
+    """Связь telegram_id -> student_id. Хранится без TTL, чтобы не регистрироваться заново после рестарта.
+
+    Обратная связь student_id -> telegram_id нужна для уведомлений по событиям API.
+    """
+
+    def __init__(self, store: StateStore):
+        self.store = store
+
+    async def get(self, telegram_id: int) -> Optional[int]:
+        return await self.store.get(f"student:{telegram_id}")
+
+    async def set(self, telegram_id: int, student_id: int) -> None:
+        await self.store.set(f"student:{telegram_id}", student_id)
+        await self.store.set(f"telegram:{student_id}", telegram_id)
+
+    async def telegram_id(self, student_id: int) -> Optional[int]:
+        return await self.store.get(f"telegram:{student_id}")
+
+    async def reindex(self) -> int:
+        """Достраивает обратную связь для регистраций, сделанных до её появления"""
+        added = 0
+        async for telegram_id in self.telegram_ids():
+            student_id = await self.get(telegram_id)
+            if student_id is not None and await self.telegram_id(student_id) is None:
+                await self.store.set(f"telegram:{student_id}", telegram_id)
+                added += 1
+        return added
+
+    async def telegram_ids(self) -> AsyncIterator[int]:
+        """Все зарегистрированные пользователи — для рассылок"""
+        async for key in self.store.scan("student:"):
+            yield int(key.removeprefix("student:"))
@@ -0,0 +1,38 @@
+"""Список предметов для клавиатуры и разбора пакетного ввода.
+
+Источник — справочник API (GET /subjects): новый предмет появляется в боте без релиза. Список
+перечитывается не чаще раза в ttl секунд; пока API недоступен, используется последний загруженный
+(до первой загрузки — встроенный fallback).
+"""
+import logging
+import time
+
+from bot.api_client import ApiClient, ApiError
+
+logger = logging.getLogger(__name__)
+
+
+class SubjectList:
+    def __init__(self, fallback: list[str], ttl: float = 600, clock=time.monotonic):
+        self.names = list(fallback)
+        self.ttl = ttl
+        self.clock = clock
+        self._checked_at = None
+
+    def __contains__(self, name) -> bool:
+        return name in self.names
+
+    async def refresh(self, api: ApiClient) -> list[str]:
+        now = self.clock()
+        if self._checked_at is not None and now - self._checked_at < self.ttl:
+            return self.names
+        # неудачная попытка тоже откладывает следующую: при лежащем API не ждём его на каждой команде
+        self._checked_at = now
+        try:
+            subjects = await api.list_subjects()
+        except ApiError as e:
+            logger.warning("Failed to load subjects, using cached list: %s", e)
+            return self.names
+        if subjects:
+            self.names = [subject["name"] for subject in subjects]
+        return self.names
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+import signal
+from collections import deque
+from typing import Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from common.metrics import CONTENT_TYPE
+from bot.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def update_owner(update: Update) -> int:
+    """Ключ для шардирования: пользователь, иначе чат, иначе сам update_id"""
+    event = update.event
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    return update.update_id
+
+
+class UpdatePipeline:
+    """Обработка апдейтов: очередь на пользователя и не больше concurrency хендлеров одновременно.
+
+    Очередь пользователя появляется с его первым апдейтом и исчезает, когда опустеет. Апдейты одного
+    пользователя обрабатываются по порядку, а его всплеск (хендлеры ждут лимит исходящих сообщений чата
+    в OutboundSender) занимает один слот и не задерживает остальных. Принятых, но не обработанных апдейтов
+    не больше queue_size: при переполнении submit ждёт.
+
+    Telegram получает ответ до обработки. При штатной остановке принятые апдейты дорабатываются (stop),
+    а при падении процесса они теряются: Telegram их уже не повторит.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, concurrency: int = 64, queue_size: int = 1000,
+                 **workflow_data):
+        self.dp = dp
+        self.bot = bot
+        self.workflow_data = workflow_data
+        self.queues: dict[int, deque[Update]] = {}
+        self.tasks: dict[int, asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._capacity = asyncio.Semaphore(queue_size)
+        self.accepting = False
+
+    async def start(self):
+        self.accepting = True
+
+    async def submit(self, update: Update):
+        if not self.accepting:
+            raise RuntimeError("Pipeline is stopped")
+        await self._capacity.acquire()
+        if not self.accepting:
+            self._capacity.release()
+            raise RuntimeError("Pipeline is stopped")
+        owner = update_owner(update)
+        queue = self.queues.get(owner)
+        if queue is None:
+            queue = self.queues[owner] = deque()
+            self.tasks[owner] = asyncio.create_task(self._process(owner, queue))
+        queue.append(update)
+
+    async def _process(self, owner: int, queue: deque[Update]):
+        try:
+            while queue:
+                update = queue.popleft()
+                try:
+                    async with self._slots:
+                        await self.dp.feed_update(self.bot, update, **self.workflow_data)
+                except Exception:
+                    logger.exception("Failed to process update %s", update.update_id)
+                finally:
+                    self._capacity.release()
+        finally:
+            del self.queues[owner], self.tasks[owner]
+
+    async def stop(self, drain: bool = True):
+        """Перестаёт принимать апдейты; при drain=True сначала дорабатывает уже принятые."""
+        self.accepting = False
+        if drain:
+            while self.tasks:
+                await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def metrics_handler(request: web.Request):
+    return web.Response(body=registry.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+
+def create_webhook_app(pipeline: UpdatePipeline, path: str = "/webhook",
+                       secret: Optional[str] = None) -> web.Application:
+    async def handle_update(request: web.Request):
+        if secret and request.headers.get(SECRET_HEADER) != secret:
+            return web.Response(status=401)
+        if not pipeline.accepting:
+            # Telegram повторит доставку после рестарта
+            return web.Response(status=503)
+        update = Update.model_validate(await request.json(), context={"bot": pipeline.bot})
+        await pipeline.submit(update)
+        # отвечаем сразу: обработка идёт в фоне, Telegram не ждёт хендлеры
+        return web.Response()
+
+    async def on_startup(app):
+        await pipeline.start()
+        await pipeline.dp.emit_startup(bot=pipeline.bot, **pipeline.workflow_data)
+
+    async def on_cleanup(app):
+        # к этому моменту сервер уже не принимает запросы: дорабатываем очередь и закрываем FSM-хранилище
+        await pipeline.stop(drain=True)
+        await pipeline.dp.emit_shutdown(bot=pipeline.bot, **pipeline.workflow_data)
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.router.add_get("/metrics", metrics_handler)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+async def run_metrics_server(port: int, host: str = "0.0.0.0") -> web.AppRunner:
+    """Отдельный HTTP-сервер только с /metrics — для режима polling"""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, **workflow_data):
+    path = os.getenv("WEBHOOK_PATH", "/webhook")
+    secret = os.getenv("WEBHOOK_SECRET")
+    pipeline = UpdatePipeline(
+        dp, bot,
+        concurrency=int(os.getenv("BOT_CONCURRENCY", "64")),
+        queue_size=int(os.getenv("BOT_QUEUE_SIZE", "1000")),
+        **workflow_data,
+    )
+    app = create_webhook_app(pipeline, path, secret)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, os.getenv("WEBHOOK_HOST", "0.0.0.0"), int(os.getenv("WEBHOOK_PORT", "8080")))
+    await site.start()
+
+    public_url = os.getenv("WEBHOOK_URL")
+    if public_url:
+        await bot.set_webhook(public_url.rstrip("/") + path, secret_token=secret,
+                              allowed_updates=dp.resolve_used_update_types())
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        await bot.session.close()
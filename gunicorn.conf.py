@@ -0,0 +1,56 @@
+"""Продакшен-запуск API: gunicorn управляет процессами, в каждом — uvicorn-воркер с event loop.
+
+    alembic upgrade head && gunicorn api.main:app
+
+gunicorn сам берёт этот файл из текущего каталога. Пул БД у каждого воркера свой: на сервер приходится
+WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) соединений, это должно укладываться в max_connections.
+
+Кэш, шина событий и ключи идемпотентности по умолчанию живут в памяти процесса. При нескольких воркерах
+нужны общие бэкенды (CACHE_BACKEND=redis или none, EVENTS_BACKEND=postgres, IDEMPOTENCY_BACKEND=database),
+иначе мастер не стартует (см. on_starting).
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+# async-воркер сам обслуживает тысячи соединений, поэтому по одному на ядро, а не 2 * CPU + 1, как для sync
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# приложение импортируется один раз в мастере, воркеры получают его через fork: импорт не повторяется
+# в каждом воркере, а страницы с кодом общие. Соединений при импорте не открывается (см. post_fork).
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes")
+
+# воркер, не ответивший мастеру за timeout секунд, перезапускается; long-poll /events/ на это не влияет
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# перезапуск воркера после N запросов — страховка от утечек; 0 — выключено
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+# бэкенды, состояние которых не видно другим воркерам
+PROCESS_LOCAL_BACKENDS = ("CACHE_BACKEND", "EVENTS_BACKEND", "IDEMPOTENCY_BACKEND")
+
+
+def on_starting(server):
+    if server.cfg.workers <= 1:
+        return
+    local = [name for name in PROCESS_LOCAL_BACKENDS if os.getenv(name, "memory") == "memory"]
+    if local:
+        # запись в одном воркере не сбросит кэш другого, long-poll /events/ будет получать reset,
+        # повтор с Idempotency-Key в другом воркере выполнится заново
+        raise RuntimeError(f"{', '.join(local)}=memory is per process and cannot be used with "
+                           f"{server.cfg.workers} workers: configure shared backends or set WEB_CONCURRENCY=1")
+
+
+def post_fork(server, worker):
+    # движки созданы в мастере при импорте: воркер не должен пользоваться унаследованным состоянием пула
+    from api.db import engine, read_engine, shard_router
+
+    for db_engine in {engine, read_engine, *shard_router.engines.values()}:
+        db_engine.sync_engine.dispose(close=False)
@@ -0,0 +1,104 @@
+import itertools
+from datetime import datetime, timezone
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage
+from aiogram.types import Chat, Message, Update
+
+BOT_TOKEN = "42:TEST"
+
+
+class FakeSession(BaseSession):
+    """Сессия Bot API без сети: запоминает вызовы и отвечает правдоподобными объектами"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+        self._message_ids = itertools.count(1000)
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests.append(method)
+        if isinstance(method, SendMessage):
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(timezone.utc),
+                chat=Chat(id=method.chat_id, type="private"),
+                text=method.text,
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+    @property
+    def sent_texts(self):
+        return [m.text for m in self.requests if isinstance(m, SendMessage)]
+
+
+def make_bot() -> Bot:
+    return Bot(BOT_TOKEN, session=FakeSession())
+
+
+_update_ids = itertools.count(1)
+
+
+def message_update(user_id: int, text: str, update_id: int = None) -> Update:
+    """Update с личным текстовым сообщением, как его присылает Telegram"""
+    update_id = update_id or next(_update_ids)
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(datetime.now(timezone.utc).timestamp()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    })
+
+
+class FakeApi:
+    """Заглушка ApiClient с данными в памяти"""
+
+    def __init__(self, subjects=("Математика", "Русский язык", "Физика", "Информатика", "Химия", "Литература",
+                                 "Биология")):
+        self.students = {}
+        self.scores = {}
+        self.idempotency_keys = []
+        self.subjects = [{"id": i, "name": name} for i, name in enumerate(subjects, 1)]
+
+    async def list_subjects(self, **kwargs):
+        return self.subjects
+
+    async def create_student(self, first_name, last_name, idempotency_key=None, **kwargs):
+        self.idempotency_keys.append(idempotency_key)
+        student = {"id": len(self.students) + 1, "first_name": first_name, "last_name": last_name}
+        self.students[student["id"]] = student
+        return student
+
+    async def upsert_score(self, student_id, subject, score, idempotency_key=None, **kwargs):
+        self.idempotency_keys.append(idempotency_key)
+        self.scores.setdefault(student_id, {})[subject] = score
+        return {"student_id": student_id, "subject": subject, "score": score}
+
+    async def upsert_scores(self, student_id, scores, idempotency_key=None, **kwargs):
+        self.idempotency_keys.append(idempotency_key)
+        self.scores.setdefault(student_id, {}).update(scores)
+        return [{"student_id": student_id, "subject": subject, "score": score} for subject, score in scores.items()]
+
+    async def list_scores(self, student_id, **kwargs):
+        return [{"subject": subject, "score": score}
+                for subject, score in self.scores.get(student_id, {}).items()]
+
+    async def get_rank(self, student_id, **kwargs):
+        ranks = []
+        for subject, score in self.scores.get(student_id, {}).items():
+            results = [s[subject] for s in self.scores.values() if subject in s]
+            rank = 1 + sum(1 for other in results if other > score)
+            ranks.append({"subject": subject, "score": score, "rank": rank, "total": len(results),
+                          "percentile": 0.0, "top_percent": 100 * rank / len(results)})
+        return ranks
@@ -1,35 +1,105 @@
+import asyncio
+import os
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel.pool import StaticPool
 
+# bot.bot создаёт Bot при импорте, токен должен быть синтаксически валидным
+os.environ.setdefault("BOT_TOKEN", "42:TEST")
+
 from api.main import app
-from api.db import get_session
+from api.cache import MemoryCache, get_cache
+from api.events import EventBus, get_event_bus
+from api.db import get_read_session, get_session, make_engine
+from api.subjects import SubjectCatalog, get_subject_catalog, seed_subjects
+
+
+@pytest.fixture(name="engine")
+def engine_fixture():
+    # Создаем in-memory SQLite базу для тестов (aiosqlite, одно соединение на тест)
+    engine = make_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    # Создаем таблицы и справочник предметов
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+            await seed_subjects(conn)
+
+    asyncio.run(create_tables())
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+class QueryCounter:
+    """SQL-запросы к движку теста: with queries.expect(1): ... падает, если запросов больше или меньше"""
+
+    def __init__(self, engine):
+        self.engine = engine.sync_engine
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @contextmanager
+    def expect(self, count: int):
+        start = len(self.statements)
+        yield
+        executed = self.statements[start:]
+        assert len(executed) == count, f"expected {count} queries, got {len(executed)}:\n" + "\n".join(executed)
 
+    def close(self):
+        event.remove(self.engine, "before_cursor_execute", self._record)
 
-@pytest.fixture(name="session")
-def session_fixture():
-    # Создаем in-memory SQLite базу для тестов
-    engine = create_engine(
-        "sqlite:///file:memdb1?mode=memory&cache=shared",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
 
-    # Создаем таблицы
-    SQLModel.metadata.create_all(engine)
+@pytest.fixture(name="queries")
+def queries_fixture(engine):
+    counter = QueryCounter(engine)
+    yield counter
+    counter.close()
 
-    with Session(engine) as session:
-        yield session
+
+@pytest.fixture(name="session_factory")
+def session_factory_fixture(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture(name="cache")
+def cache_fixture():
+    # Свой кэш на каждый тест, иначе записи переживают пересоздание базы
+    return MemoryCache()
+
+
+@pytest.fixture(name="events")
+def events_fixture():
+    # Свой буфер событий на каждый тест: seq начинается с нуля
+    return EventBus()
+
+
+@pytest.fixture(name="subjects")
+def subjects_fixture():
+    # Каталог предметов читается из базы теста, а не из общей для процесса копии
+    return SubjectCatalog()
 
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
-    # Переопределяем зависимость get_session
-    def get_session_override():
-        return session
+def client_fixture(session_factory, cache, events, subjects):
+    # Переопределяем зависимость get_session: сессия создаётся в цикле событий запроса
+    async def get_session_override():
+        async with session_factory() as session:
+            yield session
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_cache] = lambda: cache
+    app.dependency_overrides[get_event_bus] = lambda: events
+    app.dependency_overrides[get_subject_catalog] = lambda: subjects
 
     client = TestClient(app)
     yield client
@@ -58,4 +128,16 @@ def sample_score_data():
 def created_student(client, sample_student_data):
     """Создает студента и возвращает его данные"""
     response = client.post("/students/", json=sample_student_data)
-    return response.json()
\ No newline at end of file
+    return response.json()
+
+
+@pytest.fixture(name="add_student")
+def add_student_fixture(client):
+    """add_student({предмет: балл}, first_name) создаёт студента с баллами и возвращает его id"""
+    def add_student(scores: dict, first_name: str = "Имя") -> int:
+        student = client.post("/students/", json={"first_name": first_name, "last_name": "Тестов"}).json()
+        for subject, score in scores.items():
+            client.post(f"/students/{student['id']}/scores/", json={"subject": subject, "score": score})
+        return student["id"]
+
+    return add_student
@@ -0,0 +1,158 @@
+import json
+
+import httpx
+import pytest
+
+from bot.api_client import ApiClient, ApiError
+from bot.subjects import SubjectList
+
+
+def make_client(handler, **kwargs):
+    kwargs.setdefault("backoff", 0)
+    return ApiClient("http://api", transport=httpx.MockTransport(handler), **kwargs)
+
+
+class TestApiClient:
+    """Тесты общего HTTP-клиента бота"""
+
+    @pytest.mark.asyncio
+    async def test_create_student(self):
+        """Тест: create_student отправляет ФИ и возвращает созданного студента"""
+        def handler(request):
+            assert request.url.path == "/students/"
+            return httpx.Response(201, json={"id": 1, "first_name": "Иван", "last_name": "Иванов"})
+
+        api = make_client(handler)
+        student = await api.create_student("Иван", "Иванов")
+        await api.aclose()
+
+        assert student["id"] == 1
+
+    @pytest.mark.asyncio
+    async def test_upsert_scores_single_request(self):
+        """Тест: upsert_scores отправляет все предметы одним запросом на /batch"""
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json=[])
+
+        api = make_client(handler)
+        await api.upsert_scores(7, {"Математика": 85, "Физика": 72})
+        await api.aclose()
+
+        assert len(requests) == 1
+        assert requests[0].url.path == "/students/7/scores/batch"
+        assert json.loads(requests[0].content) == {"scores": [{"subject": "Математика", "score": 85},
+                                                              {"subject": "Физика", "score": 72}]}
+
+    @pytest.mark.asyncio
+    async def test_retries_idempotent_on_5xx(self):
+        """Тест: GET повторяется после 503 и в итоге возвращает данные"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) < 3:
+                return httpx.Response(503)
+            return httpx.Response(200, json=[{"subject": "Физика", "score": 70}])
+
+        api = make_client(handler)
+        scores = await api.list_scores(1)
+        await api.aclose()
+
+        assert len(calls) == 3
+        assert scores[0]["score"] == 70
+
+    @pytest.mark.asyncio
+    async def test_no_retry_for_create_on_5xx(self):
+        """Тест: неидемпотентный POST не повторяется после 5xx"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(500, text="boom")
+
+        api = make_client(handler)
+        with pytest.raises(ApiError) as exc:
+            await api.create_student("Иван", "Иванов")
+        await api.aclose()
+
+        assert len(calls) == 1
+        assert exc.value.status_code == 500
+
+    @pytest.mark.asyncio
+    async def test_create_with_idempotency_key_retried(self):
+        """Тест: с ключом идемпотентности создание повторяется после 5xx с тем же ключом"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) < 2:
+                return httpx.Response(503)
+            return httpx.Response(201, json={"id": 1, "first_name": "Иван", "last_name": "Иванов"})
+
+        api = make_client(handler)
+        await api.create_student("Иван", "Иванов", telegram_id=100, idempotency_key="tg:42:7:register")
+        await api.aclose()
+
+        assert [r.headers["idempotency-key"] for r in calls] == ["tg:42:7:register"] * 2
+        assert json.loads(calls[0].content)["telegram_id"] == 100
+
+    @pytest.mark.asyncio
+    async def test_retries_connect_errors(self):
+        """Тест: ошибки соединения повторяются, после исчерпания попыток — ApiError"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            raise httpx.ConnectError("refused", request=request)
+
+        api = make_client(handler, retries=2)
+        with pytest.raises(ApiError) as exc:
+            await api.create_student("Иван", "Иванов")
+        await api.aclose()
+
+        assert len(calls) == 3
+        assert exc.value.status_code is None
+
+    @pytest.mark.asyncio
+    async def test_client_error_not_retried(self):
+        """Тест: 404 сразу превращается в ApiError"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(404, json={"detail": "Student not found"})
+
+        api = make_client(handler)
+        with pytest.raises(ApiError) as exc:
+            await api.upsert_score(999, "Физика", 70)
+        await api.aclose()
+
+        assert len(calls) == 1
+        assert exc.value.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_subject_list_keeps_cache_when_api_down(self):
+        """Тест: справочник перечитывается не чаще ttl, при ошибке API остаётся прежний список"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) > 1:
+                return httpx.Response(503)
+            return httpx.Response(200, json=[{"id": 1, "name": "Математика"}, {"id": 2, "name": "Физика"}])
+
+        now = [0.0]
+        subjects = SubjectList(["Химия"], ttl=60, clock=lambda: now[0])
+        api = make_client(handler, retries=0)
+        first = await subjects.refresh(api)
+        cached = await subjects.refresh(api)
+        now[0] = 61
+        after_error = await subjects.refresh(api)
+        await api.aclose()
+
+        assert first == cached == after_error == ["Математика", "Физика"]
+        assert len(calls) == 2
+        assert "Физика" in subjects and "Химия" not in subjects
@@ -0,0 +1,131 @@
+import pytest
+
+from bot.bot import dp
+from bot.subjects import SubjectList
+from tests.bot_fakes import FakeApi, make_bot, message_update
+
+
+class TestBotHandlers:
+    """Тесты сценариев бота через Dispatcher"""
+
+    @pytest.mark.asyncio
+    async def test_register_enter_and_view_scores(self):
+        """Тест полного сценария: регистрация → ввод балла → просмотр"""
+        bot, api = make_bot(), FakeApi()
+        user_id = 5001
+
+        for text in ["/register", "Иван Иванов", "/enter_scores", "Физика", "78", "/view_scores"]:
+            await dp.feed_update(bot, message_update(user_id, text), api=api)
+
+        texts = bot.session.sent_texts
+        assert "Зарегистрирован как: Иван Иванов" in texts
+        assert "Сохранил: Физика → 78" in texts
+        assert texts[-1] == "Твои баллы:\nФизика: 78"
+
+    @pytest.mark.asyncio
+    async def test_view_scores_grouped_by_year(self):
+        """Тест: баллы за несколько лет выводятся по годам"""
+        bot, api = make_bot(), FakeApi()
+        user_id = 5010
+        for text in ["/register", "Иван Иванов"]:
+            await dp.feed_update(bot, message_update(user_id, text), api=api)
+
+        async def list_scores(student_id, **kwargs):
+            return [{"subject": "Физика", "score": 61, "exam_year": 2025},
+                    {"subject": "Физика", "score": 78, "exam_year": 2026}]
+        api.list_scores = list_scores
+        await dp.feed_update(bot, message_update(user_id, "/view_scores"), api=api)
+
+        assert bot.session.sent_texts[-1] == "Твои баллы:\n2025:\nФизика: 61\n\n2026:\nФизика: 78"
+
+    @pytest.mark.asyncio
+    async def test_name_ignored_without_register(self):
+        """Тест: ФИ вне режима регистрации не создаёт студента"""
+        bot, api = make_bot(), FakeApi()
+
+        await dp.feed_update(bot, message_update(5002, "Иван Иванов"), api=api)
+
+        assert api.students == {}
+
+    @pytest.mark.asyncio
+    async def test_cancel_clears_state(self):
+        """Тест: после /cancel число не принимается как балл"""
+        bot, api = make_bot(), FakeApi()
+        user_id = 5003
+
+        for text in ["/register", "Анна Петрова", "/enter_scores", "Химия", "/cancel", "50"]:
+            await dp.feed_update(bot, message_update(user_id, text), api=api)
+
+        assert api.scores == {}
+
+    @pytest.mark.asyncio
+    async def test_rank(self):
+        """Тест команды /rank"""
+        bot, api = make_bot(), FakeApi()
+        api.scores = {10: {"Математика": 90}, 20: {"Математика": 70}}
+        user_id = 5004
+
+        for text in ["/register", "Олег Смирнов", "/enter_scores", "Математика", "80", "/rank"]:
+            await dp.feed_update(bot, message_update(user_id, text), api=api)
+
+        assert bot.session.sent_texts[-1] == "Твой рейтинг:\nМатематика: 80 — место 2 из 3, ты в топ 67%"
+
+    @pytest.mark.asyncio
+    async def test_batch_entry_single_api_call(self):
+        """Тест: несколько баллов одним сообщением — один вызов API и один ответ"""
+        bot, api = make_bot(), FakeApi()
+        calls = []
+        upsert_scores = api.upsert_scores
+
+        async def counting_upsert_scores(student_id, scores, **kwargs):
+            calls.append(scores)
+            return await upsert_scores(student_id, scores, **kwargs)
+
+        api.upsert_scores = counting_upsert_scores
+        user_id = 5005
+
+        for text in ["/register", "Мария Козлова", "/enter_scores", "Математика 85, Физика 72\nХимия 64"]:
+            await dp.feed_update(bot, message_update(user_id, text), api=api)
+
+        assert calls == [{"Математика": 85, "Физика": 72, "Химия": 64}]
+        assert bot.session.sent_texts[-1] == "Сохранил:\nМатематика → 85\nФизика → 72\nХимия → 64"
+
+    @pytest.mark.asyncio
+    async def test_batch_entry_in_command_and_fix_after_error(self):
+        """Тест: пакет в аргументах команды; после ошибки исправленное сообщение принимается"""
+        bot, api = make_bot(), FakeApi()
+        user_id = 5006
+
+        for text in ["/register", "Пётр Сидоров", "/enter_scores Математика 85, Физика 150"]:
+            await dp.feed_update(bot, message_update(user_id, text), api=api)
+        assert api.scores == {}
+        assert "Физика: балл должен быть от 0 до 100" in bot.session.sent_texts[-1]
+
+        await dp.feed_update(bot, message_update(user_id, "Математика 85, Физика 100"), api=api)
+        assert api.scores == {1: {"Математика": 85, "Физика": 100}}
+
+    @pytest.mark.asyncio
+    async def test_writes_keyed_by_update(self):
+        """Тест: запись в API идёт с ключом идемпотентности из update_id"""
+        bot, api = make_bot(), FakeApi()
+        user_id = 5007
+
+        await dp.feed_update(bot, message_update(user_id, "/register", update_id=900001), api=api)
+        await dp.feed_update(bot, message_update(user_id, "Олег Смирнов", update_id=900002), api=api)
+        await dp.feed_update(bot, message_update(user_id, "/enter_scores Физика 70", update_id=900003), api=api)
+
+        assert api.idempotency_keys == ["tg:42:900002:register", "tg:42:900003:scores"]
+
+    @pytest.mark.asyncio
+    async def test_subjects_loaded_from_api(self):
+        """Тест: клавиатура и проверка предмета берутся из справочника API, а не из встроенного списка"""
+        bot, api = make_bot(), FakeApi(subjects=["Математика", "Астрономия"])
+        subjects = SubjectList(["Математика"])
+        user_id = 5008
+
+        for text in ["/register", "Олег Смирнов", "/enter_scores", "Астрономия", "55"]:
+            await dp.feed_update(bot, message_update(user_id, text), api=api, subjects=subjects)
+
+        keyboard = next(m.reply_markup for m in bot.session.requests if m.text.startswith("Выбери предмет"))
+        assert [row[0].text for row in keyboard.keyboard] == ["Математика", "Астрономия", "/cancel"]
+        assert api.scores == {1: {"Астрономия": 55}}
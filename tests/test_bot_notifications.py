@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from bot.notifications import ScoreNotifier
+from bot.storage import MemoryStateStore, StudentRegistry
+from tests.bot_fakes import make_bot
+
+
+def event(seq, student_id, subject, score, previous_score=None, source=None):
+    return {"seq": seq, "type": "score", "student_id": student_id, "subject": subject, "score": score,
+            "previous_score": previous_score, "source": source}
+
+
+class EventsApi:
+    """Отдаёт заранее заданные страницы событий, потом висит, как long-poll без событий"""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.calls = []
+
+    async def poll_events(self, since=None, wait=25.0):
+        self.calls.append(since)
+        if not self.pages:
+            await asyncio.Event().wait()
+        return self.pages.pop(0)
+
+
+class TestScoreNotifier:
+    """Тесты уведомлений об изменении баллов"""
+
+    @pytest.mark.asyncio
+    async def test_one_message_per_student(self):
+        """Тест: изменения студента собираются в одно сообщение, свои изменения бота пропускаются"""
+        students = StudentRegistry(MemoryStateStore())
+        await students.set(501, 1)
+        await students.set(502, 2)
+        bot = make_bot()
+        notifier = ScoreNotifier(EventsApi([]), bot, students)
+
+        sent = await notifier.notify([
+            event(1, 1, "Физика", 70, 60),
+            event(2, 1, "Химия", 80),
+            event(3, 1, "Физика", 78, 70),
+            event(4, 2, "Физика", 90, source="bot"),
+            event(5, 3, "Физика", 50),  # студент не пользуется ботом
+        ])
+
+        assert sent == 1
+        assert bot.session.sent_texts == ["Обновились баллы:\nФизика: 78 (было 60)\nХимия: 80"]
+        assert bot.session.requests[0].chat_id == 501
+
+    @pytest.mark.asyncio
+    async def test_run_follows_stream(self):
+        """Тест: подписчик продолжает с last_seq и достраивает обратный индекс старых регистраций"""
+        store = MemoryStateStore()
+        await store.set("student:501", 1)  # регистрация до появления обратного индекса
+        api = EventsApi([
+            {"events": [], "last_seq": 10, "reset": False},
+            {"events": [event(11, 1, "Физика", 78, 70)], "last_seq": 11, "reset": False},
+        ])
+        bot = make_bot()
+        task = asyncio.create_task(ScoreNotifier(api, bot, StudentRegistry(store)).run())
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+        assert api.calls == [None, 10, 11]
+        assert bot.session.sent_texts == ["Обновился балл: Физика: 78 (было 70)"]
+
+    @pytest.mark.asyncio
+    async def test_failed_send_not_retried(self):
+        """Тест: сбой отправки одному студенту логируется, остальные получают сообщение, страница не повторяется"""
+        class BrokenRegistry(StudentRegistry):
+            async def telegram_id(self, student_id):
+                if student_id == 1:
+                    raise RuntimeError("storage unavailable")
+                return await super().telegram_id(student_id)
+
+        students = BrokenRegistry(MemoryStateStore())
+        await students.set(502, 2)
+        api = EventsApi([{"events": [event(1, 1, "Физика", 78), event(2, 2, "Химия", 64)], "last_seq": 2,
+                          "reset": False}])
+        bot = make_bot()
+        task = asyncio.create_task(ScoreNotifier(api, bot, students, retry_delay=0).run())
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+        assert api.calls == [None, 2]
+        assert bot.session.sent_texts == ["Обновился балл: Химия: 64"]
@@ -0,0 +1,35 @@
+from bot.bot import SUBJECTS
+from bot.parsing import parse_score_batch
+
+
+class TestScoreBatchParsing:
+    """Тесты разбора пакетного ввода баллов"""
+
+    def test_comma_separated(self):
+        """Тест: предметы через запятую"""
+        scores, errors = parse_score_batch("Математика 85, Физика 72", SUBJECTS)
+        assert scores == {"Математика": 85, "Физика": 72}
+        assert errors == []
+
+    def test_multiline_case_and_separators(self):
+        """Тест: многострочное сообщение, регистр, двоеточие/тире и сокращение предмета"""
+        text = "русский язык: 91\nХИМИЯ - 64\nИнформ 77"
+        scores, errors = parse_score_batch(text, SUBJECTS)
+        assert scores == {"Русский язык": 91, "Химия": 64, "Информатика": 77}
+        assert errors == []
+
+    def test_errors_reported_per_entry(self):
+        """Тест: каждая ошибка описана отдельно"""
+        scores, errors = parse_score_batch("Астрономия 50, Физика 120, Химия 60, Химия 61, Биология", SUBJECTS)
+        assert scores == {"Химия": 60}
+        assert errors == [
+            "«Астрономия»: неизвестный предмет",
+            "Физика: балл должен быть от 0 до 100",
+            "Химия: указан дважды",
+            "«Биология»: нужно «Предмет балл»",
+        ]
+
+    def test_ambiguous_or_short_prefix_rejected(self):
+        """Тест: слишком короткое сокращение не угадывается"""
+        _, errors = parse_score_batch("Х 50", SUBJECTS)
+        assert errors == ["«Х»: неизвестный предмет"]
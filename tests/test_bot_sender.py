@@ -0,0 +1,166 @@
+import asyncio
+import time
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from bot.sender import BROADCAST, OutboundSender, TokenBucket, send_priority
+from bot.storage import MemoryStateStore, StudentRegistry
+from tests.bot_fakes import BOT_TOKEN, FakeSession
+
+
+class FloodSession(FakeSession):
+    """FakeSession, отвечающая 429 на первые попытки в указанные чаты и блоком от части пользователей"""
+
+    def __init__(self, flood: dict = None, blocked: set = (), retry_after: int = 1):
+        super().__init__()
+        self.flood = dict(flood or {})
+        self.blocked = set(blocked)
+        self.retry_after = retry_after
+        self.sent_at = []
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, SendMessage):
+            if self.flood.get(method.chat_id):
+                self.flood[method.chat_id] -= 1
+                raise TelegramRetryAfter(method, "Flood control exceeded", self.retry_after)
+            if method.chat_id in self.blocked:
+                raise TelegramForbiddenError(method, "bot was blocked by the user")
+            self.sent_at.append((time.monotonic(), method.chat_id))
+        return await super().make_request(bot, method, timeout)
+
+
+def make_bot(sender: OutboundSender, **session_kwargs) -> Bot:
+    bot = Bot(BOT_TOKEN, session=FloodSession(**session_kwargs))
+    bot.session.middleware(sender)
+    return bot
+
+
+class TestTokenBucket:
+    """Тесты token bucket"""
+
+    def test_refills_at_rate(self):
+        """Тест: после исчерпания токен появляется через 1/rate секунд"""
+        now = [0.0]
+        bucket = TokenBucket(rate=2, capacity=1, clock=lambda: now[0])
+        assert bucket.delay() == 0
+        bucket.take()
+        assert bucket.delay() == pytest.approx(0.5)
+        now[0] = 0.5
+        assert bucket.delay() == 0
+
+
+class TestOutboundSender:
+    """Тесты планировщика исходящих сообщений"""
+
+    @pytest.mark.asyncio
+    async def test_pending_replies_to_one_chat_coalesced(self):
+        """Тест: сообщения, ждущие лимита чата, уходят одним"""
+        sender = OutboundSender(chat_rate=20, chat_burst=1)
+        bot = make_bot(sender)
+
+        await bot.send_message(1, "a")
+        results = await asyncio.gather(*(bot.send_message(1, text) for text in ["b", "c"]))
+        await sender.close()
+
+        assert bot.session.sent_texts == ["a", "b\n\nc"]
+        assert results[0] is results[1]
+
+    @pytest.mark.asyncio
+    async def test_keyboard_only_on_last_message_of_batch(self):
+        """Тест: клавиатура допустима только у последнего сообщения склейки"""
+        from aiogram.types import ReplyKeyboardRemove
+
+        sender = OutboundSender(chat_rate=20, chat_burst=1)
+        bot = make_bot(sender)
+
+        await asyncio.gather(bot.send_message(1, "a"), bot.send_message(1, "b", reply_markup=ReplyKeyboardRemove()),
+                             bot.send_message(1, "c"))
+        await sender.close()
+
+        assert bot.session.sent_texts == ["a\n\nb", "c"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_message_not_sent(self):
+        """Тест: сообщение, ожидание которого отменили, не отправляется, даже если оно в чате одно"""
+        sender = OutboundSender(chat_rate=20, chat_burst=1)
+        bot = make_bot(sender)
+
+        await bot.send_message(1, "a")
+        cancelled = asyncio.create_task(bot.send_message(1, "b"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0.1)
+        await bot.send_message(2, "c")
+        await sender.close()
+
+        assert bot.session.sent_texts == ["a", "c"]
+
+    @pytest.mark.asyncio
+    async def test_retry_after_honoured(self):
+        """Тест: на 429 сообщение отправляется повторно не раньше retry_after"""
+        sender = OutboundSender()
+        bot = make_bot(sender, flood={1: 1}, retry_after=1)
+
+        started = time.monotonic()
+        message = await bot.send_message(1, "hello")
+        await sender.close()
+
+        assert message.text == "hello"
+        assert bot.session.sent_texts == ["hello"]
+        assert time.monotonic() - started >= 0.95
+
+    @pytest.mark.asyncio
+    async def test_per_chat_rate(self):
+        """Тест: в один чат не чаще chat_rate сообщений в секунду"""
+        sender = OutboundSender(chat_rate=20, chat_burst=1, coalesce=False)
+        bot = make_bot(sender)
+
+        await asyncio.gather(*(bot.send_message(1, str(i)) for i in range(4)))
+        await sender.close()
+
+        times = [t for t, _ in bot.session.sent_at]
+        assert bot.session.sent_texts == ["0", "1", "2", "3"]
+        assert all(b - a >= 0.04 for a, b in zip(times, times[1:]))
+
+    @pytest.mark.asyncio
+    async def test_interactive_overtakes_broadcast(self):
+        """Тест: ответ пользователю уходит раньше ещё не отправленной рассылки"""
+        sender = OutboundSender(global_rate=20)
+        bot = make_bot(sender)
+
+        job = sender.broadcast(bot, range(100, 160), "news")
+        await asyncio.sleep(0.2)  # рассылка упёрлась в общий лимит
+        await bot.send_message(1, "reply")
+        await job.wait()
+        await sender.close()
+
+        chats = [chat_id for _, chat_id in bot.session.sent_at]
+        assert job.sent == 60
+        assert chats.index(1) < 40
+
+    @pytest.mark.asyncio
+    async def test_broadcast_to_registered_users(self):
+        """Тест: рассылка проходит по всем зарегистрированным и считает недоставленные"""
+        registry = StudentRegistry(MemoryStateStore())
+        for telegram_id in range(1, 11):
+            await registry.set(telegram_id, 100 + telegram_id)
+        sender = OutboundSender(global_rate=100)
+        bot = make_bot(sender, blocked={3, 7}, flood={5: 1}, retry_after=1)
+
+        job = await sender.broadcast(bot, registry.telegram_ids(), "Результаты опубликованы").wait()
+        await sender.close()
+
+        assert (job.sent, job.failed) == (8, 2)
+        assert sorted(chat_id for _, chat_id in bot.session.sent_at) == [1, 2, 4, 5, 6, 8, 9, 10]
+
+    @pytest.mark.asyncio
+    async def test_broadcast_priority_not_leaked(self):
+        """Тест: приоритет рассылки не меняет приоритет вызывающего кода"""
+        sender = OutboundSender()
+        bot = make_bot(sender)
+        await sender.broadcast(bot, [1], "x").wait()
+        await sender.close()
+        assert send_priority.get() != BROADCAST
@@ -0,0 +1,135 @@
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from bot.storage import MemoryStateStore, SQLiteStateStore, RedisStateStore, StoreFSMStorage, StudentRegistry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMemoryStateStore:
+    """Тесты хранилища в памяти"""
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiry(self):
+        """Тест: запись с TTL пропадает после истечения срока"""
+        clock = FakeClock()
+        store = MemoryStateStore(clock=clock)
+        await store.set("a", {"x": 1}, ttl=10)
+        await store.set("b", 2)
+
+        clock.now += 11
+
+        assert await store.get("a") is None
+        assert await store.get("b") == 2
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        """Тест: при переполнении вытесняется давно не использованная запись"""
+        store = MemoryStateStore(max_size=2)
+        await store.set("a", 1, ttl=60)
+        await store.set("b", 2, ttl=60)
+        await store.get("a")
+        await store.set("c", 3, ttl=60)
+
+        assert len(store) == 2
+        assert await store.get("b") is None
+        assert await store.get("a") == 1
+
+    @pytest.mark.asyncio
+    async def test_registrations_not_evicted(self):
+        """Тест: бессрочные записи (регистрации) не вытесняются состоянием диалогов"""
+        store = MemoryStateStore(max_size=2)
+        registry = StudentRegistry(store)
+        await registry.set(111, 1)
+        for i in range(10):
+            await store.set(f"fsm:{i}", "state", ttl=60)
+
+        assert await registry.get(111) == 1
+        assert await registry.telegram_id(1) == 111
+        assert [telegram_id async for telegram_id in registry.telegram_ids()] == [111]
+        assert len(store) == 4
+
+
+class TestSQLiteStateStore:
+    """Тесты хранилища в SQLite"""
+
+    @pytest.mark.asyncio
+    async def test_survives_restart(self, tmp_path):
+        """Тест: связь telegram_id -> student_id сохраняется после пересоздания хранилища"""
+        path = str(tmp_path / "state.db")
+        store = SQLiteStateStore(path)
+        await StudentRegistry(store).set(100, 7)
+        await store.close()
+
+        reopened = SQLiteStateStore(path)
+        assert await StudentRegistry(reopened).get(100) == 7
+        await reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiry(self, tmp_path):
+        """Тест: просроченная запись не возвращается и удаляется при очистке"""
+        clock = FakeClock()
+        store = SQLiteStateStore(str(tmp_path / "state.db"), clock=clock)
+        await store.set("a", "value", ttl=5)
+        assert await store.get("a") == "value"
+
+        clock.now += 6
+        assert await store.get("a") is None
+        await store.purge_expired()
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_registry_lists_all_users(self, tmp_path):
+        """Тест: обход реестра возвращает всех пользователей и не задевает чужие ключи"""
+        store = SQLiteStateStore(str(tmp_path / "state.db"))
+        registry = StudentRegistry(store)
+        for telegram_id in range(1, 1201):
+            await registry.set(telegram_id, telegram_id + 10_000)
+        await store.set("fsm:1:1:state", "ScoreEntry:subject")
+
+        telegram_ids = [telegram_id async for telegram_id in registry.telegram_ids()]
+
+        assert sorted(telegram_ids) == list(range(1, 1201))
+        await store.close()
+
+
+class TestRedisStateStore:
+    """Тесты хранилища с протоколом Redis (fakeredis)"""
+
+    @pytest.mark.asyncio
+    async def test_roundtrip(self):
+        """Тест записи, чтения и удаления"""
+        fakeredis = pytest.importorskip("fakeredis")
+        store = RedisStateStore(client=fakeredis.FakeAsyncRedis())
+        await store.set("a", {"subject": "Физика"}, ttl=60)
+
+        assert await store.get("a") == {"subject": "Физика"}
+        await store.delete("a")
+        assert await store.get("a") is None
+        await store.close()
+
+
+class TestStoreFSMStorage:
+    """Тесты FSM-хранилища aiogram поверх StateStore"""
+
+    @pytest.mark.asyncio
+    async def test_state_and_data_expire(self):
+        """Тест: состояние и данные диалога истекают через state_ttl"""
+        clock = FakeClock()
+        storage = StoreFSMStorage(MemoryStateStore(clock=clock), state_ttl=60)
+        key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+        await storage.set_state(key, "ScoreEntry:score")
+        await storage.update_data(key, {"subject": "Химия"})
+        assert await storage.get_state(key) == "ScoreEntry:score"
+        assert await storage.get_data(key) == {"subject": "Химия"}
+
+        clock.now += 61
+        assert await storage.get_state(key) is None
+        assert await storage.get_data(key) == {}
@@ -0,0 +1,99 @@
+import asyncio
+import random
+
+import pytest
+from aiogram import Dispatcher
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.bot import dp
+from bot.webhook import SECRET_HEADER, UpdatePipeline, create_webhook_app
+from tests.bot_fakes import FakeApi, make_bot, message_update
+
+
+def update_json(user_id, text):
+    return message_update(user_id, text).model_dump(mode="json", by_alias=True, exclude_none=True)
+
+
+class TestWebhook:
+    """Тесты webhook-режима бота"""
+
+    @pytest.mark.asyncio
+    async def test_recorded_updates_processed_in_order(self):
+        """Тест: апдейты, присланные подряд, обрабатываются в порядке поступления"""
+        bot, api = make_bot(), FakeApi()
+        pipeline = UpdatePipeline(dp, bot, concurrency=4, api=api)
+        app = create_webhook_app(pipeline, secret="s3cret")
+        user_id = 6001
+
+        async with TestClient(TestServer(app)) as client:
+            for text in ["/register", "Иван Иванов", "/enter_scores", "Химия", "64"]:
+                resp = await client.post("/webhook", json=update_json(user_id, text),
+                                         headers={SECRET_HEADER: "s3cret"})
+                assert resp.status == 200
+        # выход из контекста = graceful shutdown: очередь дорабатывается до конца
+
+        assert api.scores == {1: {"Химия": 64}}
+        assert "Сохранил: Химия → 64" in bot.session.sent_texts
+
+    @pytest.mark.asyncio
+    async def test_wrong_secret_rejected(self):
+        """Тест: запрос без секретного заголовка отклоняется"""
+        bot = make_bot()
+        app = create_webhook_app(UpdatePipeline(dp, bot, api=FakeApi()), secret="s3cret")
+
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.post("/webhook", json=update_json(6002, "/start"))
+            assert resp.status == 401
+
+        assert bot.session.requests == []
+
+    @pytest.mark.asyncio
+    async def test_pipeline_keeps_per_user_order(self):
+        """Тест: при параллельной обработке порядок сообщений одного пользователя сохраняется"""
+        local_dp = Dispatcher()
+        seen = {}
+
+        @local_dp.message()
+        async def record(message: Message):
+            await asyncio.sleep(random.random() / 100)
+            seen.setdefault(message.from_user.id, []).append(int(message.text))
+
+        pipeline = UpdatePipeline(local_dp, make_bot(), concurrency=3, queue_size=5)
+        await pipeline.start()
+        for i in range(20):
+            for user_id in (1, 2, 3, 4, 5):
+                await pipeline.submit(message_update(user_id, str(i)))
+        await pipeline.stop(drain=True)
+
+        assert seen == {user_id: list(range(20)) for user_id in (1, 2, 3, 4, 5)}
+
+    @pytest.mark.asyncio
+    async def test_slow_user_does_not_block_others(self):
+        """Тест: пока апдейты одного пользователя ждут, апдейты других обрабатываются"""
+        local_dp = Dispatcher()
+        release = asyncio.Event()
+        seen = []
+
+        @local_dp.message()
+        async def record(message: Message):
+            if message.from_user.id == 1:
+                await release.wait()  # как хендлер, ждущий лимит исходящих сообщений своего чата
+            seen.append((message.from_user.id, message.text))
+
+        pipeline = UpdatePipeline(local_dp, make_bot(), concurrency=2)
+        await pipeline.start()
+        for text in ("a", "b", "c"):
+            await pipeline.submit(message_update(1, text))
+        # пользователи 1 и 9 попадали в одну очередь при прежних 8 очередях по user_id % 8
+        for user_id in (2, 3, 9):
+            await pipeline.submit(message_update(user_id, "x"))
+        await asyncio.sleep(0.05)
+
+        assert seen == [(2, "x"), (3, "x"), (9, "x")]
+        assert list(pipeline.queues) == [1]
+
+        release.set()
+        await pipeline.stop(drain=True)
+        assert seen[3:] == [(1, "a"), (1, "b"), (1, "c")]
+        assert pipeline.queues == {}
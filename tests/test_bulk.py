@@ -0,0 +1,93 @@
+import json
+
+from fastapi import status
+
+
+class TestBulkScores:
+    """Тесты для пакетной загрузки баллов"""
+
+    def test_bulk_ndjson_success(self, client, created_student):
+        """Тест загрузки NDJSON: все строки записываются, повтор предмета обновляет балл"""
+        student_id = created_student["id"]
+        rows = [
+            {"student_id": student_id, "subject": "Математика", "score": 70},
+            {"student_id": student_id, "subject": "Физика", "score": 65},
+            {"student_id": student_id, "subject": "Математика", "score": 88},
+        ]
+        body = "\n".join(json.dumps(row, ensure_ascii=False) for row in rows) + "\n"
+
+        response = client.post("/scores/bulk", content=body.encode(),
+                               headers={"Content-Type": "application/x-ndjson"})
+
+        assert response.status_code == status.HTTP_200_OK
+        report = response.json()
+        assert report["processed"] == 3
+        assert report["upserted"] == 3
+        assert report["failed"] == 0
+
+        scores = {s["subject"]: s["score"] for s in client.get(f"/students/{student_id}/scores/").json()}
+        assert scores == {"Математика": 88, "Физика": 65}
+
+    def test_bulk_csv_success(self, client, created_student):
+        """Тест загрузки CSV с заголовком"""
+        student_id = created_student["id"]
+        body = f"student_id,subject,score\n{student_id},Химия,55\n{student_id},\"Русский язык\",91\n"
+
+        response = client.post("/scores/bulk", content=body.encode(),
+                               headers={"Content-Type": "text/csv"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["upserted"] == 2
+        assert len(client.get(f"/students/{student_id}/scores/").json()) == 2
+
+    def test_bulk_csv_from_excel(self, client, created_student):
+        """Тест: CSV из Excel — BOM, CRLF и поле в кавычках с переводом строки"""
+        student_id = created_student["id"]
+        body = (f"student_id,subject,score,comment\r\n{student_id},Химия,55,\"перепроверка\r\nпо апелляции\"\r\n"
+                f"{student_id},Физика,abc,\r\n")
+
+        report = client.post("/scores/bulk?format=csv", content=b"\xef\xbb\xbf" + body.encode()).json()
+
+        assert (report["upserted"], report["failed"]) == (1, 1)
+        assert report["errors"][0]["line"] == 4
+        assert client.get(f"/students/{student_id}/scores/").json()[0]["score"] == 55
+
+    def test_bulk_reports_row_errors(self, client, created_student):
+        """Тест: ошибочные строки попадают в отчёт, остальные записываются"""
+        student_id = created_student["id"]
+        lines = [
+            json.dumps({"student_id": student_id, "subject": "Математика", "score": 90}),
+            "not json",
+            json.dumps({"student_id": student_id, "subject": "Физика", "score": 101}),
+            json.dumps({"student_id": 999, "subject": "Физика", "score": 50}),
+            json.dumps({"student_id": student_id, "subject": "Химия", "score": 40}),
+        ]
+
+        response = client.post("/scores/bulk?format=ndjson&batch_size=2", content="\n".join(lines).encode())
+
+        report = response.json()
+        assert report["processed"] == 5
+        assert report["upserted"] == 2
+        assert report["failed"] == 3
+        assert sorted(error["line"] for error in report["errors"]) == [2, 3, 4]
+        assert len(client.get(f"/students/{student_id}/scores/").json()) == 2
+
+    def test_bulk_unknown_subject(self, client, created_student):
+        """Тест: строка с предметом не из справочника — ошибка строки, остальные записываются"""
+        student_id = created_student["id"]
+        body = f"student_id,subject,score\n{student_id},Астрономия,55\n{student_id},Химия,60\n"
+
+        report = client.post("/scores/bulk?format=csv", content=body.encode()).json()
+
+        assert report["upserted"] == 1
+        assert report["errors"] == [{"line": 2, "detail": "Unknown subject: Астрономия"}]
+
+    def test_bulk_errors_truncated(self, client):
+        """Тест ограничения размера отчёта об ошибках"""
+        body = "\n".join("{}" for _ in range(5))
+
+        report = client.post("/scores/bulk?max_errors=2", content=body.encode()).json()
+
+        assert report["failed"] == 5
+        assert len(report["errors"]) == 2
+        assert report["errors_truncated"] is True
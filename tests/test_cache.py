@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import status
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.pool import StaticPool
+
+from api import cache as cache_module
+from api.cache import MemoryCache
+from api.db import get_read_session, make_engine
+from api.main import app
+from api.models import Student
+
+
+@pytest.fixture(name="replica")
+def replica_fixture(monkeypatch):
+    """«Реплика», до которой ещё не дошла ни одна запись; метки записи живут 5 секунд"""
+    replica = make_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    async def create_tables():
+        async with replica.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+
+    async def get_replica_session():
+        async with AsyncSession(replica) as session:
+            yield session
+
+    asyncio.run(create_tables())
+    monkeypatch.setattr(cache_module, "REPLICA_LAG_WINDOW", 5)
+    app.dependency_overrides[get_read_session] = get_replica_session
+    yield replica
+    asyncio.run(replica.dispose())
+
+
+class TestCache:
+    """Тесты кэширования чтений"""
+
+    def test_get_student_cached(self, client, cache, created_student):
+        """Тест: повторное чтение студента обслуживается из кэша"""
+        student_id = created_student["id"]
+
+        first = client.get(f"/students/{student_id}")
+        second = client.get(f"/students/{student_id}")
+
+        assert first.json() == second.json() == created_student
+        assert cache.misses == 1
+        assert cache.hits == 1
+
+    def test_list_scores_invalidated_on_upsert(self, client, cache, created_student, sample_score_data):
+        """Тест: upsert сбрасывает закэшированный список баллов"""
+        student_id = created_student["id"]
+        assert client.get(f"/students/{student_id}/scores/").json() == []
+
+        client.post(f"/students/{student_id}/scores/", json=sample_score_data)
+        scores = client.get(f"/students/{student_id}/scores/").json()
+
+        assert len(scores) == 1
+        assert cache.hits == 0
+
+        client.get(f"/students/{student_id}/scores/")
+        assert cache.hits == 1
+
+    def test_list_scores_invalidated_on_bulk(self, client, created_student):
+        """Тест: пакетная загрузка сбрасывает кэш затронутых студентов"""
+        student_id = created_student["id"]
+        client.get(f"/students/{student_id}/scores/")
+
+        row = {"student_id": student_id, "subject": "Физика", "score": 77}
+        client.post("/scores/bulk", content=json.dumps(row).encode())
+
+        assert client.get(f"/students/{student_id}/scores/").json()[0]["score"] == 77
+
+    def test_reads_after_write_from_primary(self, client, cache, replica, created_student, sample_score_data):
+        """Тест: сразу после записи промах кэша читается из primary — отставание реплики не попадает в кэш"""
+        student_id = created_student["id"]
+
+        client.post(f"/students/{student_id}/scores/", json=sample_score_data)
+
+        assert client.get(f"/students/{student_id}").json() == created_student
+        assert client.get(f"/students/{student_id}/scores/").json()[0]["score"] == sample_score_data["score"]
+        assert client.get(f"/students/{student_id}/scores/").json()[0]["score"] == sample_score_data["score"]
+        assert cache.hits == 1
+
+    def test_reads_from_replica_after_lag_window(self, client, cache, replica, created_student):
+        """Тест: без недавней записи промах кэша читается с реплики"""
+        student_id = created_student["id"]
+
+        async def copy_to_replica():
+            async with AsyncSession(replica) as session:
+                session.add(Student(id=student_id, first_name="Иван", last_name="С реплики"))
+                await session.commit()
+            # окно после записи прошло: меток больше нет
+            await cache.clear()
+
+        asyncio.run(copy_to_replica())
+
+        assert client.get(f"/students/{student_id}").json()["last_name"] == "С реплики"
+        assert client.get(f"/students/{student_id}/scores/").json() == []
+
+    def test_not_found_not_cached(self, client, cache):
+        """Тест: отсутствие студента не кэшируется"""
+        assert client.get("/students/999").status_code == status.HTTP_404_NOT_FOUND
+        assert client.get("/students/999").status_code == status.HTTP_404_NOT_FOUND
+        assert cache.hits == 0
+
+    @pytest.mark.asyncio
+    async def test_memory_cache_ttl_and_lru(self):
+        """Тест: записи истекают по TTL и вытесняются по LRU"""
+        now = [0.0]
+        cache = MemoryCache(ttl=10, max_size=2, clock=lambda: now[0])
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.set("c", 3)
+        assert await cache.get("a") is None
+
+        now[0] = 11
+        assert await cache.get("b") is None
+        assert cache.stats()["misses"] == 2
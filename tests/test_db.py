@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import text
+
+from api.db import EngineSettings, PoolMetrics, make_engine, timed_pool_class, to_async_url
+
+
+class TestEngineSettings:
+    """Тесты конфигурации движка"""
+
+    def test_from_env(self, monkeypatch):
+        """Тест: параметры пула и таймаут запроса читаются из окружения"""
+        monkeypatch.setenv("DB_POOL_SIZE", "25")
+        monkeypatch.setenv("DB_MAX_OVERFLOW", "5")
+        monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "3000")
+        monkeypatch.delenv("SQL_ECHO", raising=False)
+        monkeypatch.delenv("DEBUG", raising=False)
+
+        settings = EngineSettings.from_env("postgresql+asyncpg://u@db/app")
+        kwargs = settings.engine_kwargs()
+
+        assert kwargs["pool_size"] == 25
+        assert kwargs["max_overflow"] == 5
+        assert kwargs["pool_pre_ping"] is True
+        assert kwargs["echo"] is False
+        assert kwargs["connect_args"] == {"server_settings": {"statement_timeout": "3000"}}
+
+    def test_echo_only_in_debug(self, monkeypatch):
+        """Тест: SQL-логирование включается только в отладке"""
+        monkeypatch.delenv("SQL_ECHO", raising=False)
+        monkeypatch.setenv("DEBUG", "1")
+        assert EngineSettings.from_env("sqlite+aiosqlite://").echo is True
+
+    def test_sqlite_skips_pool_options(self):
+        """Тест: для SQLite параметры пула не передаются"""
+        assert EngineSettings("sqlite+aiosqlite://").engine_kwargs() == {"echo": False}
+
+    def test_to_async_url(self):
+        """Тест подстановки асинхронного драйвера"""
+        assert to_async_url("postgresql://u@db/app") == "postgresql+asyncpg://u@db/app"
+        assert to_async_url("sqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+
+class TestPoolMetrics:
+    """Тесты метрик пула"""
+
+    @pytest.mark.asyncio
+    async def test_checkout_recorded(self, tmp_path):
+        """Тест: выдача соединения учитывается, занятые соединения видны в снимке"""
+        metrics = PoolMetrics()
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=timed_pool_class(metrics))
+
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert metrics.snapshot()["checked_out"] == 1
+        await engine.dispose()
+
+        snapshot = metrics.snapshot()
+        assert snapshot["checkouts"] == 1
+        assert snapshot["timeouts"] == 0
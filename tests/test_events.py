@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+
+from api.events import EventBus, PostgresEventBus
+
+
+class TestScoreEvents:
+    """Тесты событий изменения баллов"""
+
+    def test_changed_score_published(self, client, created_student):
+        """Тест: событие публикуется только при реальном изменении балла"""
+        student_id = created_student["id"]
+        url = f"/students/{student_id}/scores/"
+        headers = {"X-Source": "import"}
+
+        client.post(url, json={"subject": "Физика", "score": 70}, headers=headers)
+        client.post(url, json={"subject": "Физика", "score": 70}, headers=headers)
+        client.post(url, json={"subject": "Физика", "score": 78})
+
+        page = client.get("/events/", params={"since": 0, "timeout": 0}).json()
+        assert page["last_seq"] == 2
+        assert [(e["seq"], e["score"], e["previous_score"], e["source"]) for e in page["events"]] == [
+            (1, 70, None, "import"), (2, 78, 70, None)]
+        assert page["events"][0]["student_id"] == student_id
+
+    def test_batch_published(self, client, created_student):
+        """Тест: пакетный ввод публикует по событию на изменившийся предмет"""
+        url = f"/students/{created_student['id']}/scores/batch"
+        client.post(url, json={"scores": [{"subject": "Физика", "score": 70}, {"subject": "Химия", "score": 60}]})
+        client.post(url, json={"scores": [{"subject": "Физика", "score": 70}, {"subject": "Химия", "score": 65}]})
+
+        events = client.get("/events/", params={"since": 0, "timeout": 0}).json()["events"]
+
+        assert [(e["subject"], e["score"]) for e in events] == [("Физика", 70), ("Химия", 60), ("Химия", 65)]
+
+    def test_subscribe_from_now(self, client, created_student):
+        """Тест: без since возвращается только текущая позиция, старые события не отдаются"""
+        client.post(f"/students/{created_student['id']}/scores/", json={"subject": "Физика", "score": 70})
+
+        page = client.get("/events/").json()
+        empty = client.get("/events/", params={"since": page["last_seq"], "timeout": 0}).json()
+
+        assert page == {"events": [], "last_seq": 1, "reset": False}
+        assert empty["events"] == [] and empty["last_seq"] == 1
+
+
+class TestEventBus:
+    """Тесты буфера событий"""
+
+    @pytest.mark.asyncio
+    async def test_wait_wakes_on_publish(self):
+        """Тест: long-poll отвечает сразу после публикации, не дожидаясь таймаута"""
+        bus = EventBus()
+        waiter = asyncio.create_task(bus.wait(0, timeout=10))
+        await asyncio.sleep(0.01)
+
+        await bus.publish([{"type": "score", "student_id": 1, "subject": "Физика", "score": 78}])
+        page = await asyncio.wait_for(waiter, 1)
+
+        assert page["last_seq"] == 1
+        assert page["events"][0]["score"] == 78
+
+    @pytest.mark.asyncio
+    async def test_reset_when_events_lost(self):
+        """Тест: подписчик узнаёт, что отстал от буфера или что API перезапустился"""
+        bus = EventBus(size=2)
+        await bus.publish([{"type": "score", "score": score} for score in range(5)])
+
+        behind = await bus.wait(1, timeout=0)
+        restarted = await bus.wait(100, timeout=0)
+
+        assert behind["reset"] and [e["seq"] for e in behind["events"]] == [4, 5]
+        assert restarted == {"events": [], "last_seq": 5, "reset": True}
+
+    @pytest.mark.asyncio
+    async def test_out_of_order_events_wait_for_gap(self):
+        """Тест: событие, пришедшее раньше предыдущего по seq, не отдаётся, пока дыра не заполнится"""
+        bus = PostgresEventBus(engine=None)
+
+        def notify(seq):
+            bus._on_notify(None, 0, bus.channel, json.dumps({"seq": seq, "type": "score"}))
+
+        notify(1)
+        notify(3)
+
+        first = await bus.wait(0, timeout=0)
+        notify(2)
+        second = await bus.wait(first["last_seq"], timeout=0)
+
+        assert ([e["seq"] for e in first["events"]], first["last_seq"]) == ([1], 1)
+        assert ([e["seq"] for e in second["events"]], second["reset"]) == ([2, 3], False)
+
+    @pytest.mark.asyncio
+    async def test_unfilled_gap_skipped_after_timeout(self):
+        """Тест: seq откатившейся публикации не задерживает следующие события дольше gap_timeout"""
+        now = [0.0]
+        bus = EventBus(gap_timeout=5, clock=lambda: now[0])
+        bus._append({"seq": 1, "type": "score"})
+        bus._append({"seq": 3, "type": "score"})
+        assert (await bus.wait(1, timeout=0))["events"] == []
+
+        now[0] = 5
+        page = await bus.wait(1, timeout=0)
+
+        assert ([e["seq"] for e in page["events"]], page["last_seq"], page["reset"]) == ([3], 3, False)
@@ -0,0 +1,98 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+from fastapi import status
+
+from api import export
+
+
+@pytest.fixture
+def exported_scores(client):
+    """Три студента: баллы по физике за 2025 и 2026 и по химии за 2026"""
+    for i, (physics, chemistry) in enumerate([(60, 70), (75, 80), (90, 55)]):
+        student = client.post("/students/", json={"first_name": "Имя", "last_name": f"Фамилия{i}"}).json()
+        client.post(f"/students/{student['id']}/scores/",
+                    json={"subject": "Физика", "score": physics - 5, "exam_year": 2025})
+        client.post(f"/students/{student['id']}/scores/",
+                    json={"subject": "Физика", "score": physics, "exam_year": 2026})
+        client.post(f"/students/{student['id']}/scores/",
+                    json={"subject": "Химия", "score": chemistry, "exam_year": 2026})
+
+
+class TestExport:
+    """Тесты потоковой выгрузки баллов"""
+
+    def test_export_csv(self, client, exported_scores, monkeypatch):
+        """Тест: CSV с заголовком, все строки в порядке id, пакетами меньше выгрузки"""
+        monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+        response = client.get("/export/scores")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [int(row["id"]) for row in rows] == list(range(1, 10))
+        assert rows[0] == {"id": "1", "student_id": "1", "first_name": "Имя", "last_name": "Фамилия0",
+                           "subject": "Физика", "score": "55", "exam_year": "2025", "region": ""}
+
+    def test_no_queries_while_streaming(self, client, exported_scores, queries, monkeypatch):
+        """Тест: справочник читается до открытия курсора, пока идёт выгрузка — только сам курсор"""
+        monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+
+        with queries.expect(2):
+            client.get("/export/scores", params={"format": "ndjson"})
+
+        assert "FROM subject" in queries.statements[-2]
+        assert "FROM score" in queries.statements[-1]
+
+    def test_export_ndjson_filters(self, client, exported_scores):
+        """Тест: фильтры по предмету, году и диапазону id"""
+        response = client.get("/export/scores", params={"format": "ndjson", "subject": "Физика",
+                                                        "exam_year": 2026, "min_id": 3})
+
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert [(r["student_id"], r["subject"], r["score"]) for r in records] == [(2, "Физика", 75),
+                                                                                    (3, "Физика", 90)]
+
+    def test_export_gzip(self, client, exported_scores):
+        """Тест: gzip=true отдаёт сжатый файл .gz"""
+        response = client.get("/export/scores", params={"format": "ndjson", "gzip": True})
+
+        assert response.headers["content-type"] == "application/gzip"
+        assert "scores.ndjson.gz" in response.headers["content-disposition"]
+        assert len(gzip.decompress(response.content).splitlines()) == 9
+
+    def test_export_empty_and_unknown_subject(self, client):
+        """Тест: пустая выгрузка — только заголовок; незнакомый предмет — 422"""
+        assert client.get("/export/scores").text == ",".join(export.COLUMNS) + "\n"
+        response = client.get("/export/scores", params={"subject": "Астрономия"})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_export_columnar_without_pyarrow(self, client, monkeypatch):
+        """Тест: без pyarrow колоночные форматы — 501, CSV работает"""
+        monkeypatch.setattr(export, "pyarrow", None)
+
+        assert client.get("/export/scores", params={"format": "parquet"}).status_code == 501
+        assert client.get("/export/scores").status_code == status.HTTP_200_OK
+
+    @pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+    def test_export_columnar(self, client, exported_scores, monkeypatch, fmt):
+        """Тест: Parquet и Arrow читаются pyarrow, пакет — отдельная группа строк"""
+        pyarrow = pytest.importorskip("pyarrow")
+        import pyarrow.ipc
+        import pyarrow.parquet
+        monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 4)
+
+        response = client.get("/export/scores", params={"format": fmt, "exam_year": 2026})
+
+        data = io.BytesIO(response.content)
+        if fmt == "parquet":
+            assert pyarrow.parquet.ParquetFile(data).num_row_groups == 2
+            table = pyarrow.parquet.read_table(data)
+        else:
+            table = pyarrow.ipc.open_stream(data).read_all()
+        assert table.column_names == export.COLUMNS
+        assert table.column("score").to_pylist() == [60, 70, 75, 80, 90, 55]
+        assert set(table.column("subject").to_pylist()) == {"Физика", "Химия"}
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+from sqlalchemy.pool import StaticPool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.db import get_session, make_engine
+from api.lifespan import create_lifespan, warm_pool, warmup_statements
+from api.routers import health
+
+
+def make_app(engine, session_factory=None, **lifespan_kwargs) -> FastAPI:
+    app = FastAPI(lifespan=create_lifespan([engine], **lifespan_kwargs))
+    app.include_router(health.router)
+    if session_factory is not None:
+        async def get_session_override():
+            async with session_factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = get_session_override
+    return app
+
+
+class TestHealth:
+    """Тесты старта приложения и проверок готовности"""
+
+    def test_not_ready_before_startup(self, client):
+        """Тест: до завершения lifespan воркер не готов, но жив"""
+        assert client.get("/health/live").status_code == 200
+        assert client.get("/health/ready").status_code == 503
+
+    def test_ready_after_startup(self, engine, session_factory):
+        """Тест: после старта readiness отвечает 200 и сообщает время импорта и старта"""
+        app = make_app(engine, session_factory, create_schema=False, warm_connections=2)
+
+        with TestClient(app) as client:
+            response = client.get("/health/ready")
+
+        assert response.status_code == 200
+        assert response.json()["startup_ms"] > 0
+        assert app.state.ready is False  # после остановки
+
+    def test_create_all_only_when_enabled(self):
+        """Тест: без create_schema таблицы не создаются — схемой управляет Alembic"""
+        for create_schema, expected in ((False, False), (True, True)):
+            engine = make_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+            tables = []
+
+            async def inspect_tables():
+                async with engine.connect() as conn:
+                    tables.extend(await conn.run_sync(lambda sync: inspect(sync).get_table_names()))
+
+            with TestClient(make_app(engine, create_schema=create_schema, warm_connections=0)) as client:
+                client.portal.call(inspect_tables)
+
+            assert ("student" in tables) is expected
+
+    @pytest.mark.asyncio
+    async def test_warm_pool_runs_hot_statements(self, engine, queries):
+        """Тест: прогрев открывает соединения и выполняет на каждом горячие запросы"""
+        with queries.expect(2 * len(warmup_statements())):
+            opened = await warm_pool(engine, 2, warmup_statements())
+
+        assert opened == 2
+
+    def test_failed_check_hides_error(self, engine, session_factory, caplog):
+        """Тест: при недоступной БД ответ называет только проверку, подробности ошибки уходят в лог"""
+        app = make_app(engine, session_factory, create_schema=False, warm_connections=0)
+
+        with TestClient(app) as client:
+            client.portal.call(engine.dispose)
+            with patch.object(AsyncSession, "exec", side_effect=OSError("connect to db:5432 password=secret")):
+                response = client.get("/health/ready")
+
+        assert (response.status_code, response.json()) == (503, {"status": "unavailable", "check": "database"})
+        assert "password=secret" in caplog.text
@@ -0,0 +1,122 @@
+import pytest
+from fastapi import status
+
+from api import idempotency
+from api.idempotency import (IN_PROGRESS, MISMATCH, NEW, REPLAY, DatabaseIdempotencyStore,
+                             MemoryIdempotencyStore, StoredResponse)
+from tests.test_bot_storage import FakeClock
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    # ключи не переживают тест
+    store = MemoryIdempotencyStore()
+    monkeypatch.setattr(idempotency, "idempotency_store", store)
+    return store
+
+
+class TestIdempotencyKey:
+    """Тесты заголовка Idempotency-Key"""
+
+    def test_create_student_replayed(self, client, sample_student_data, queries):
+        """Тест: повтор с тем же ключом возвращает того же студента, не трогая БД"""
+        headers = {"Idempotency-Key": "register-1"}
+        first = client.post("/students/", json=sample_student_data, headers=headers)
+
+        with queries.expect(0):
+            second = client.post("/students/", json=sample_student_data, headers=headers)
+
+        assert first.status_code == second.status_code == status.HTTP_201_CREATED
+        assert second.json() == first.json()
+        assert second.headers["idempotent-replayed"] == "true"
+        assert len(client.get("/students/").json()["items"]) == 1
+
+    def test_key_reused_with_other_body(self, client, sample_student_data):
+        """Тест: тот же ключ с другим телом — 422"""
+        headers = {"Idempotency-Key": "register-2"}
+        client.post("/students/", json=sample_student_data, headers=headers)
+
+        response = client.post("/students/", json={"first_name": "Пётр", "last_name": "Петров"}, headers=headers)
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_key_reused_with_other_region(self, client, sample_student_data):
+        """Тест: тот же ключ и тело, но другой X-Region — 422, а не ответ, сохранённый для другого региона"""
+        client.post("/students/", json=sample_student_data, headers={"Idempotency-Key": "register-3", "X-Region": "77"})
+
+        response = client.post("/students/", json=sample_student_data,
+                               headers={"Idempotency-Key": "register-3", "X-Region": "50"})
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_error_not_stored(self, client, sample_score_data):
+        """Тест: ответ с ошибкой не сохраняется, запрос с тем же ключом выполняется заново"""
+        headers = {"Idempotency-Key": "score-1"}
+        client.post("/students/999/scores/", json=sample_score_data, headers=headers)
+
+        response = client.post("/students/999/scores/", json=sample_score_data, headers=headers)
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert "idempotent-replayed" not in response.headers
+
+    def test_score_replay_publishes_nothing(self, client, created_student, events):
+        """Тест: повтор upsert_score не доходит до эндпоинта и не публикует событие"""
+        url = f"/students/{created_student['id']}/scores/"
+        headers = {"Idempotency-Key": "score-2"}
+        client.post(url, json={"subject": "Физика", "score": 70}, headers=headers)
+        client.post(url, json={"subject": "Физика", "score": 71})  # изменение из другого источника
+
+        replay = client.post(url, json={"subject": "Физика", "score": 70}, headers=headers)
+
+        assert replay.json()["score"] == 70
+        assert events.last_seq == 2
+        assert client.get(url).json()[0]["score"] == 71
+
+    def test_telegram_id_unique(self, client):
+        """Тест: повторная регистрация с того же аккаунта Telegram возвращает существующего студента"""
+        first = client.post("/students/", json={"first_name": "Иван", "last_name": "Иванов", "telegram_id": 100})
+        second = client.post("/students/", json={"first_name": "Иван", "last_name": "Иванов", "telegram_id": 100})
+
+        assert first.status_code == status.HTTP_201_CREATED
+        assert second.status_code == status.HTTP_200_OK
+        assert second.json()["id"] == first.json()["id"]
+        assert "telegram_id" not in second.json()
+
+
+class TestIdempotencyStores:
+    """Тесты хранилищ ключей идемпотентности"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("backend", ["memory", "database"])
+    async def test_reserve_complete_expire(self, backend, session_factory):
+        """Тест: ключ занят до ответа, затем отдаёт ответ, после TTL освобождается"""
+        clock = FakeClock()
+        if backend == "memory":
+            store = MemoryIdempotencyStore(ttl=60, lock_timeout=5, clock=clock)
+        else:
+            store = DatabaseIdempotencyStore(session_factory, ttl=60, lock_timeout=5, clock=clock)
+        response = StoredResponse(201, "application/json", '{"id": 1}')
+
+        assert await store.reserve("k", "a") == (NEW, None)
+        assert await store.reserve("k", "a") == (IN_PROGRESS, None)
+        await store.complete("k", response)
+        assert await store.reserve("k", "a") == (REPLAY, response)
+        assert await store.reserve("k", "b") == (MISMATCH, None)
+
+        clock.now += 61
+        assert await store.reserve("k", "b") == (NEW, None)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("backend", ["memory", "database"])
+    async def test_abandoned_lock_taken_over(self, backend, session_factory):
+        """Тест: ключ запроса, который так и не завершился, освобождается через lock_timeout"""
+        clock = FakeClock()
+        if backend == "memory":
+            store = MemoryIdempotencyStore(lock_timeout=5, clock=clock)
+        else:
+            store = DatabaseIdempotencyStore(session_factory, lock_timeout=5, clock=clock)
+
+        await store.reserve("k", "a")
+        clock.now += 6
+
+        assert await store.reserve("k", "a") == (NEW, None)
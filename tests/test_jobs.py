@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+from fastapi import status
+
+from api.jobs import JOB_HANDLERS, JobRunner, get_job_runner
+from api.main import app
+from api.models import Job
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(name="clock")
+def clock_fixture():
+    return Clock()
+
+
+@pytest.fixture(name="runner")
+def runner_fixture(client, session_factory, clock):
+    # исполнитель на базе теста; в тестах задачи выполняются явным drain(), без фонового цикла
+    runner = JobRunner(session_factory, concurrency=2, lease=60, retry_delay=10, clock=clock)
+    app.dependency_overrides[get_job_runner] = lambda: runner
+    return runner
+
+
+async def enqueue(runner, kind: str, **kwargs) -> int:
+    return (await runner.enqueue(kind, **kwargs)).id
+
+
+class TestJobs:
+    """Тесты фоновых задач"""
+
+    @pytest.mark.asyncio
+    async def test_rebuild_in_background(self, client, runner):
+        """Тест: ?background=true отвечает 202 сразу, результат и прогресс — в GET /jobs/{id}"""
+        student = client.post("/students/", json={"first_name": "Иван", "last_name": "Иванов"}).json()
+        for year in (2025, 2026):
+            client.post(f"/students/{student['id']}/scores/",
+                        json={"subject": "Физика", "score": 70, "exam_year": year})
+
+        response = client.post("/leaderboard/rebuild", params={"background": True})
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.json()["status"] == "queued"
+        assert response.headers["location"] == f"/jobs/{response.json()['id']}"
+
+        await runner.drain()
+
+        job = client.get(response.headers["location"]).json()
+        assert (job["status"], job["result"], job["attempts"]) == ("succeeded", {"subjects": 1}, 1)
+        assert (job["progress"], job["total"]) == (2, 2)
+
+    @pytest.mark.asyncio
+    async def test_consistency_check_job(self, client, runner):
+        """Тест: POST /stats/consistency ставит проверку задачей, отчёт — в result"""
+        response = client.post("/stats/consistency")
+        assert response.status_code == status.HTTP_202_ACCEPTED
+
+        await runner.drain()
+
+        job = client.get(f"/jobs/{response.json()['id']}").json()
+        assert job["result"] == {"consistent": True, "mismatches": []}
+
+    @pytest.mark.asyncio
+    async def test_retry_with_backoff(self, runner, session_factory, clock, monkeypatch):
+        """Тест: упавшая задача повторяется после паузы, после max_attempts — failed"""
+        calls = []
+
+        async def flaky(job):
+            calls.append(clock())
+            if len(calls) < 2:
+                raise RuntimeError("boom")
+            return {"calls": len(calls)}
+
+        async def broken(job):
+            raise RuntimeError("always")
+
+        monkeypatch.setitem(JOB_HANDLERS, "flaky", flaky)
+        monkeypatch.setitem(JOB_HANDLERS, "broken", broken)
+        flaky_id = await enqueue(runner, "flaky")
+        broken_id = await enqueue(runner, "broken", max_attempts=2)
+
+        await runner.drain()
+        async with session_factory() as session:
+            job = await session.get(Job, flaky_id)
+        assert (job.status, job.error, job.run_after) == ("queued", "RuntimeError: boom", 1010.0)
+
+        # до конца паузы задача не берётся
+        clock.now = 1005
+        await runner.drain()
+        assert len(calls) == 1
+
+        clock.now = 1030
+        await runner.drain()
+        async with session_factory() as session:
+            flaky_job, broken_job = await session.get(Job, flaky_id), await session.get(Job, broken_id)
+        assert (flaky_job.status, flaky_job.attempts, flaky_job.result) == ("succeeded", 2, {"calls": 2})
+        assert (broken_job.status, broken_job.attempts, broken_job.error) == ("failed", 2, "RuntimeError: always")
+
+    @pytest.mark.asyncio
+    async def test_bounded_concurrency(self, runner, session_factory, clock, monkeypatch):
+        """Тест: одновременно выполняется не больше concurrency задач"""
+        running, peak = [0], [0]
+
+        async def slow(job):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+
+        monkeypatch.setitem(JOB_HANDLERS, "slow", slow)
+        for _ in range(5):
+            await enqueue(runner, "slow")
+
+        await runner.drain()
+
+        assert peak[0] == 2
+        async with session_factory() as session:
+            assert {(await session.get(Job, job_id)).status for job_id in range(1, 6)} == {"succeeded"}
+
+    @pytest.mark.asyncio
+    async def test_abandoned_job_requeued(self, runner, session_factory, clock, monkeypatch):
+        """Тест: задачу, чей исполнитель пропал, после аренды забирает другой"""
+        done = []
+
+        async def record(job):
+            done.append(job.id)
+
+        monkeypatch.setitem(JOB_HANDLERS, "record", record)
+        job_id = await enqueue(runner, "record")
+        # первый исполнитель захватил задачу и умер, не закончив
+        assert [job.id for job in await runner.claim(1)] == [job_id]
+
+        await runner.drain()
+        assert done == []
+
+        clock.now += 61
+        await runner.drain()
+        async with session_factory() as session:
+            job = await session.get(Job, job_id)
+        assert done == [job_id]
+        assert (job.status, job.attempts) == ("succeeded", 2)
+
+    def test_job_not_found(self, client, runner):
+        """Тест: несуществующая задача — 404"""
+        assert client.get("/jobs/999").status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,80 @@
+import json
+
+from fastapi import status
+
+
+class TestLeaderboard:
+    """Тесты рейтингов и перцентилей"""
+
+    def test_student_rank(self, client, add_student):
+        """Тест: место и перцентиль считаются по всем результатам предмета"""
+        add_student({"Математика": 90}, "А")
+        add_student({"Математика": 70}, "Б")
+        add_student({"Математика": 70}, "В")
+        student_id = add_student({"Математика": 80, "Физика": 60}, "Г")
+
+        ranks = {r["subject"]: r for r in client.get(f"/students/{student_id}/rank").json()}
+
+        assert ranks["Математика"]["rank"] == 2
+        assert ranks["Математика"]["total"] == 4
+        assert ranks["Математика"]["percentile"] == 50.0
+        assert ranks["Математика"]["top_percent"] == 50.0
+        assert ranks["Физика"]["rank"] == 1
+
+    def test_rank_follows_updates(self, client, add_student):
+        """Тест: обновление балла переносит результат в другую корзину гистограммы"""
+        leader = add_student({"Химия": 95}, "А")
+        student_id = add_student({"Химия": 50}, "Б")
+
+        client.post(f"/students/{student_id}/scores/", json={"subject": "Химия", "score": 99})
+
+        rank = client.get(f"/students/{student_id}/rank").json()[0]
+        assert rank["rank"] == 1
+        assert rank["total"] == 2
+        assert client.get(f"/students/{leader}/rank").json()[0]["rank"] == 2
+
+    def test_leaderboard_top(self, client, add_student):
+        """Тест топ-N по предмету с общими местами при равных баллах"""
+        a = add_student({"Физика": 70}, "А")
+        b = add_student({"Физика": 85}, "Б")
+        c = add_student({"Физика": 85}, "В")
+        add_student({"Физика": 40}, "Г")
+
+        board = client.get("/leaderboard/Физика", params={"limit": 3}).json()
+
+        assert board["total"] == 4
+        assert [(e["student_id"], e["rank"]) for e in board["top"]] == [(b, 1), (c, 1), (a, 3)]
+
+    def test_bulk_updates_histogram_and_rebuild(self, client, add_student):
+        """Тест: пакетная загрузка обновляет гистограмму, пересчёт даёт тот же результат"""
+        a = add_student({"Биология": 10}, "А")
+        b = add_student({}, "Б")
+        rows = [{"student_id": a, "subject": "Биология", "score": 60},
+                {"student_id": b, "subject": "Биология", "score": 80}]
+        client.post("/scores/bulk", content="\n".join(json.dumps(r) for r in rows).encode())
+        before = client.get(f"/students/{a}/rank").json()
+
+        assert client.post("/leaderboard/rebuild").json() == {"subjects": 1}
+        assert client.get(f"/students/{a}/rank").json() == before
+        assert before[0]["rank"] == 2
+        assert before[0]["total"] == 2
+
+    def test_leaderboard_per_exam_year(self, client, add_student):
+        """Тест: рейтинг и место считаются внутри своего года"""
+        student = add_student({}, "А")
+        other = add_student({}, "Б")
+        for student_id, year, score in [(student, 2025, 90), (other, 2025, 95), (student, 2026, 70)]:
+            client.post(f"/students/{student_id}/scores/",
+                        json={"subject": "Химия", "score": score, "exam_year": year})
+
+        board_2025 = client.get("/leaderboard/Химия", params={"exam_year": 2025}).json()
+        board_2026 = client.get("/leaderboard/Химия", params={"exam_year": 2026}).json()
+        rank_2026 = client.get(f"/students/{student}/rank", params={"exam_year": 2026}).json()
+
+        assert [(e["student_id"], e["score"]) for e in board_2025["top"]] == [(other, 95), (student, 90)]
+        assert (board_2026["exam_year"], board_2026["total"]) == (2026, 1)
+        assert [(r["exam_year"], r["rank"], r["total"]) for r in rank_2026] == [(2026, 1, 1)]
+
+    def test_rank_student_not_found(self, client):
+        """Тест места несуществующего студента"""
+        assert client.get("/students/999/rank").status_code == status.HTTP_404_NOT_FOUND
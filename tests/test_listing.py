@@ -0,0 +1,96 @@
+from fastapi import status
+
+
+class TestListing:
+    """Тесты постраничных списков студентов и баллов"""
+
+    def test_list_students_keyset_pages(self, client):
+        """Тест: страницы по курсору покрывают всех студентов без повторов"""
+        ids = [client.post("/students/", json={"first_name": "Имя", "last_name": f"Фамилия{i}"}).json()["id"]
+               for i in range(5)]
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2}
+            if cursor is not None:
+                params["after"] = cursor
+            page = client.get("/students/", params=params).json()
+            seen += [student["id"] for student in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert seen == ids
+
+    def test_list_students_desc_and_prefix(self, client):
+        """Тест сортировки по убыванию и фильтра по префиксу фамилии"""
+        for last_name in ["Иванов", "Иванова", "Петров", "Ив%анов"]:
+            client.post("/students/", json={"first_name": "Имя", "last_name": last_name})
+
+        page = client.get("/students/", params={"name_prefix": "Иван", "order": "desc"}).json()
+
+        assert [s["last_name"] for s in page["items"]] == ["Иванова", "Иванов"]
+        assert page["next_cursor"] is None
+
+    def test_list_students_prefix_pages(self, client):
+        """Тест: с префиксом страницы идут по (фамилия, id), курсор несёт фамилию"""
+        for last_name in ["Петров", "Иванова", "Иванов", "Ивановский", "Иванов"]:
+            client.post("/students/", json={"first_name": "Имя", "last_name": last_name})
+
+        seen, params = [], {"name_prefix": "Иванов", "limit": 2}
+        while True:
+            page = client.get("/students/", params=params).json()
+            seen += [(s["last_name"], s["id"]) for s in page["items"]]
+            if page["next_cursor"] is None:
+                break
+            params["after"] = page["next_cursor"]
+
+        assert seen == [("Иванов", 3), ("Иванов", 5), ("Иванова", 2), ("Ивановский", 4)]
+
+    def test_list_scores_range_pages(self, client):
+        """Тест: предмет и диапазон — страницы по (балл, id) без пропусков и повторов"""
+        for i, score in enumerate([80, 60, 95, 60, 70]):
+            student = client.post("/students/", json={"first_name": "Имя", "last_name": f"Ф{i}"}).json()
+            client.post(f"/students/{student['id']}/scores/", json={"subject": "Физика", "score": score})
+
+        params = {"subject": "Физика", "min_score": 60, "max_score": 90, "limit": 2, "order": "desc"}
+        first = client.get("/scores/", params=params).json()
+        second = client.get("/scores/", params={**params, "after": first["next_cursor"]}).json()
+
+        assert [(s["score"], s["student_id"]) for s in first["items"] + second["items"]] == [(80, 1), (70, 5),
+                                                                                              (60, 4), (60, 2)]
+        assert second["next_cursor"] is None
+
+    def test_invalid_cursor(self, client):
+        """Тест: испорченный курсор — 422, а не ошибка сервера"""
+        assert client.get("/students/", params={"after": "abc"}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        response = client.get("/students/", params={"name_prefix": "Ив", "after": "Иванов"})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_list_scores_filters(self, client):
+        """Тест фильтрации баллов по предмету и диапазону"""
+        for i, score in enumerate([40, 60, 80, 95]):
+            student = client.post("/students/", json={"first_name": "Имя", "last_name": f"Ф{i}"}).json()
+            client.post(f"/students/{student['id']}/scores/", json={"subject": "Физика", "score": score})
+            client.post(f"/students/{student['id']}/scores/", json={"subject": "Химия", "score": score})
+
+        page = client.get("/scores/", params={"subject": "Физика", "min_score": 60, "max_score": 90}).json()
+
+        assert [s["score"] for s in page["items"]] == [60, 80]
+        assert {s["subject"] for s in page["items"]} == {"Физика"}
+
+    def test_list_scores_by_exam_year(self, client):
+        """Тест: фильтр по году экзамена (в Postgres — чтение одной секции)"""
+        student = client.post("/students/", json={"first_name": "Имя", "last_name": "Ф"}).json()
+        for year, score in [(2024, 50), (2025, 60), (2026, 70)]:
+            client.post(f"/students/{student['id']}/scores/",
+                        json={"subject": "Физика", "score": score, "exam_year": year})
+
+        page = client.get("/scores/", params={"exam_year": 2025}).json()
+
+        assert [(s["exam_year"], s["score"]) for s in page["items"]] == [(2025, 60)]
+
+    def test_list_scores_limit_validation(self, client):
+        """Тест: слишком большой размер страницы отклоняется"""
+        response = client.get("/scores/", params={"limit": 100000})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,136 @@
+import os
+import re
+import subprocess
+import sys
+
+import httpx
+import pytest
+from sqlmodel import text
+
+from api.metrics import ApiMetrics, api_metrics
+from bot.api_client import ApiError
+from bot.bot import dp
+from bot.metrics import API_ERRORS, API_LATENCY, HANDLER_LATENCY
+from common.metrics import Counter, Histogram, Registry
+from tests.bot_fakes import FakeApi, make_bot, message_update
+from tests.test_bot_api_client import make_client
+
+
+def sample(rendered, name, **labels):
+    """Значение сэмпла из вывода /metrics или None"""
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = re.escape(name + ("{" + label_text + "}" if labels else "")) + r" (\S+)"
+    match = re.search("^" + pattern + "$", rendered, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+class TestMetricPrimitives:
+    """Тесты счётчиков и гистограмм"""
+
+    def test_histogram_renders_cumulative_buckets(self):
+        """Тест: корзины гистограммы выводятся накопительно, с +Inf, суммой и количеством"""
+        registry = Registry()
+        histogram = Histogram("latency_seconds", "Latency", ("route",), registry, buckets=(0.1, 1))
+        child = histogram.labels("/a")
+        for value in (0.05, 0.5, 5):
+            child.observe(value)
+
+        rendered = registry.render()
+        assert sample(rendered, "latency_seconds_bucket", route="/a", le="0.1") == 1
+        assert sample(rendered, "latency_seconds_bucket", route="/a", le="1") == 2
+        assert sample(rendered, "latency_seconds_bucket", route="/a", le="+Inf") == 3
+        assert sample(rendered, "latency_seconds_count", route="/a") == 3
+        assert sample(rendered, "latency_seconds_sum", route="/a") == pytest.approx(5.55)
+        assert "# TYPE latency_seconds histogram" in rendered
+
+    def test_labels_child_is_reused(self):
+        """Тест: labels() возвращает один и тот же объект для одних меток"""
+        counter = Counter("requests_total", "Requests", ("route",))
+        assert counter.labels("/a") is counter.labels("/a")
+        with pytest.raises(ValueError):
+            counter.labels("/a", "extra")
+
+    def test_label_values_escaped(self):
+        """Тест: кавычки в значениях меток экранируются"""
+        registry = Registry()
+        Counter("requests_total", "Requests", ("route",), registry).labels('a"b').inc()
+        assert 'requests_total{route="a\\"b"} 1' in registry.render()
+
+
+class TestApiMetrics:
+    """Тесты /metrics в API"""
+
+    def test_route_template_status_and_db_queries(self, client, engine, created_student):
+        """Тест: метки по шаблону маршрута, статус и число запросов к БД на запрос"""
+        api_metrics.instrument_engine(engine)
+        student_id = created_student["id"]
+        route = "/students/{student_id}/scores/"
+        before = client.get("/metrics").text
+
+        client.post(f"/students/{student_id}/scores/", json={"subject": "Физика", "score": 70})
+        client.post("/students/999/scores/", json={"subject": "Физика", "score": 70})
+
+        rendered = client.get("/metrics").text
+        labels = dict(method="POST", route=route)
+        assert (sample(rendered, "http_requests_total", **labels, status="200") or 0) \
+            - (sample(before, "http_requests_total", **labels, status="200") or 0) == 1
+        assert sample(rendered, "http_requests_total", **labels, status="404") >= 1
+        # сырой путь с id в метки не попадает
+        assert f"/students/{student_id}/scores/" not in rendered
+        queries = sample(rendered, "http_request_db_queries_sum", **labels) \
+            - (sample(before, "http_request_db_queries_sum", **labels) or 0)
+        assert queries >= 2
+        assert sample(rendered, "http_requests_in_flight") == 1  # сам запрос /metrics
+        assert sample(rendered, "db_pool_checkouts_total", engine="primary") is not None
+        assert sample(rendered, "cache_requests_total", backend="memory", result="miss") is not None
+
+    @pytest.mark.asyncio
+    async def test_query_outside_request_not_attributed(self, session_factory, engine):
+        """Тест: запросы вне HTTP-запроса считаются только в общих метриках"""
+        metrics = ApiMetrics()
+        metrics.instrument_engine(engine)
+        metrics.instrument_engine(engine)  # повторная подписка игнорируется
+
+        async with session_factory() as session:
+            await session.exec(text("SELECT 1"))
+
+        rendered = metrics.registry.render()
+        assert sample(rendered, "db_queries_total") == 1
+        assert sample(rendered, "db_query_duration_seconds_count") == 1
+
+
+class TestBotMetrics:
+    """Тесты метрик бота"""
+
+    @pytest.mark.asyncio
+    async def test_handler_latency_recorded(self):
+        """Тест: middleware пишет латентность по имени хендлера"""
+        child = HANDLER_LATENCY.labels("cmd_start")
+        before = sum(child.counts)
+
+        await dp.feed_update(make_bot(), message_update(7001, "/start"), api=FakeApi())
+
+        assert sum(child.counts) == before + 1
+
+    @pytest.mark.asyncio
+    async def test_api_call_latency_and_errors(self):
+        """Тест: клиент API пишет латентность и причину ошибки по операции"""
+        latency = API_LATENCY.labels("create_student")
+        errors = API_ERRORS.labels("create_student", "4xx")
+        calls_before, errors_before = sum(latency.counts), errors.value
+
+        api = make_client(lambda request: httpx.Response(422, json={"detail": "bad"}))
+        with pytest.raises(ApiError):
+            await api.create_student("Иван", "Иванов")
+        await api.aclose()
+
+        assert sum(latency.counts) == calls_before + 1
+        assert errors.value == errors_before + 1
+
+    def test_bot_does_not_import_api(self):
+        """Тест: бот разворачивается отдельно и не тянет пакет API с SQLAlchemy"""
+        code = "import sys, bot.bot; print(sorted({'api', 'sqlalchemy'} & set(sys.modules)))"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                env={**os.environ, "BOT_TOKEN": "42:TEST"})
+
+        assert result.stdout.strip() == "[]"
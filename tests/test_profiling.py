@@ -0,0 +1,82 @@
+import logging
+import os
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.cache import Cache, get_cache
+from api.db import get_read_session, get_session
+from api.profiling import ProfilingMiddleware, QueryTracer, parse_request_start, trace_endpoints
+from api.routers import scores, students
+
+
+@pytest.fixture(name="profiled_client")
+def profiled_client_fixture(session_factory, engine, tmp_path):
+    # отдельное приложение: глобальный app в тестах не трогаем
+    app = FastAPI()
+    app.include_router(students.router)
+    app.include_router(scores.router)
+
+    async def get_session_override():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_cache] = lambda: Cache()
+    app.add_middleware(ProfilingMiddleware, sample_rate=0, output_dir=str(tmp_path))
+    trace_endpoints(app)
+    QueryTracer(slow_query_ms=0).instrument_engine(engine)
+
+    with TestClient(app) as client:
+        yield client
+
+
+def server_timing(response) -> dict:
+    spans = {}
+    for part in response.headers["server-timing"].split(", "):
+        name, duration = part.split(";")[:2]
+        spans[name] = float(duration.removeprefix("dur="))
+    return spans
+
+
+class TestProfiling:
+    """Тесты режима профилирования"""
+
+    def test_server_timing_breakdown(self, profiled_client):
+        """Тест: ответ содержит разбивку времени по этапам и число запросов к БД"""
+        student = profiled_client.post("/students/", json={"first_name": "Иван", "last_name": "Иванов"}).json()
+
+        response = profiled_client.post(f"/students/{student['id']}/scores/",
+                                         json={"subject": "Физика", "score": 80})
+
+        spans = server_timing(response)
+        assert {"deps", "endpoint", "serialize", "db", "total"} <= set(spans)
+        assert spans["total"] >= spans["endpoint"] >= spans["db"] > 0
+        assert 'queries"' in response.headers["server-timing"]
+        assert "x-profile-id" not in response.headers
+
+    def test_profile_by_header(self, profiled_client, tmp_path):
+        """Тест: заголовок X-Profile включает профилирование запроса и сохраняет профиль"""
+        response = profiled_client.get("/students/1", headers={"X-Profile": "1"})
+
+        profile_id = response.headers["x-profile-id"]
+        saved = [name for name in os.listdir(tmp_path) if name.startswith(profile_id)]
+        assert len(saved) == 1
+
+    def test_slow_query_logged_with_plan(self, profiled_client, caplog):
+        """Тест: запрос дольше порога логируется вместе с планом"""
+        with caplog.at_level(logging.WARNING, logger="api.profiling"):
+            profiled_client.get("/students/1/scores/")
+
+        messages = [r.getMessage() for r in caplog.records if r.name == "api.profiling"]
+        assert any("Slow query" in m and "plan:" in m for m in messages)
+
+    def test_parse_request_start_units(self):
+        """Тест: X-Request-Start понимается в секундах, миллисекундах и микросекундах"""
+        now = time.time()
+        for value in (f"t={now - 0.5:.3f}", f"{int((now - 0.5) * 1000)}", f"t={int((now - 0.5) * 1e6)}"):
+            assert parse_request_start(value.encode()) == pytest.approx(0.5, abs=0.1)
+        assert parse_request_start(b"garbage") is None
@@ -90,4 +90,77 @@ class TestScores:
     def test_list_scores_student_not_found(self, client):
         """Тест получения баллов несуществующего студента"""
         response = client.get("/students/999/scores/")
-        assert response.status_code == status.HTTP_404_NOT_FOUND
\ No newline at end of file
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_list_scores_single_query(self, client, created_student, sample_score_data, queries):
+        """Тест: список баллов — один запрос, без отдельной загрузки студента"""
+        student_id = created_student["id"]
+        client.post(f"/students/{student_id}/scores/", json=sample_score_data)
+
+        with queries.expect(1):
+            response = client.get(f"/students/{student_id}/scores/")
+
+        assert len(response.json()) == 1
+
+    def test_upsert_score_keeps_single_row(self, client, created_student, sample_score_data):
+        """Тест: повторный upsert обновляет ту же запись, а не создаёт дубль"""
+        student_id = created_student["id"]
+
+        first = client.post(f"/students/{student_id}/scores/", json=sample_score_data).json()
+        second = client.post(
+            f"/students/{student_id}/scores/",
+            json={**sample_score_data, "score": 60}
+        ).json()
+
+        assert second["id"] == first["id"]
+        scores = client.get(f"/students/{student_id}/scores/").json()
+        assert len(scores) == 1
+        assert scores[0]["score"] == 60
+
+    def test_scores_kept_per_exam_year(self, client, created_student):
+        """Тест: пересдача в другом году — отдельная запись, а не перезапись прошлогоднего балла"""
+        student_id = created_student["id"]
+
+        client.post(f"/students/{student_id}/scores/", json={"subject": "Физика", "score": 61, "exam_year": 2025})
+        client.post(f"/students/{student_id}/scores/", json={"subject": "Физика", "score": 78, "exam_year": 2026})
+
+        scores = client.get(f"/students/{student_id}/scores/").json()
+        assert sorted((s["exam_year"], s["score"]) for s in scores) == [(2025, 61), (2026, 78)]
+        only_2025 = client.get(f"/students/{student_id}/scores/", params={"exam_year": 2025}).json()
+        assert [(s["exam_year"], s["score"]) for s in only_2025] == [(2025, 61)]
+
+    def test_upsert_scores_batch(self, client, created_student):
+        """Тест: пакет баллов по нескольким предметам сохраняется одним запросом"""
+        student_id = created_student["id"]
+        client.post(f"/students/{student_id}/scores/", json={"subject": "Физика", "score": 50})
+
+        response = client.post(f"/students/{student_id}/scores/batch", json={"scores": [
+            {"subject": "Математика", "score": 85},
+            {"subject": "Физика", "score": 72},
+        ]})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert {(s["subject"], s["score"]) for s in response.json()} == {("Математика", 85), ("Физика", 72)}
+        scores = client.get(f"/students/{student_id}/scores/").json()
+        assert {s["subject"]: s["score"] for s in scores} == {"Математика": 85, "Физика": 72}
+        # гистограммы обновлены в той же транзакции: старый балл по физике вычтен
+        stats = {s["subject"]: s for s in client.get("/stats/subjects").json()}
+        assert stats["Физика"]["distribution"] == {"72": 1}
+
+    def test_upsert_scores_batch_validation(self, client, created_student):
+        """Тест: повтор предмета или пустой пакет отклоняются целиком"""
+        student_id = created_student["id"]
+
+        duplicate = client.post(f"/students/{student_id}/scores/batch", json={"scores": [
+            {"subject": "Химия", "score": 60}, {"subject": "Химия", "score": 70},
+        ]})
+        empty = client.post(f"/students/{student_id}/scores/batch", json={"scores": []})
+
+        assert duplicate.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert empty.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert client.get(f"/students/{student_id}/scores/").json() == []
+
+    def test_upsert_scores_batch_student_not_found(self, client):
+        """Тест: пакет для несуществующего студента — 404"""
+        response = client.post("/students/999/scores/batch", json={"scores": [{"subject": "Химия", "score": 60}]})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
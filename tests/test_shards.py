@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+from fastapi import status
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api import aggregates, cache as cache_module, db, events as events_module, jobs as jobs_module
+from api.db import ShardRouter, get_read_session, get_session
+from api.jobs import JobRunner, get_job_runner
+from api.main import app
+from api.models import Score
+from api.subjects import seed_subjects
+
+
+@pytest.fixture(name="shards")
+def shards_fixture(tmp_path, monkeypatch, session_factory):
+    """Регион 77 со своей базой — отдельный SQLite-файл; остальные регионы идут в базу теста"""
+    router = ShardRouter({77: f"sqlite:///{tmp_path}/region_77.db"})
+
+    async def create_tables():
+        async with router.engines[77].begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+            await seed_subjects(conn)
+
+    asyncio.run(create_tables())
+    monkeypatch.setattr(db, "session_factory", session_factory)
+    monkeypatch.setattr(db, "read_session_factory", session_factory)
+    for module in (db, cache_module, events_module, jobs_module):
+        monkeypatch.setattr(module, "shard_router", router)
+    yield router
+    asyncio.run(router.engines[77].dispose())
+
+
+@pytest.fixture(name="routed_client")
+def routed_client_fixture(client, shards):
+    # настоящие get_session/get_read_session: база выбирается по заголовку X-Region
+    app.dependency_overrides.pop(get_session)
+    app.dependency_overrides.pop(get_read_session)
+    return client
+
+
+class TestShards:
+    """Тесты маршрутизации регионов по базам"""
+
+    def test_from_env(self, monkeypatch):
+        """Тест: регионы из DB_SHARD_REGIONS, URL по шаблону; без шаблона — ошибка конфигурации"""
+        monkeypatch.setenv("DB_SHARD_REGIONS", "77, 78")
+        monkeypatch.setenv("DB_SHARD_URL", "sqlite:////data/region_{region}.db")
+        router = ShardRouter.from_env()
+
+        assert [router.routes(region) for region in (77, 78, 50, None)] == [True, True, False, False]
+        assert str(router.engines[78].url) == "sqlite+aiosqlite:////data/region_78.db"
+
+        monkeypatch.delenv("DB_SHARD_URL")
+        with pytest.raises(RuntimeError):
+            ShardRouter.from_env()
+
+    @pytest.mark.asyncio
+    async def test_region_goes_to_own_database(self, routed_client, shards, session_factory):
+        """Тест: студент и баллы региона со своей базой пишутся только в неё"""
+        headers = {"X-Region": "77"}
+        student = routed_client.post("/students/", json={"first_name": "Иван", "last_name": "Иванов"},
+                                     headers=headers).json()
+        routed_client.post(f"/students/{student['id']}/scores/", json={"subject": "Физика", "score": 78},
+                           headers=headers)
+
+        scores = routed_client.get(f"/students/{student['id']}/scores/", headers=headers).json()
+        assert [(s["subject"], s["score"], s["region"]) for s in scores] == [("Физика", 78, 77)]
+        # в основной базе этого студента нет
+        missing = routed_client.get(f"/students/{student['id']}/scores/")
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+        async with AsyncSession(shards.engines[77]) as session:
+            assert len((await session.exec(select(Score))).all()) == 1
+        async with session_factory() as session:
+            assert (await session.exec(select(Score))).all() == []
+
+    def test_region_without_database_uses_primary(self, routed_client):
+        """Тест: регион без своей базы пишется в основную и сохраняется в score.region"""
+        student = routed_client.post("/students/", json={"first_name": "Анна", "last_name": "Петрова"}).json()
+        routed_client.post(f"/students/{student['id']}/scores/", json={"subject": "Химия", "score": 64},
+                           headers={"X-Region": "50"})
+
+        scores = routed_client.get("/scores/", params={"region": 50}).json()["items"]
+        assert [(s["student_id"], s["region"]) for s in scores] == [(student["id"], 50)]
+
+    def test_upsert_without_region_keeps_region(self, routed_client):
+        """Тест: исправление балла без X-Region (как из бота) не сбрасывает сохранённый регион"""
+        student = routed_client.post("/students/", json={"first_name": "Анна", "last_name": "Петрова"}).json()
+        routed_client.post(f"/students/{student['id']}/scores/", json={"subject": "Химия", "score": 64},
+                           headers={"X-Region": "50"})
+        routed_client.post(f"/students/{student['id']}/scores/", json={"subject": "Химия", "score": 70})
+
+        scores = routed_client.get("/scores/", params={"region": 50}).json()["items"]
+        assert [(s["score"], s["region"]) for s in scores] == [(70, 50)]
+
+    @pytest.mark.asyncio
+    async def test_cache_namespaced_by_region(self, routed_client, cache):
+        """Тест: одинаковые id студентов в разных базах не делят запись кэша"""
+        primary = routed_client.post("/students/", json={"first_name": "Анна", "last_name": "Петрова"}).json()
+        regional = routed_client.post("/students/", json={"first_name": "Иван", "last_name": "Иванов"},
+                                      headers={"X-Region": "77"}).json()
+        assert primary["id"] == regional["id"]
+
+        routed_client.get(f"/students/{primary['id']}")
+        response = routed_client.get(f"/students/{regional['id']}", headers={"X-Region": "77"})
+
+        assert response.json()["last_name"] == "Иванов"
+        assert (await cache.get(f"region77:student:{regional['id']}"))["last_name"] == "Иванов"
+
+    @pytest.mark.asyncio
+    async def test_background_job_for_region(self, routed_client, shards, session_factory):
+        """Тест: задача региона со своей базой ставится в основную базу и работает над базой региона"""
+        runner = JobRunner(session_factory)
+        app.dependency_overrides[get_job_runner] = lambda: runner
+        headers = {"X-Region": "77"}
+        student = routed_client.post("/students/", json={"first_name": "Иван", "last_name": "Иванов"},
+                                     headers=headers).json()
+        routed_client.post(f"/students/{student['id']}/scores/", json={"subject": "Физика", "score": 78},
+                           headers=headers)
+
+        response = routed_client.post("/leaderboard/rebuild", params={"background": True}, headers=headers)
+        await runner.drain()
+
+        job = routed_client.get(response.headers["location"], headers=headers).json()
+        assert (job["status"], job["result"]) == ("succeeded", {"subjects": 1})
+        # статус виден и без заголовка региона
+        assert routed_client.get(response.headers["location"]).json()["status"] == "succeeded"
+        async with AsyncSession(shards.engines[77]) as session:
+            assert await aggregates.check_histograms(session) == []
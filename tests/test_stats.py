@@ -0,0 +1,64 @@
+import asyncio
+
+from fastapi import status
+from sqlalchemy import text
+
+
+class TestStats:
+    """Тесты агрегированной статистики"""
+
+    def test_subject_stats(self, client, add_student):
+        """Тест count/mean/median/stddev/распределения по предмету"""
+        for score in [60, 70, 70, 100]:
+            add_student({"Математика": score})
+        student_id = add_student({"Математика": 10})
+        # замена балла убирает старое значение из агрегатов
+        client.post(f"/students/{student_id}/scores/", json={"subject": "Математика", "score": 80})
+
+        stats = {s["subject"]: s for s in client.get("/stats/subjects").json()}
+        math = stats["Математика"]
+
+        assert math["count"] == 5
+        assert math["mean"] == 76.0
+        assert math["median"] == 70.0
+        assert math["stddev"] == 13.56
+        assert math["distribution"] == {"60": 1, "70": 2, "80": 1, "100": 1}
+
+    def test_even_count_median(self, client, add_student):
+        """Тест медианы при чётном числе результатов"""
+        for score in [50, 60, 70, 90]:
+            add_student({"Физика": score})
+
+        stats = client.get("/stats/subjects").json()
+        assert stats[0]["median"] == 65.0
+
+    def test_student_stats(self, client, add_student):
+        """Тест суммы и среднего по предметам студента"""
+        student_id = add_student({"Математика": 80, "Физика": 70, "Русский язык": 91})
+
+        stats = client.get(f"/stats/students/{student_id}").json()
+
+        assert stats["subjects"] == 3
+        assert stats["total"] == 241
+        assert stats["average"] == 80.33
+
+    def test_student_stats_not_found(self, client):
+        """Тест статистики несуществующего студента"""
+        assert client.get("/stats/students/999").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_consistency_check(self, client, engine, add_student):
+        """Тест: проверка находит расхождение после правки в обход API"""
+        student_id = add_student({"Химия": 55})
+        assert client.get("/stats/consistency").json() == {"consistent": True, "mismatches": []}
+
+        async def corrupt():
+            async with engine.begin() as conn:
+                await conn.execute(text("UPDATE score SET score = 56 WHERE student_id = :id"), {"id": student_id})
+
+        asyncio.run(corrupt())
+        report = client.get("/stats/consistency").json()
+
+        assert report["consistent"] is False
+        assert {(m["score"], m["expected"], m["actual"]) for m in report["mismatches"]} == {(55, 0, 1), (56, 1, 0)}
+        client.post("/leaderboard/rebuild")
+        assert client.get("/stats/consistency").json()["consistent"] is True
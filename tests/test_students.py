@@ -1,4 +1,9 @@
+import pytest
 from fastapi import status
+from sqlalchemy.exc import InvalidRequestError
+from sqlmodel import select
+
+from api.models import Student
 
 
 class TestStudents:
@@ -55,4 +60,52 @@ class TestStudents:
         assert response2.status_code == status.HTTP_201_CREATED
 
         # Должны быть разные ID
-        assert response1.json()["id"] != response2.json()["id"]
\ No newline at end of file
+        assert response1.json()["id"] != response2.json()["id"]
+
+class TestStudentLoading:
+    """Тесты загрузки студентов вместе с баллами"""
+
+    def test_get_with_scores_single_query(self, client, created_student, queries):
+        """Тест: студент с баллами — один запрос, повторно — из кэша без запросов"""
+        student_id = created_student["id"]
+        for subject, score in [("Физика", 78), ("Химия", 64)]:
+            client.post(f"/students/{student_id}/scores/", json={"subject": subject, "score": score})
+
+        with queries.expect(1):
+            response = client.get(f"/students/{student_id}", params={"include": "scores"})
+        with queries.expect(0):
+            cached = client.get(f"/students/{student_id}", params={"include": "scores"})
+
+        data = response.json()
+        assert data["last_name"] == created_student["last_name"]
+        assert [(s["subject"], s["score"]) for s in data["scores"]] == [("Физика", 78), ("Химия", 64)]
+        assert cached.json() == data
+
+    def test_get_with_scores_not_found(self, client):
+        """Тест: несуществующий студент с include=scores — 404"""
+        response = client.get("/students/999", params={"include": "scores"})
+        assert response.status_code == 404
+
+    def test_list_with_scores_no_n_plus_one(self, client, queries):
+        """Тест: число запросов для страницы не зависит от числа студентов на ней"""
+        for i in range(5):
+            student = client.post("/students/", json={"first_name": "Иван", "last_name": f"Иванов{i}"}).json()
+            client.post(f"/students/{student['id']}/scores/", json={"subject": "Физика", "score": 60 + i})
+
+        with queries.expect(2):
+            page = client.get("/students/", params={"include": "scores", "limit": 3}).json()
+
+        assert [s["scores"][0]["score"] for s in page["items"]] == [60, 61, 62]
+        assert page["next_cursor"] == str(page["items"][-1]["id"])
+
+    @pytest.mark.asyncio
+    async def test_lazy_load_raises(self, session_factory):
+        """Тест: обращение к незагруженной связи — ошибка, а не скрытый запрос"""
+        async with session_factory() as session:
+            student = Student(first_name="Иван", last_name="Иванов")
+            session.add(student)
+            await session.commit()
+            loaded = (await session.exec(select(Student).where(Student.id == student.id))).one()
+
+            with pytest.raises(InvalidRequestError):
+                loaded.scores
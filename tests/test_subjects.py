@@ -0,0 +1,70 @@
+import pytest
+from fastapi import status
+from sqlmodel import select
+
+from api.models import Score, Subject
+from api.subjects import DEFAULT_SUBJECTS, SubjectCatalog
+
+
+class TestSubjects:
+    """Тесты справочника предметов"""
+
+    def test_list_subjects(self, client):
+        """Тест: GET /subjects отдаёт справочник с целыми id в порядке заполнения"""
+        response = client.get("/subjects")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [s["name"] for s in response.json()] == DEFAULT_SUBJECTS
+        assert all(isinstance(s["id"], int) for s in response.json())
+
+    def test_subjects_served_from_memory(self, client, queries):
+        """Тест: после первой загрузки справочник не читается из базы"""
+        client.get("/subjects")
+
+        with queries.expect(0):
+            client.get("/subjects")
+
+    def test_unknown_subject_rejected(self, client, created_student):
+        """Тест: предмет не из справочника — 422, в том числе в пакете"""
+        student_id = created_student["id"]
+
+        single = client.post(f"/students/{student_id}/scores/", json={"subject": "Астрономия", "score": 50})
+        batch = client.post(f"/students/{student_id}/scores/batch", json={"scores": [
+            {"subject": "Физика", "score": 60}, {"subject": "Астрономия", "score": 50},
+        ]})
+
+        assert single.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert batch.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert "Астрономия" in batch.json()["detail"]
+        assert client.get(f"/students/{student_id}/scores/").json() == []
+
+    @pytest.mark.asyncio
+    async def test_score_stores_subject_id(self, client, created_student, session_factory):
+        """Тест: в score хранится id предмета, наружу отдаётся название"""
+        student_id = created_student["id"]
+        response = client.post(f"/students/{student_id}/scores/", json={"subject": "Химия", "score": 64})
+
+        async with session_factory() as session:
+            chemistry = (await session.exec(select(Subject).where(Subject.name == "Химия"))).one()
+            score = (await session.exec(select(Score))).one()
+
+        assert score.subject_id == chemistry.id
+        assert response.json()["subject"] == "Химия"
+
+    @pytest.mark.asyncio
+    async def test_catalog_reloads_on_unknown_name(self, session_factory):
+        """Тест: новый предмет подхватывается без рестарта, но не чаще refresh_interval"""
+        now = [0.0]
+        catalog = SubjectCatalog(refresh_interval=60, clock=lambda: now[0])
+        async with session_factory() as session:
+            await catalog.load(session)
+            session.add(Subject(name="Астрономия"))
+            await session.commit()
+
+            now[0] = 30
+            assert await catalog.ids(session, ["Астрономия"]) == {}
+            now[0] = 61
+            found = await catalog.ids(session, ["Астрономия"])
+
+        assert list(found) == ["Астрономия"]
+        assert catalog.loads == 2